@@ -1,4 +1,4 @@
-import pickle
+import pickle, io
 from pathlib import Path
 import os, shutil
 from . import settings
@@ -22,6 +22,9 @@ class AutoSavable():
     ROOT_NAME = settings.autosave_root_name
     BACKUP_NAME = settings.autosave_root_backup_name
     TEMP_NAME = settings.autosave_root_temp_name
+    
+    # Chave, no estado salvo, dos tamanhos dos journals.
+    JOURNAL_KEY = "_journal_sizes"
 
     def __init__(self, root_path: Path, autosave_container_name=settings.autosave_container_name, 
         state_name=settings.autosave_state_name) -> None:
@@ -46,11 +49,29 @@ class AutoSavable():
             autosave_path.mkdir(parents=True, exist_ok=True)
             self.autosave_paths.append(autosave_path)
 
+        self.journal_path = self.autosave_container_path / settings.autosave_journal_dirname
+        
+        # Número de itens e de bytes escritos em cada journal.
+        self.journal_sizes: dict[str, tuple[int, int]] = {}
+
     @property
     def vars_to_save(self) -> list[str]:
         "Nome dos atributos para serem salvos no auto-salvamento"
         raise Exception("'vars_to_save' não foi implementado.")
     
+    @property
+    def journal_vars(self) -> list[str]:
+        '''
+        Nome dos atributos que são listas que apenas crescem (apenas recebem `append`/`extend`).
+        Podem ser atributos de atributos, como "state.times".
+
+        Essas listas são salvas em journals (um arquivo por lista, fora das pastas de 
+        auto-salvamento), em que cada auto-salvamento apenas escreve os itens adicionados
+        desde o último auto-salvamento. O estado salvo contém apenas o tamanho de cada journal,
+        então o custo do auto-salvamento não cresce com o tamanho dessas listas.
+        '''
+        return []
+
     def get_vars_to_save(self):
         return {name: getattr(self, name) for name in self.vars_to_save}
     
@@ -58,11 +79,109 @@ class AutoSavable():
         for name, value in values.items():
             setattr(self, name, value)
 
+    def _get_attr(self, name: str):
+        obj = self
+        for attr in name.split("."):
+            obj = getattr(obj, attr)
+        return obj
+
+    def _set_attr(self, name: str, value):
+        *parents, attr = name.split(".")
+        obj = self
+        for parent in parents:
+            obj = getattr(obj, parent)
+        setattr(obj, attr, value)
+
+    def write_journals(self):
+        "Escreve nos journals os itens adicionados desde a última escrita."
+        for name in self.journal_vars:
+            values = self._get_attr(name)
+            num_items, num_bytes = self.journal_sizes.get(name, (0, 0))
+            
+            path = self.journal_path / f"{name}.pickle"
+            mode = "ab" if name in self.journal_sizes else "wb"
+            if mode == "wb":
+                self.journal_path.mkdir(parents=True, exist_ok=True)
+            
+            with open(path, mode) as f:
+                if len(values) > num_items:
+                    data = pickle.dumps(values[num_items:])
+                    f.write(data)
+                    num_bytes += len(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+            
+            self.journal_sizes[name] = (len(values), num_bytes)
+
+    def load_journals(self, sizes: dict[str, tuple[int, int]]):
+        '''
+        Reconstrói as listas em `journal_vars` a partir dos journals, lendo apenas os
+        dados presentes em `sizes`. Os dados escritos após (de auto-salvamentos posteriores)
+        são descartados.
+        '''
+        self.journal_sizes = {}
+        for name in self.journal_vars:
+            num_items, num_bytes = sizes.get(name, (0, 0))
+            path = self.journal_path / f"{name}.pickle"
+            
+            values = []
+            if num_bytes > 0:
+                with open(path, "rb") as f:
+                    data = io.BytesIO(f.read(num_bytes))
+                while data.tell() < num_bytes:
+                    values.extend(pickle.load(data))
+            
+            if len(values) != num_items:
+                raise Exception(f"O journal '{path}' está corrompido.")
+
+            if path.exists():
+                with open(path, "r+b") as f:
+                    f.truncate(num_bytes)
+            
+            self._set_attr(name, values)
+            if name in sizes:
+                self.journal_sizes[name] = (num_items, num_bytes)
+
+    def dump_state(self) -> bytes:
+        '''
+        Estado atual serializado, no formato salvo em `autosave`. Os itens novos
+        das listas em `journal_vars` são escritos nos journals.
+        '''
+        self.write_journals()
+        
+        # As listas dos journals não são salvas no estado.
+        journal_values = {name: self._get_attr(name) for name in self.journal_vars}
+        for name in journal_values:
+            self._set_attr(name, None)
+        
+        try:
+            state = self.get_vars_to_save()
+            state[self.JOURNAL_KEY] = dict(self.journal_sizes)
+            return pickle.dumps(state)
+        finally:
+            for name, values in journal_values.items():
+                self._set_attr(name, values)
+
+    def load_state(self, data: bytes):
+        "Carrega o estado `data` gerado por `dump_state`."
+        saved_vars = pickle.loads(data)
+        journal_sizes = saved_vars.pop(self.JOURNAL_KEY, None)
+        self.set_vars_to_save(saved_vars)
+        if journal_sizes is not None:
+            self.load_journals(journal_sizes)
+
+    @staticmethod
+    def write_file(path: Path, data: bytes):
+        "Escreve `data` em `path` e espera a escrita chegar no disco."
+        with open(path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
     def autosave(self):
         "Salva o estado atual."
         if self.vars_to_save is not None:
-            with open(self.autosave_state_path, "wb") as f:
-                pickle.dump(self.get_vars_to_save(), f)
+            self.write_file(self.autosave_state_path, self.dump_state())
 
     def exec_autosave(self, *args, **kwargs):
         "Executa o auto-salvamento setando uma flag que informa a completude da operação."
@@ -76,8 +195,8 @@ class AutoSavable():
         
         r = self.autosave(*args, **kwargs)
 
-        with open(is_completed_path, "wb") as f:
-            pickle.dump(True, f)
+        # Ponto de commit do auto-salvamento.
+        self.write_file(is_completed_path, pickle.dumps(True))
 
         return r
     
@@ -134,7 +253,6 @@ class AutoSavable():
             autosave_path = self.get_autosave_path(self.autosave_container_path)
         
         with open(autosave_path / (self.autosave_state_name + ".pickle"), "rb") as f:
-            saved_vars = pickle.load(f)
-            self.set_vars_to_save(saved_vars)
+            self.load_state(f.read())
 
         return autosave_path
\ No newline at end of file
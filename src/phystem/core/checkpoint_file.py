@@ -0,0 +1,156 @@
+'''
+Checkpoint em um único arquivo binário.
+
+Formato do arquivo:
+
+    magic (8 bytes) | tamanho do cabeçalho (uint64) | cabeçalho (yaml) | arrays | sha256 (32 bytes)
+
+O cabeçalho contém os metadados, as configurações da simulação (texto yaml), o estado dos
+geradores de números aleatórios e a posição (offset), dtype e shape de cada array. Os arrays
+são contíguos e alinhados em `ALIGNMENT` bytes. O sha256 é calculado sobre todos os bytes
+que o precedem.
+'''
+import hashlib, os, struct
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+MAGIC = b"PHYCKPT\x01"
+FILE_EXT = ".ckpt"
+ALIGNMENT = 64
+VERSION = 1
+
+_len_struct = struct.Struct("<Q")
+_digest_size = hashlib.sha256().digest_size
+
+class CorruptedCheckpointError(Exception):
+    pass
+
+def is_checkpoint_file(path: Path):
+    path = Path(path)
+    if not path.is_file():
+        return False
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+def _aligned(n: int):
+    return -(-n // ALIGNMENT) * ALIGNMENT
+
+def save(path: Path, arrays: dict[str, np.ndarray], metadata: dict=None, configs: str=None, rng_state: dict=None):
+    '''
+    Salva o checkpoint em `path` com uma única escrita, seguida de `fsync`. O arquivo
+    é escrito em um arquivo temporário e depois renomeado, então um checkpoint
+    existente em `path` nunca fica incompleto.
+
+    Parâmetros:
+    -----------
+    arrays:
+        Arrays do estado do sistema.
+
+    metadata:
+        Metadados do checkpoint (tempo, número de passos, etc).
+
+    configs:
+        Configurações da simulação, em formato yaml.
+
+    rng_state:
+        Estado dos geradores de números aleatórios.
+    '''
+    path = Path(path)
+    arrays = {name: np.ascontiguousarray(a) for name, a in arrays.items()}
+
+    # O cabeçalho depende dos offsets, que dependem do tamanho do cabeçalho,
+    # então os offsets são relativos ao início da região dos arrays.
+    arrays_info = {}
+    offset = 0
+    for name, a in arrays.items():
+        arrays_info[name] = {"dtype": a.dtype.str, "shape": list(a.shape), "offset": offset}
+        offset = _aligned(offset + a.nbytes)
+    data_size = offset
+
+    header = yaml.dump({
+        "version": VERSION,
+        "metadata": metadata or {},
+        "configs": configs,
+        "rng_state": rng_state or {},
+        "arrays": arrays_info,
+    }).encode()
+
+    data_start = _aligned(len(MAGIC) + _len_struct.size + len(header))
+    buffer = bytearray(data_start + data_size + _digest_size)
+
+    buffer[:len(MAGIC)] = MAGIC
+    _len_struct.pack_into(buffer, len(MAGIC), len(header))
+    header_start = len(MAGIC) + _len_struct.size
+    buffer[header_start:header_start + len(header)] = header
+
+    for name, a in arrays.items():
+        start = data_start + arrays_info[name]["offset"]
+        buffer[start:start + a.nbytes] = a.tobytes()
+
+    checksum_start = data_start + data_size
+    buffer[checksum_start:] = hashlib.sha256(memoryview(buffer)[:checksum_start]).digest()
+
+    temp_path = path.with_name(path.name + ".temp")
+    with open(temp_path, "wb") as f:
+        f.write(buffer)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+def read_header(path: Path) -> dict:
+    "Lê apenas o cabeçalho do checkpoint em `path`."
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise CorruptedCheckpointError(f"'{path}' não é um checkpoint.")
+        header_len = _len_struct.unpack(f.read(_len_struct.size))[0]
+        return yaml.unsafe_load(f.read(header_len))
+
+def load(path: Path, verify=True, mmap=False):
+    '''
+    Carrega o checkpoint em `path`.
+
+    Parâmetros:
+    -----------
+    verify:
+        Se for `True`, verifica o checksum do arquivo.
+
+    mmap:
+        Se for `True`, o arquivo é mapeado em memória ao invés de lido.
+        Os arrays retornados são apenas de leitura em ambos os casos.
+
+    Retorno:
+    --------
+    (arrays, header):
+        Dicionário com os arrays e o cabeçalho do checkpoint.
+    '''
+    path = Path(path)
+    if mmap:
+        buffer = np.memmap(path, dtype=np.uint8, mode="r")
+    else:
+        with open(path, "rb") as f:
+            buffer = f.read()
+
+    if bytes(buffer[:len(MAGIC)]) != MAGIC:
+        raise CorruptedCheckpointError(f"'{path}' não é um checkpoint.")
+
+    checksum_start = len(buffer) - _digest_size
+    if verify:
+        digest = hashlib.sha256(memoryview(buffer)[:checksum_start]).digest()
+        if digest != bytes(buffer[checksum_start:]):
+            raise CorruptedCheckpointError(f"Checksum do checkpoint '{path}' não confere.")
+
+    header_len = _len_struct.unpack_from(buffer, len(MAGIC))[0]
+    header_start = len(MAGIC) + _len_struct.size
+    header = yaml.unsafe_load(bytes(buffer[header_start:header_start + header_len]))
+
+    data_start = _aligned(header_start + header_len)
+    arrays = {}
+    for name, info in header["arrays"].items():
+        dtype = np.dtype(info["dtype"])
+        count = int(np.prod(info["shape"]))
+        arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count,
+            offset=data_start + info["offset"]).reshape(info["shape"])
+
+    return arrays, header
@@ -1,13 +1,17 @@
 from abc import ABC, abstractmethod
-import yaml, copy
+import yaml, copy, queue, threading, time, logging
+import numpy as np
 from pathlib import Path
 
 from phystem.core.solvers import SolverCore
 from .autosave import AutoSavable
 from . import settings
 
+logger: logging.Logger = logging.getLogger(__name__)
+
 class ColAutoSaveCfg:
-    def __init__(self, freq_dt: float, to_save_state=True, save_data_freq_dt=None) -> None:
+    def __init__(self, freq_dt: float, to_save_state=True, save_data_freq_dt=None, 
+        max_overhead: float=None, interruption_rate: float=None, min_freq_dt: float=None, max_freq_dt: float=None) -> None:
         '''
         Configurações de auto-salvamento dos coletores.
 
@@ -15,6 +19,7 @@ class ColAutoSaveCfg:
         -----------
         freq_dt:
             Intervalo de tempo (em unidades de tempo da simulação) entre os auto-salvamentos.
+            No modo adaptativo, é o intervalo utilizado até o primeiro ajuste.
         
         save_data_freq_dt:
             Intervalo de tempo (em unidades de tempo da simulação) entre o salvamentos dos
@@ -22,11 +27,128 @@ class ColAutoSaveCfg:
         
         to_save_state:
             Flag indicando se o estado od sisteme é salvo no auto-salvamento.
+        
+        max_overhead:
+            Modo adaptativo: fração máxima do tempo de execução gasta nos auto-salvamentos.
+            O intervalo é ajustado a cada auto-salvamento, a partir do tempo gasto no
+            auto-salvamento e da velocidade da integração medidos.
+        
+        interruption_rate:
+            Modo adaptativo: número esperado de interrupções da execução por hora. O intervalo
+            é o ótimo de Young/Daly, sqrt(2 * custo do auto-salvamento * tempo médio entre interrupções), 
+            que minimiza o tempo perdido com auto-salvamentos e com re-execuções após as interrupções.
+            Se `max_overhead` também for passado, o maior dos dois intervalos é utilizado.
+        
+        min_freq_dt, max_freq_dt:
+            Limites do intervalo no modo adaptativo.
         '''
         self.freq_dt = freq_dt
         self.to_save_state = to_save_state
         self.save_data_freq_dt = save_data_freq_dt
+        self.max_overhead = max_overhead
+        self.interruption_rate = interruption_rate
+        self.min_freq_dt = min_freq_dt
+        self.max_freq_dt = max_freq_dt
+
+    @property
+    def is_adaptive(self):
+        return getattr(self, "max_overhead", None) is not None or getattr(self, "interruption_rate", None) is not None
+
+    def adaptive_freq_dt(self, cost: float, wall_per_time: float):
+        '''
+        Intervalo do modo adaptativo dado o tempo gasto em um auto-salvamento `cost` (em segundos)
+        e o tempo de execução por unidade de tempo da simulação `wall_per_time` (em segundos).
+        '''
+        wall_intervals = []
+        if self.max_overhead is not None:
+            wall_intervals.append(cost * (1 - self.max_overhead) / self.max_overhead)
+        if self.interruption_rate is not None:
+            wall_intervals.append(np.sqrt(2 * cost * 3600 / self.interruption_rate))
+        
+        freq_dt = max(wall_intervals) / wall_per_time
+        if self.min_freq_dt is not None:
+            freq_dt = max(freq_dt, self.min_freq_dt)
+        if self.max_freq_dt is not None:
+            freq_dt = min(freq_dt, self.max_freq_dt)
+        return freq_dt
     
+class WriterError(Exception):
+    "Erro ocorrido em uma escrita executada por `BackgroundWriter`."
+    pass
+
+class BackgroundWriter:
+    def __init__(self, num_workers=2, max_pending=32) -> None:
+        '''
+        Executa as escritas em disco dos coletores em threads separadas, para que a 
+        integração não fique parada esperando as escritas.
+
+        As escritas submetidas com a mesma chave são executadas na ordem em que foram
+        submetidas. Os argumentos das escritas não devem ser alterados após a submissão.
+        Se uma escrita falhar, o erro é levantado (como `WriterError`) na próxima chamada 
+        de `submit` ou `flush`.
+
+        Parâmetros:
+        -----------
+        num_workers:
+            Número de threads de escrita. Se for 0, as escritas são executadas
+            imediatamente na thread que as submeteu.
+        
+        max_pending:
+            Número máximo de escritas pendentes por thread. Quando esse número é 
+            atingido, `submit` bloqueia até que uma escrita seja finalizada.
+        '''
+        self.num_workers = num_workers
+        self.max_pending = max_pending
+        self.error: Exception = None
+        
+        self.queues: list[queue.Queue] = []
+        for _ in range(num_workers):
+            q = queue.Queue(maxsize=max_pending)
+            threading.Thread(target=self._worker, args=(q,), daemon=True).start()
+            self.queues.append(q)
+
+    def _worker(self, q: queue.Queue):
+        while True:
+            func, args, kwargs = q.get()
+            try:
+                if self.error is None:
+                    func(*args, **kwargs)
+            except Exception as e:
+                self.error = e
+            finally:
+                q.task_done()
+
+    def raise_error(self):
+        "Levanta o erro de alguma escrita que falhou, caso exista."
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise WriterError(f"Falha em uma escrita em segundo plano: {error!r}") from error
+
+    def submit(self, func, *args, key=None, **kwargs):
+        "Submete a escrita `func(*args, **kwargs)`."
+        self.raise_error()
+        
+        if self.num_workers == 0:
+            func(*args, **kwargs)
+            return
+        
+        self.queues[hash(key) % self.num_workers].put((func, args, kwargs))
+
+    def flush(self):
+        "Espera todas as escritas submetidas serem finalizadas."
+        for q in self.queues:
+            q.join()
+        self.raise_error()
+
+_writer: BackgroundWriter = None
+
+def get_writer() -> BackgroundWriter:
+    "Retorna o `BackgroundWriter` compartilhado por todos os coletores."
+    global _writer
+    if _writer is None:
+        _writer = BackgroundWriter(settings.writer_num_workers, settings.writer_max_pending)
+    return _writer
+
 class ColCfg:
     def __init__(self, autosave_cfg: ColAutoSaveCfg=None):
         self.autosave_cfg = autosave_cfg
@@ -80,6 +202,15 @@ class Collector(AutoSavable, ABC):
         self.autosave_last_time = self.solver.time
         self.autosave_data_last_time = self.solver.time
         
+        # Intervalo entre os auto-salvamentos atual, que é alterado no modo adaptativo.
+        self.autosave_freq_dt = self.autosave_cfg.freq_dt if self.autosave_cfg else None
+        
+        # Medidas do modo adaptativo: tempo (de execução) gasto nos auto-salvamentos
+        # e instante (de execução e da simulação) do final do último auto-salvamento.
+        self.autosave_cost = None
+        self.autosave_wall_end = None
+        self.autosave_time_end = None
+        
         # Caminho da pasta do auto-salvamento que contém os dados coletados. 
         self.autosave_data_path = self.autosave_root_path / "data"
 
@@ -104,6 +235,7 @@ class Collector(AutoSavable, ABC):
         return [
             "autosave_last_time",
             "autosave_data_last_time",
+            "autosave_freq_dt",
         ]
 
     @abstractmethod
@@ -115,9 +247,119 @@ class Collector(AutoSavable, ABC):
     def save(self) -> None:
         pass
 
+    def submit_write(self, func, *args, **kwargs):
+        '''
+        Executa a escrita `func(*args, **kwargs)` em segundo plano (ver `BackgroundWriter`).
+        As escritas de um mesmo coletor são executadas em ordem.
+        '''
+        get_writer().submit(func, *args, key=id(self), **kwargs)
+
+    def flush_writes(self):
+        "Espera as escritas em segundo plano serem finalizadas."
+        get_writer().flush()
+
+    def next_due_step(self) -> int:
+        '''
+        Próximo passo temporal (valor de `solver.num_time_steps`) em que `collect` precisa ser
+        chamado, ou seja, nos passos anteriores `collect` não faria nada. Utilizado para
+        chamar `collect` apenas quando necessário (ver `ColManager`).
+
+        Por padrão, `collect` precisa ser chamado em todos os passos.
+        '''
+        return self.solver.num_time_steps + 1
+
+    def first_step_where(self, cond, max_steps=2**26) -> int:
+        '''
+        Menor passo temporal `n` (valor de `solver.num_time_steps`) posterior ao atual em que
+        `cond(t_n)` é verdadeiro, em que `t_n` é o tempo da simulação no passo `n`. `cond` recebe
+        um array de tempos e deve retornar um array booleano.
+
+        Os tempos são calculados acumulando `solver.dt` da mesma forma que o solver, então o
+        resultado é o mesmo de verificar `cond` a cada passo. Se `cond` não for satisfeita
+        em `max_steps` passos, retorna o passo atual + `max_steps`.
+        '''
+        step = self.solver.num_time_steps
+        dt = getattr(self.solver, "dt", None)
+        if dt is None or dt <= 0:
+            return step + 1
+
+        time = self.solver.time
+        num_steps = 0
+        chunk_size = 64
+        while num_steps < max_steps:
+            times = np.add.accumulate(np.concatenate([[time], np.full(chunk_size, dt)]))[1:]
+            ids = np.flatnonzero(cond(times))
+            if ids.size > 0:
+                return step + num_steps + int(ids[0]) + 1
+            
+            time = times[-1]
+            num_steps += chunk_size
+            chunk_size *= 2
+        
+        return step + max_steps
+
+    def autosave_due_step(self) -> int:
+        "Próximo passo temporal em que `check_autosave` realiza algum auto-salvamento."
+        cfg = self.autosave_cfg
+        freq_dt = self.get_autosave_freq_dt()
+        due = self.first_step_where(lambda t: t - self.autosave_last_time > freq_dt)
+        if cfg.save_data_freq_dt:
+            due = min(due, self.first_step_where(
+                lambda t: t - self.autosave_data_last_time > cfg.save_data_freq_dt))
+        return due
+
+    def get_autosave_freq_dt(self):
+        if self.autosave_freq_dt is None:
+            self.autosave_freq_dt = self.autosave_cfg.freq_dt
+        return self.autosave_freq_dt
+
     def exec_autosave(self,):
+        wall_start = time.perf_counter()
+        
+        self.flush_writes()
         self.autosave_last_time = self.solver.time
-        return super().exec_autosave()
+        r = super().exec_autosave()
+
+        if self.autosave_cfg and self.autosave_cfg.is_adaptive:
+            self.update_autosave_freq_dt(wall_start, time.perf_counter())
+        return r
+
+    def autosave(self):
+        '''
+        Salva o estado atual (ver `AutoSavable.autosave`).
+
+        OBS: Coletores filhos de um gerenciador de coletores (ex.: `ColManager` dos anéis) não
+        têm este método chamado: o gerenciador salva o estado deles com `dump_state` e o carrega
+        com `load_state`. Operações extras do auto-salvamento (ex.: escrever arquivos no disco)
+        devem ser feitas sobrescrevendo esses métodos, e não este.
+        '''
+        return super().autosave()
+
+    def update_autosave_freq_dt(self, wall_start: float, wall_end: float):
+        '''
+        Atualiza o intervalo entre auto-salvamentos no modo adaptativo (ver `ColAutoSaveCfg`), 
+        com o auto-salvamento que começou em `wall_start` e terminou em `wall_end`.
+        '''
+        cost = wall_end - wall_start
+        if self.autosave_cost is not None:
+            cost = 0.5 * (self.autosave_cost + cost)
+        self.autosave_cost = cost
+        
+        last_wall_end, last_time_end = self.autosave_wall_end, self.autosave_time_end
+        self.autosave_wall_end, self.autosave_time_end = wall_end, self.solver.time
+        
+        if last_wall_end is None or self.solver.time <= last_time_end:
+            return
+        
+        wall_per_time = (wall_start - last_wall_end) / (self.solver.time - last_time_end)
+        if wall_per_time <= 0:
+            return
+        
+        self.autosave_freq_dt = self.autosave_cfg.adaptive_freq_dt(cost, wall_per_time)
+        logger.info((
+            f"Intervalo de auto-salvamento: {self.autosave_freq_dt:.4g} "
+            f"(custo do auto-salvamento: {cost:.3g} s, tempo de execução por unidade de tempo: {wall_per_time:.3g} s)"
+        ))
 
     def exec_autosave_data(self):
         self.autosave_data_last_time = self.solver.time
@@ -131,13 +373,13 @@ class Collector(AutoSavable, ABC):
                 # self.save()
                 self.exec_autosave_data()
         
-        if self.solver.time - self.autosave_last_time > self.autosave_cfg.freq_dt:
+        if self.solver.time - self.autosave_last_time > self.get_autosave_freq_dt():
             # self.autosave_last_time = self.solver.time
             self.exec_autosave()
 
     @staticmethod
-    def save_cfg(configs: dict[str], configs_path: Path) -> None:
-        "Salva as configurações da simulação."
+    def configs_to_yaml(configs: dict[str]) -> str:
+        "Configurações da simulação em formato yaml, no mesmo formato utilizado em `save_cfg`."
         configs = copy.deepcopy(configs)
         configs["run_cfg"].func = "nao salvo"
         
@@ -146,6 +388,12 @@ class Collector(AutoSavable, ABC):
         if configs["run_cfg"].checkpoint:
             configs["run_cfg"].checkpoint.configs = "nao salvo"
         
+        return yaml.dump(configs)
+
+    @staticmethod
+    def save_cfg(configs: dict[str], configs_path: Path) -> None:
+        "Salva as configurações da simulação."
+        configs_text = Collector.configs_to_yaml(configs)
         with open(configs_path, "w") as f:
-            yaml.dump(configs, f)
+            f.write(configs_text)
 
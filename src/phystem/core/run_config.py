@@ -32,7 +32,7 @@ from pathlib import Path
 from enum import Flag, Enum, auto
 import yaml, os, copy
 from phystem.gui_phystem import config_ui
-from . import settings, autosave
+from . import settings, autosave, checkpoint_file
 
 
 def load_configs(path: Path, load_checkpoint_cfgs=False):
@@ -83,7 +83,8 @@ class CheckpointCfg:
         Parameters
         ----------
             root_path:
-                Caminho da pasta que contém o checkpoint.
+                Caminho da pasta que contém o checkpoint, ou do arquivo 
+                do checkpoint (ver `phystem.core.checkpoint_file`).
             
             override_cfgs:
                 Se for 'True', as configurações salvas no checkpoint serão ignoradas.
@@ -107,7 +108,11 @@ class CheckpointCfg:
         self.ignore_autosave = ignore_autosave
         self.set_time = set_time
 
-        self.configs: dict = load_configs(self.root_path / settings.system_config_fname)
+        self.is_file = checkpoint_file.is_checkpoint_file(self.root_path)
+        if self.is_file:
+            self.configs: dict = yaml.unsafe_load(checkpoint_file.read_header(self.root_path)["configs"])
+        else:
+            self.configs: dict = load_configs(self.root_path / settings.system_config_fname)
     
     def get_sim_configs(self, run_cfg=None):
         configs = copy.deepcopy(self.configs)
@@ -116,6 +121,8 @@ class CheckpointCfg:
         return configs
     
     def get_metadata(self):
+        if self.is_file:
+            return checkpoint_file.read_header(self.root_path)["metadata"]
         with open(os.path.join(self.root_path, "metadata.yaml")) as f:
             metadata = yaml.unsafe_load(f)
         return metadata
@@ -309,7 +316,14 @@ class ReplayDataCfg(RealTimeCfg):
         # Carrega as configurações utilizadas nos dados salvos.
         self.system_cfg = load_configs(self.root_path / "config")
 
-        self.frame_dt = self.system_cfg["run_cfg"].func_cfg.snaps_dt
+        # Snapshots coletadas por um gerenciador de coletores não possuem `snaps_dt`
+        # em `func_cfg`, mas o salvam nos metadados.
+        metadata_path = self.data_path / "metadata.yaml"
+        if metadata_path.exists():
+            with open(metadata_path, "r") as f:
+                self.frame_dt = yaml.unsafe_load(f)["frame_dt"]
+        else:
+            self.frame_dt = self.system_cfg["run_cfg"].func_cfg.snaps_dt
 
         init_cfg = self.system_cfg["run_cfg"].int_cfg
         super().__init__(int_cfg=init_cfg, num_steps_frame=num_steps_frame, fps=fps, 
@@ -12,9 +12,20 @@ autosave_root_name = "autosave"
 autosave_root_backup_name = "backup"
 autosave_root_temp_name = "temp"
 autosave_state_name = "state"
+autosave_journal_dirname = "journal"
 
 '''Systems'''
 system_config_fname = "config.yaml"
 
+# Pasta do armazenamento consolidado das snapshots
+snaps_store_dirname = "snaps"
+
+'''Escritas em segundo plano (ver `collectors.BackgroundWriter`)'''
+# Número de threads de escrita. Se for 0, as escritas são síncronas.
+writer_num_workers = 2
+
+# Número máximo de escritas pendentes por thread.
+writer_max_pending = 32
+
 '''Outros'''
 IS_TESTING = True
\ No newline at end of file
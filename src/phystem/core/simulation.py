@@ -117,16 +117,20 @@ class SimulationCore(ABC):
     @classmethod
     def load_from_checkpoint(cls, path: Path, run_cfg: RunCfg=None, cp_kwargs=None):
         '''
-        Carrega uma simulação a partir de um checkpoint em `path`. 
-        É possível passar uma `run_cfg` para ser utilizada ao invés
-        daquela salva no checkpoint.
+        Carrega uma simulação a partir de um checkpoint em `path`, que pode ser 
+        uma pasta ou um arquivo de checkpoint. É possível passar uma `run_cfg` 
+        para ser utilizada ao invés daquela salva no checkpoint.
         '''
         path = Path(path)
         config_path = path
         if path.stem == settings.autosave_container_name:
             config_path = autosave.AutoSavable.get_autosave_path(path)
 
-        cfgs = load_configs(config_path / settings.system_config_fname)
+        if path.is_file():
+            cfgs = CheckpointCfg(path).get_sim_configs()
+        else:
+            cfgs = load_configs(config_path / settings.system_config_fname)
+        
         if run_cfg is not None:
             if run_cfg.int_cfg is None:
                 run_cfg.int_cfg = cfgs["run_cfg"].int_cfg
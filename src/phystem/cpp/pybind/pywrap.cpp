@@ -1,6 +1,7 @@
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
 #include <pybind11/stl_bind.h>
+#include <pybind11/numpy.h>
 
 #include "../src/solvers/self_propelling.h"
 #include "../src/solvers/ring.h"
@@ -8,8 +9,8 @@
 
 using namespace std;
 
-PYBIND11_MAKE_OPAQUE(vector<vector<array<double, 2>>>);
-PYBIND11_MAKE_OPAQUE(vector<array<double, 2>>);
+PYBIND11_MAKE_OPAQUE(vector<vector<std::array<double, 2>>>);
+PYBIND11_MAKE_OPAQUE(vector<std::array<double, 2>>);
 PYBIND11_MAKE_OPAQUE(vector<vector<vector<double*>>>);
 PYBIND11_MAKE_OPAQUE(vector<vector<double*>>);
 PYBIND11_MAKE_OPAQUE(vector<vector<double>>);
@@ -26,6 +27,24 @@ using PyVecList3d = vector<vector<vector<double*>>>;
 namespace py = pybind11;
 constexpr auto byref = py::return_value_policy::reference_internal;
 
+py::tuple ids_and_cms(Ring &solver, const vector<int> &ids) {
+    /**
+     * Retorna os arrays (ids, centros de massa) dos anéis em 'ids'.
+    */
+    py::array_t<int> ids_arr(ids.size());
+    py::array_t<double> cms_arr({(py::ssize_t)ids.size(), (py::ssize_t)2});
+    
+    auto ids_view = ids_arr.mutable_unchecked<1>();
+    auto cms_view = cms_arr.mutable_unchecked<2>();
+    for (size_t i = 0; i < ids.size(); i++) {
+        ids_view(i) = ids[i];
+        cms_view(i, 0) = solver.center_mass[ids[i]][0];
+        cms_view(i, 1) = solver.center_mass[ids[i]][1];
+    }
+
+    return py::make_tuple(ids_arr, cms_arr);
+}
+
 PYBIND11_MODULE(cpp_lib, m) {
     auto data_types = m.def_submodule("data_types");
     auto solvers = m.def_submodule("solvers");
@@ -141,8 +160,24 @@ PYBIND11_MODULE(cpp_lib, m) {
         .def_readonly("col_ring_id", &InPolChecker::ColInfo::col_ring_id)
         ;
 
+    PYBIND11_NUMPY_DTYPE(InPolChecker::ColRecord, ring_id, p_id, col_ring_id, resolved);
+
     py::class_<InPolChecker>(managers, "InPolChecker")
         .def(py::init<Vector3d*, VecList*, vector<int>*, int*, int, int, double, bool>())
+        .def("collisions_array", [](InPolChecker &self) {
+                py::array_t<InPolChecker::ColRecord> records(self.num_collisions);
+                self.collision_records(records.mutable_data());
+                return records;
+            })
+        .def("inside_points_array", [](InPolChecker &self) {
+                py::array_t<double> points({(py::ssize_t)self.num_inside_points, (py::ssize_t)2});
+                auto points_view = points.mutable_unchecked<2>();
+                for (int i = 0; i < self.num_inside_points; i++) {
+                    points_view(i, 0) = self.inside_points[i][0];
+                    points_view(i, 1) = self.inside_points[i][1];
+                }
+                return points;
+            })
         .def_readonly("num_inside_points", &InPolChecker::num_inside_points)
         .def_readonly("inside_points", &InPolChecker::inside_points)
         .def_readonly("collisions", &InPolChecker::collisions)
@@ -184,11 +219,30 @@ PYBIND11_MODULE(cpp_lib, m) {
         .def_readonly("count_overlap", &AreaDebug::count_overlap)
         .def_readonly("area", &AreaDebug::area, byref)
         ;      
+    py::enum_<RingObservable>(solvers, "RingObservable")
+        .value("vel_cm", RingObservable::vel_cm)
+        .value("cm", RingObservable::cm)
+        .value("area", RingObservable::area)
+        .value("perimeter", RingObservable::perimeter)
+        .value("gyration", RingObservable::gyration)
+        .value("asphericity", RingObservable::asphericity)
+        .value("polarity", RingObservable::polarity)
+        ;
+
     py::class_<UpdateDebug>(solvers, "UpdateDebug")
         .def_readonly("count_zero_speed", &UpdateDebug::count_zero_speed)
         .def_readonly("high_vel", &UpdateDebug::high_vel)
         ;      
 
+    py::class_<StepCounters>(solvers, "StepCounters")
+        .def(py::init<>())
+        .def_readwrite("num_steps", &StepCounters::num_steps)
+        .def_readwrite("num_created", &StepCounters::num_created)
+        .def_readwrite("num_removed", &StepCounters::num_removed)
+        .def_readwrite("active_integral", &StepCounters::active_integral)
+        .def_readwrite("num_invasions", &StepCounters::num_invasions)
+        ;
+
     py::class_<Ring>(solvers, "Ring")
         .def(py::init<Vector3d&, vector<double>&, int, RingCfgPy,
             double, double, double, ParticleWindowsCfg, RingUpdateType, RingIntegrationType, 
@@ -204,6 +258,51 @@ PYBIND11_MODULE(cpp_lib, m) {
         .def("init_invagination", &Ring::init_invagination, py::call_guard<py::gil_scoped_release>())
         .def("load_checkpoint", &Ring::load_checkpoint, py::call_guard<py::gil_scoped_release>())
         .def("get_particle_id", &Ring::get_particle_id, py::call_guard<py::gil_scoped_release>())
+        .def("rings_in_rect", [](Ring &self, double x_min, double x_max, double y_min, double y_max, double margin) {
+                vector<int> ids;
+                {
+                    py::gil_scoped_release release;
+                    ids = self.rings_in_rect(x_min, x_max, y_min, y_max, margin);
+                }
+                return ids_and_cms(self, ids);
+            }, 
+            py::arg("x_min"), py::arg("x_max"), py::arg("y_min"), py::arg("y_max"), py::arg("margin")=-1)
+        .def("rings_near", [](Ring &self, double x, double y, double radius, int k, double margin) {
+                vector<int> ids;
+                {
+                    py::gil_scoped_release release;
+                    ids = self.rings_near(x, y, radius, k, margin);
+                }
+                return ids_and_cms(self, ids);
+            }, 
+            py::arg("x"), py::arg("y"), py::arg("radius"), py::arg("k")=-1, py::arg("margin")=-1)
+        .def("slots_of", [](Ring &self, py::array_t<unsigned long int, py::array::c_style | py::array::forcecast> uids) {
+                auto uids_view = uids.unchecked<1>();
+                py::array_t<int> slots(uids_view.shape(0));
+                auto slots_view = slots.mutable_unchecked<1>();
+                for (py::ssize_t i = 0; i < uids_view.shape(0); i++)
+                    slots_view(i) = self.slot_of(uids_view(i));
+                return slots;
+            }, 
+            py::arg("uids"))
+        .def("ring_observables", [](Ring &self, const vector<RingObservable> &fields) {
+                int num_cols = 0;
+                for (auto field: fields)
+                    num_cols += observable_size(field);
+                
+                py::array_t<double> out({(py::ssize_t)self.num_active_rings, (py::ssize_t)num_cols});
+                double* out_ptr = out.mutable_data();
+                {
+                    py::gil_scoped_release release;
+                    self.ring_observables(fields, out_ptr);
+                }
+                return out;
+            }, 
+            py::arg("fields"))
+        .def("get_stokes_rng_state", &Ring::get_stokes_rng_state)
+        .def("set_stokes_rng_state", &Ring::set_stokes_rng_state)
+        .def("set_rand_seed", &Ring::set_rand_seed)
+        .def_readonly("rand_seed", &Ring::rand_seed)
         .def_readwrite("sim_time", &Ring::sim_time, byref)
         .def_readwrite("num_time_steps", &Ring::num_time_steps, byref)
         // .def_readwrite("stokes_spawn_pos", &Ring::stokes_spawn_pos, byref)
@@ -220,6 +319,7 @@ PYBIND11_MODULE(cpp_lib, m) {
         .def_readonly("pos_t", &Ring::pos_t, byref)
         .def_readonly("graph_points", &Ring::graph_points, byref)
         .def_readonly("update_debug", &Ring::update_debug)
+        .def_readwrite("counters", &Ring::counters)
         .def_readonly("spring_debug", &Ring::spring_debug)
         .def_readonly("excluded_vol_debug", &Ring::excluded_vol_debug)
         .def_readonly("area_debug", &Ring::area_debug)
@@ -16,6 +16,14 @@ public:
         int col_ring_id;
     };
 
+    // Colisão e se ela já foi resolvida, no formato exportado para o Python (ver 'collision_records').
+    struct ColRecord {
+        int ring_id;
+        int p_id;
+        int col_ring_id;
+        bool resolved;
+    };
+
     Vector3d* pols;
     Vector2d* center_mass;
     vector<int>* ids;
@@ -86,6 +94,16 @@ public:
         return is_inside;
     }
 
+    void collision_records(ColRecord* out) {
+        /**
+         * Escreve em 'out' (que deve ter tamanho 'num_collisions') as colisões atuais.
+        */
+        for (int i = 0; i < num_collisions; i++) {
+            auto & col = collisions[i];
+            out[i] = {col.ring_id, col.p_id, col.col_ring_id, (bool)is_col_resolved[i]};
+        }
+    }
+
     // void check_collision() {
     //     for (int id = 0; id < num_collisions; id++)
     //     {
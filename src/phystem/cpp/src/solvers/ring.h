@@ -3,11 +3,15 @@
 #include <random>
 #include <array>
 #include <map>
+#include <unordered_map>
 #include <iostream>
 #include <cstdlib> 
 #include <omp.h>
 #include <forward_list>
 #include <algorithm>
+#include <sstream>
+#include <string>
+#include <limits>
 
 #include "../configs/ring.h"
 #include "../rng_manager.h"
@@ -79,11 +83,47 @@ struct AreaDebug {
     vector<double> area;
 };
 
+enum class RingObservable {
+    vel_cm, // Velocidade do centro de massa (2 colunas)
+    cm, // Centro de massa no passo atual, dentro do espaço periódico (2 colunas)
+    area, // Área (com sinal) do polígono formado pelas partículas (1 coluna)
+    perimeter, // Perímetro do polígono formado pelas partículas (1 coluna)
+    gyration, // Tensor de giro: R_xx, R_xy, R_yy (3 colunas)
+    asphericity, // Asfericidade: 1 - 4 det(R) / Tr(R)^2 (1 coluna)
+    polarity, // Vetor unitário da polarização (2 colunas)
+};
+
+int observable_size(RingObservable field) {
+    switch (field) {
+    case RingObservable::vel_cm:
+    case RingObservable::cm:
+    case RingObservable::polarity:
+        return 2;
+    case RingObservable::gyration:
+        return 3;
+    default:
+        return 1;
+    }
+}
+
 struct UpdateDebug {
     int count_zero_speed;
     bool high_vel;
 };
 
+struct StepCounters {
+    /**
+     * Contadores acumulados desde o início da simulação, atualizados pelo solver em todo
+     * passo temporal. As quantidades em um intervalo de tempo são a diferença entre os
+     * contadores no final e no início do intervalo.
+    */
+    long long num_steps = 0;
+    long long num_created = 0; // Anéis criados (fluxo de stokes)
+    long long num_removed = 0; // Anéis removidos (fluxo de stokes)
+    double active_integral = 0; // Integral no tempo do número de anéis ativos
+    long long num_invasions = 0; // Soma do número de pontos invasores em cada passo
+};
+
 class UniqueId {
 public:
     unsigned long int max_id;
@@ -176,6 +216,7 @@ public:
     vector<bool> mask;
     vector<int> rings_ids; // ids dos anéis ativos no array de anéis 
     vector<unsigned long int> unique_rings_ids; // uids dos anéis ativos
+    std::unordered_map<unsigned long int, int> uid_slots; // uid -> id do anel no array de anéis (apenas anéis ativos)
     UniqueId unique_id_mng;
 
     Vector3d old_pos; 
@@ -199,6 +240,9 @@ public:
     double sim_time;
     int num_time_steps;
 
+    // Seed base do gerador global (rand()) utilizado nos ruídos (ver `reseed_rand`).
+    unsigned int rand_seed;
+
     int num_max_rings; 
     double ring_radius;
 
@@ -208,6 +252,7 @@ public:
     Vector2d center_mass;
 
     WindowsManagerRing windows_manager;
+    vector<char> query_mark; // Marca dos anéis já visitados nas consultas espaciais
     InPolChecker in_pol_checker;
     ResolvedInv resolved_invs;
     int steps_after_resolved;
@@ -276,6 +321,7 @@ public:
     IntersectionCalculator intersect;
 
     UpdateDebug update_debug = {0, false};
+    StepCounters counters;
     SpringDebug spring_debug = {0};
     ExcludedVolDebug excluded_vol_debug = {0};
     AreaDebug area_debug = {0};
@@ -293,9 +339,10 @@ public:
         std::cout << "Número de Threads disponíveis: " << NTHREADS << std::endl;
 
         if (seed != -1.)
-            srand(seed);
+            rand_seed = seed;
         else
-            srand(time(0));
+            rand_seed = time(0);
+        srand(rand_seed);
 
         // Inicialização dos anéis na memória
         if (stokes_cfg.num_max_rings > 0) {
@@ -327,6 +374,7 @@ public:
                 mask[i] = true;
                 rings_ids[i] = i;
                 unique_rings_ids[i] = unique_id_mng.new_id();
+                uid_slots[unique_rings_ids[i]] = i;
             } else {
                 mask[i] = false;
             }
@@ -612,6 +660,7 @@ public:
         for (size_t i = 0; i < mask.size(); i++) {
             mask[i] = false;
         }
+        uid_slots.clear();
 
         for (size_t i = 0; i < ids_cp.size(); i++) {
             int id = ids_cp[i];
@@ -619,6 +668,7 @@ public:
             pos[id] = pos_cp[i];
             self_prop_angle[id] = angle_cp[i];
             unique_rings_ids[id] = uids_cp[i];
+            uid_slots[uids_cp[i]] = id;
             mask[id] = true;
             rings_ids[i] = id;
         }
@@ -626,6 +676,41 @@ public:
         unique_id_mng.max_id = max_uid;
     }
 
+    std::string get_stokes_rng_state() {
+        /**
+         * Retorna o estado serializado do gerador de números aleatórios 
+         * utilizado na criação de anéis no fluxo de stokes.
+        */
+        std::stringstream ss;
+        ss << stokes_gen;
+        return ss.str();
+    }
+
+    void set_stokes_rng_state(const std::string& state) {
+        std::stringstream ss(state);
+        ss >> stokes_gen;
+    }
+
+    void set_rand_seed(unsigned int seed) {
+        /**
+         * Seta a seed base do gerador global (rand()) utilizado nos ruídos (ver `reseed_rand`).
+        */
+        rand_seed = seed;
+    }
+
+    void reseed_rand() {
+        /**
+         * Reinicia o gerador global (rand()) com uma seed derivada de `rand_seed` e do
+         * passo temporal atual. Chamado no início de cada passo temporal, então o estado do
+         * gerador, que não pode ser lido, é determinado por (`rand_seed`, `num_time_steps`).
+         * Assim, os checkpoints apenas precisam salvar `rand_seed`.
+        */
+        std::seed_seq seq{rand_seed, (unsigned int)num_time_steps};
+        unsigned int step_seed;
+        seq.generate(&step_seed, &step_seed + 1);
+        srand(step_seed);
+    }
+
     void recalculate_rings_ids() {
         /**
          * Recalcula a lista dos ids dos anéis que estão
@@ -651,6 +736,7 @@ public:
         for (size_t i = 0; i < mask.size(); i++) {
             if (mask[i] == false) {
                 unique_rings_ids[i] = unique_id_mng.new_id();
+                uid_slots[unique_rings_ids[i]] = i;
                 pos[i] = stokes_init_pos[add_ring_id];
                 
                 // self_prop_angle[i] = stokes_init_self_angle;
@@ -661,6 +747,7 @@ public:
                 mask[i] = true;
                 num_active_rings += 1;
                 to_recalculate_ids = true;
+                counters.num_created += 1;
                 
                 calc_ring_center_mass(i);
                 windows_manager.update_entity(i);
@@ -673,9 +760,33 @@ public:
     }
 
     void remove_ring(int ring_id) {
-        mask[ring_id] = false;
-        num_active_rings -= 1;
-        to_recalculate_ids = true;
+        // Pode ser chamado dentro de loops paralelos (ver 'advance_time_stokes').
+        #pragma omp critical(remove_ring)
+        {
+            uid_slots.erase(unique_rings_ids[ring_id]);
+            mask[ring_id] = false;
+            num_active_rings -= 1;
+            to_recalculate_ids = true;
+            counters.num_removed += 1;
+        }
+    }
+
+    void update_counters() {
+        // Chamado no final de cada passo temporal.
+        counters.num_steps += 1;
+        counters.active_integral += num_active_rings * dt;
+        counters.num_invasions += in_pol_checker.num_inside_points;
+    }
+
+    int slot_of(unsigned long int uid) {
+        /**
+         * Id (posição no array de anéis) do anel ativo com uid 'uid', ou -1 se 
+         * esse anel não está ativo.
+        */
+        auto it = uid_slots.find(uid);
+        if (it == uid_slots.end())
+            return -1;
+        return it->second;
     }
 
     void periodic_border(array<double, 2>& p){
@@ -1859,6 +1970,8 @@ public:
     }
 
     void update_normal() {
+        reseed_rand();
+
         #if DEBUG == 1
         rng_manager.update();
         #endif
@@ -1884,11 +1997,14 @@ public:
         update_graph_points();   
         #endif
 
+        update_counters();
         sim_time += dt;
         num_time_steps += 1;
     }
 
     void update_windows() {
+        reseed_rand();
+
         #if DEBUG == 1
         rng_manager.update();
         #endif
@@ -1922,11 +2038,14 @@ public:
         // calc_forces_windows();   
         #endif
 
+        update_counters();
         sim_time += dt;
         num_time_steps += 1;
     }
 
     void update_stokes() {
+        reseed_rand();
+
         #if DEBUG == 1
         rng_manager.update();
 
@@ -1978,6 +2097,7 @@ public:
         update_graph_points();   
         #endif
 
+        update_counters();
         sim_time += dt;
         num_time_steps += 1;
     }
@@ -2114,4 +2234,239 @@ public:
         array<int, 2> null_id = {-1, -1};
         return null_id;
     }
+
+    void ring_observables(const vector<RingObservable>& fields, double* out) {
+        /**
+         * Calcula os observáveis 'fields' de todos os anéis ativos em um único
+         * loop paralelo. O resultado é escrito em 'out', que deve ter tamanho
+         * 'num_active_rings * (soma dos tamanhos dos campos)': cada linha é um anel ativo,
+         * na ordem de 'rings_ids', e as colunas são os campos na ordem de 'fields'
+         * (ver 'observable_size').
+         * 
+         * Os observáveis geométricos são calculados com as posições do passo atual, 
+         * sem a quebra dos anéis na borda periódica.
+        */
+        int num_cols = 0;
+        bool needs_points = false;
+        for (auto field: fields) {
+            num_cols += observable_size(field);
+            needs_points = needs_points || (field != RingObservable::vel_cm && field != RingObservable::polarity);
+        }
+
+        #pragma omp parallel
+        {
+            Vector2d points(num_particles);
+            
+            #pragma omp for schedule(dynamic, 10)
+            for (int i = 0; i < num_active_rings; i++) {
+                int ring_id = rings_ids[i];
+                auto& ring_pos = pos[ring_id];
+
+                double perimeter = 0, area = 0;
+                Vec2d cm = {0, 0};
+                if (needs_points) {
+                    points[0] = ring_pos[0];
+                    for (int p_id = 0; p_id < num_particles; p_id++) {
+                        int next_id = (p_id + 1) % num_particles;
+                        double dx = ring_pos[next_id][0] - ring_pos[p_id][0];
+                        double dy = ring_pos[next_id][1] - ring_pos[p_id][1];
+                        perimeter += periodic_dist(dx, dy);
+
+                        if (next_id != 0) 
+                            points[next_id] = {points[p_id][0] + dx, points[p_id][1] + dy};
+                        
+                        cm[0] += points[p_id][0];
+                        cm[1] += points[p_id][1];
+                    }
+                    cm[0] /= num_particles;
+                    cm[1] /= num_particles;
+                    
+                    area = calc_area(points);
+                }
+
+                double r_xx = 0, r_xy = 0, r_yy = 0;
+                if (needs_points) {
+                    for (auto& p: points) {
+                        double rx = p[0] - cm[0];
+                        double ry = p[1] - cm[1];
+                        r_xx += rx * rx;
+                        r_xy += rx * ry;
+                        r_yy += ry * ry;
+                    }
+                    r_xx /= num_particles;
+                    r_xy /= num_particles;
+                    r_yy /= num_particles;
+                }
+
+                double* row = out + (size_t)i * num_cols;
+                for (auto field: fields) {
+                    switch (field) {
+                    case RingObservable::vel_cm: {
+                        double vx = 0, vy = 0;
+                        for (auto& v: vel[ring_id]) {
+                            vx += v[0];
+                            vy += v[1];
+                        }
+                        row[0] = vx / num_particles;
+                        row[1] = vy / num_particles;
+                        break;
+                    }
+                    case RingObservable::cm: {
+                        Vec2d cm_pb = cm;
+                        periodic_border(cm_pb);
+                        row[0] = cm_pb[0];
+                        row[1] = cm_pb[1];
+                        break;
+                    }
+                    case RingObservable::area:
+                        row[0] = area;
+                        break;
+                    case RingObservable::perimeter:
+                        row[0] = perimeter;
+                        break;
+                    case RingObservable::gyration:
+                        row[0] = r_xx;
+                        row[1] = r_xy;
+                        row[2] = r_yy;
+                        break;
+                    case RingObservable::asphericity: {
+                        double trace = r_xx + r_yy;
+                        double asphericity = 0;
+                        if (trace > std::numeric_limits<double>::epsilon()) {
+                            asphericity = 1. - 4. * (r_xx * r_yy - r_xy * r_xy) / (trace * trace);
+                            asphericity = std::min(std::max(asphericity, 0.), 1.);
+                        }
+                        row[0] = asphericity;
+                        break;
+                    }
+                    case RingObservable::polarity:
+                        row[0] = cos(self_prop_angle[ring_id]);
+                        row[1] = sin(self_prop_angle[ring_id]);
+                        break;
+                    }
+                    row += observable_size(field);
+                }
+            }
+        }
+    }
+
+    void windows_range(double v_min, double v_max, double space_min, double win_size, int num_wins, 
+        int &first, int &num) {
+        /**
+         * Intervalo das janelas (em uma dimensão) que intersectam [v_min, v_max]: 
+         * first, first+1, ..., first+num-1, módulo 'num_wins' por conta das bordas periódicas.
+        */
+        double lo = (v_min - space_min) / win_size;
+        double hi = (v_max - space_min) / win_size;
+        
+        // Também cobre limites infinitos.
+        if (!(hi - lo < num_wins - 1)) {
+            first = 0;
+            num = num_wins;
+            return;
+        }
+
+        first = (int)floor(lo);
+        num = (int)floor(hi) - first + 1;
+    }
+
+    vector<int> rings_candidates(double x_min, double x_max, double y_min, double y_max) {
+        /**
+         * Ids dos anéis ativos que possuem alguma partícula nas janelas de 'windows_manager'
+         * que intersectam o retângulo [x_min, x_max] x [y_min, y_max].
+        */
+        auto & wm = windows_manager;
+        
+        int col_first, num_cols, row_first, num_rows;
+        windows_range(x_min, x_max, wm.space_info.center[0] - wm.space_info.length/2., wm.col_size, 
+            wm.num_cols, col_first, num_cols);
+        windows_range(y_min, y_max, wm.space_info.center[1] - wm.space_info.height/2., wm.row_size, 
+            wm.num_rows, row_first, num_rows);
+
+        if ((int)query_mark.size() < num_max_rings)
+            query_mark = vector<char>(num_max_rings, 0);
+
+        vector<int> candidates;
+        for (int i = 0; i < num_rows; i++) {
+            int row = ((row_first + i) % wm.num_rows + wm.num_rows) % wm.num_rows;
+            for (int j = 0; j < num_cols; j++) {
+                int col = ((col_first + j) % wm.num_cols + wm.num_cols) % wm.num_cols;
+
+                auto & window = wm.windows[row][col];
+                int cap = wm.capacity[row][col];
+                for (int k = 0; k < cap; k++) {
+                    int ring_id = window[k][0];
+                    if (query_mark[ring_id] || !mask[ring_id])
+                        continue;
+                    
+                    query_mark[ring_id] = 1;
+                    candidates.push_back(ring_id);
+                }
+            }
+        }
+
+        for (int ring_id: candidates)
+            query_mark[ring_id] = 0;
+
+        return candidates;
+    }
+
+    vector<int> rings_in_rect(double x_min, double x_max, double y_min, double y_max, double margin=-1) {
+        /**
+         * Ids dos anéis ativos cujo centro de massa está dentro do retângulo
+         * (x_min, x_max) x (y_min, y_max), em ordem crescente. Apenas os anéis nas janelas
+         * que intersectam o retângulo expandido por 'margin' são verificados, então 'margin'
+         * deve ser maior do que a distância entre o centro de um anel e suas partículas
+         * (mais o deslocamento dos anéis entre as atualizações das janelas). 
+         * Se 'margin' for negativo, é utilizado o diâmetro do anel.
+        */
+        if (margin < 0)
+            margin = 2. * ring_radius;
+
+        auto candidates = rings_candidates(x_min - margin, x_max + margin, y_min - margin, y_max + margin);
+
+        vector<int> ids;
+        for (int ring_id: candidates) {
+            auto & cm = center_mass[ring_id];
+            if ((cm[0] > x_min) && (cm[0] < x_max) && (cm[1] > y_min) && (cm[1] < y_max))
+                ids.push_back(ring_id);
+        }
+        std::sort(ids.begin(), ids.end());
+
+        return ids;
+    }
+
+    vector<int> rings_near(double x, double y, double radius, int k=-1, double margin=-1) {
+        /**
+         * Ids dos anéis ativos cujo centro de massa está a uma distância (considerando
+         * as bordas periódicas) menor ou igual a 'radius' do ponto (x, y), ordenados 
+         * pela distância. Se 'k' for positivo, apenas os 'k' anéis mais próximos são retornados.
+         * Ver 'rings_in_rect' para o significado de 'margin'.
+        */
+        if (margin < 0)
+            margin = 2. * ring_radius;
+
+        double r = radius + margin;
+        auto candidates = rings_candidates(x - r, x + r, y - r, y + r);
+
+        vector<std::pair<double, int>> dists;
+        for (int ring_id: candidates) {
+            auto & cm = center_mass[ring_id];
+            Vec2d diff = {cm[0] - x, cm[1] - y};
+            periodic_border(diff);
+            double dist = vector_mod(diff);
+            if (dist <= radius)
+                dists.push_back({dist, ring_id});
+        }
+        std::sort(dists.begin(), dists.end());
+
+        if ((k > 0) && ((int)dists.size() > k))
+            dists.resize(k);
+        
+        vector<int> ids;
+        for (auto & d: dists)
+            ids.push_back(d.second);
+        
+        return ids;
+    }
 };
\ No newline at end of file
@@ -1,3 +1,5 @@
+import numpy as np
+
 class WindowsManager:
     def __init__(p_pos, num_cols, num_rows, space_size) -> None: ...
 
@@ -21,4 +23,7 @@ class InPolChecker:
     num_inside_points = ...
     inside_points = ...
     collisions: list[ColInfo] = ...
-    is_col_resolved = ...
\ No newline at end of file
+    is_col_resolved = ...
+
+    def collisions_array() -> np.ndarray: ...
+    def inside_points_array() -> np.ndarray: ...
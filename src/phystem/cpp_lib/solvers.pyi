@@ -1,6 +1,23 @@
+import numpy as np
 from phystem.cpp_lib.data_types import *
 from phystem.cpp_lib.configs import InPolCheckerCfg
 
+class RingObservable:
+    vel_cm: RingObservable = ...
+    cm: RingObservable = ...
+    area: RingObservable = ...
+    perimeter: RingObservable = ...
+    gyration: RingObservable = ...
+    asphericity: RingObservable = ...
+    polarity: RingObservable = ...
+
+class StepCounters:
+    num_steps: int = ...
+    num_created: int = ...
+    num_removed: int = ...
+    active_integral: float = ...
+    num_invasions: int = ...
+
 class Ring:
     def __init__(self, pos0, self_prop_angle0, num_particles, dynamic_cfg, 
         height, length, dt, particle_windows_cfg, update_type, integration_type, 
@@ -31,12 +48,20 @@ class Ring:
     num_rings: int = ...
     num_particles: int = ...
     num_time_steps: int = ...
+    counters: StepCounters = ...
 
     def update_normal() -> None: ...
     def update_windows() -> None: ...
     def update_visual_aids() -> None: ...
     def load_checkpoint(pos_cp: Vector3d, angle_cp: List, ids_cp: ListInt, uids_cp: VecUInt) -> None: ...
     def get_particle_id(x, y): ...
+    def ring_observables(fields: list[RingObservable]) -> np.ndarray: ...
+    def slots_of(uids: np.ndarray) -> np.ndarray: ...
+    def rings_in_rect(x_min: float, x_max: float, y_min: float, y_max: float, margin: float=-1) -> tuple[np.ndarray, np.ndarray]: ...
+    def rings_near(x: float, y: float, radius: float, k: int=-1, margin: float=-1) -> tuple[np.ndarray, np.ndarray]: ...
+    def get_stokes_rng_state() -> str: ...
+    def set_stokes_rng_state(state: str) -> None: ...
+    def set_rand_seed(seed: int) -> None: ...
 
 class SelfPropelling:
     def __init__(self, pos0, vel0, propelling_cfg, size, dt, num_windows, seed=-1) -> None: ...
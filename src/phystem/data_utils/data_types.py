@@ -1,5 +1,7 @@
 import numpy as np
-import pickle
+import pickle, os
+import yaml
+from collections import OrderedDict
 from pathlib import Path
 from typing import TypeVar, Generic
 
@@ -14,6 +16,8 @@ class ArraySizeAware:
         com zeros.
 
         Seus dados devem ser preenchidos ponto por ponto, utilizando `self.add`.
+        Se um ponto possuir mais que `max_num_els` elementos, a segunda dimensão
+        é aumentada.
         
         Esse objeto pode ser indexado e o item retornado é `x[:n]`.
         '''
@@ -33,6 +37,12 @@ class ArraySizeAware:
 
     def update(self, id, data: np.array):
         num_elements = data.shape[0]
+        if num_elements > self.max_num_els:
+            # O ponto não cabe na segunda dimensão, que é aumentada.
+            new_data = np.zeros((self.data.shape[0], num_elements, self.data.shape[2]), dtype=self.dtype)
+            new_data[:, :self.max_num_els] = self.data
+            self.data = new_data
+
         self.data[id,:num_elements] = data
         self.point_num_elements[id] = num_elements
 
@@ -84,42 +94,351 @@ class ArraySizeAware:
     def is_full(self):
         return self.current_id >= self.data.shape[0]
 
+    @property
+    def dtype(self):
+        return self.data.dtype
+
+    def to_ragged(self):
+        "Retorna os dados em um `RaggedArray`."
+        mask = np.arange(self.max_num_els) < self.point_num_elements[:self.num_points, None]
+        ragged = RaggedArray(self.data.shape[0], self.data.shape[2], dtype=self.dtype)
+        offsets = np.zeros(self.num_points + 1, dtype=np.int64)
+        np.cumsum(self.point_num_elements[:self.num_points], out=offsets[1:])
+        
+        ragged.values = self.data[:self.num_points][mask]
+        ragged.offsets = offsets
+        ragged.current_id = self.num_points
+        return ragged
+
     @classmethod
     def empty(Cls):
         return Cls(0, 0, 0)
 
+class RaggedArray:
+    def __init__(self, num_data_points: int, num_dims: int, dtype=np.float32, chunk_size=1024) -> None:
+        '''
+        Lista de pontos de dados com número variável de elementos, em que o i-ésimo
+        ponto é um array com shape (n_i, num_dims). Os elementos de todos os pontos 
+        são guardados contiguamente em `self.values`, com shape (sum(n_i), num_dims), 
+        e o i-ésimo ponto é `self.values[self.offsets[i]:self.offsets[i+1]]`.
+
+        Possui a mesma interface de `ArraySizeAware`, mas não é necessário informar
+        o número máximo de elementos de um ponto: os arrays internos crescem em blocos
+        conforme os pontos são adicionados.
+
+        Parâmetros:
+        -----------
+        num_data_points:
+            Número de pontos a partir do qual o array é considerado cheio (`self.is_full`).
+        
+        chunk_size:
+            Número mínimo de elementos alocados sempre que o array precisa crescer.
+        '''
+        self.num_data_points = num_data_points
+        self.num_dims = num_dims
+        self.chunk_size = chunk_size
+
+        self._values = np.empty((chunk_size, num_dims), dtype=dtype)
+        self._offsets = np.zeros(max(num_data_points, 1) + 1, dtype=np.int64)
+        self.current_id = 0
+
+    @property
+    def values(self) -> np.ndarray:
+        "Elementos de todos os pontos, com shape (num_elements, num_dims)."
+        return self._values[:self.num_elements]
+    
+    @values.setter
+    def values(self, value: np.ndarray):
+        self._values = value
+
+    @property
+    def offsets(self) -> np.ndarray:
+        "Índice em `self.values` do primeiro elemento de cada ponto, com tamanho `num_points + 1`."
+        return self._offsets[:self.current_id + 1]
+
+    @offsets.setter
+    def offsets(self, value: np.ndarray):
+        self._offsets = value
+
+    @property
+    def point_num_elements(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    @property
+    def num_elements(self):
+        return int(self._offsets[self.current_id])
+
+    @property
+    def dtype(self):
+        return self._values.dtype
+
+    def _reserve(self, num_points: int, num_elements: int):
+        "Garante espaço para mais `num_points` pontos com um total de `num_elements` elementos."
+        required = self.num_elements + num_elements
+        if required > self._values.shape[0]:
+            new_size = max(required, 2 * self._values.shape[0], self.chunk_size)
+            values = np.empty((new_size, self.num_dims), dtype=self.dtype)
+            values[:self.num_elements] = self.values
+            self._values = values
+        
+        required = self.current_id + num_points + 1
+        if required > self._offsets.size:
+            offsets = np.zeros(max(required, 2 * self._offsets.size), dtype=np.int64)
+            offsets[:self.current_id + 1] = self.offsets
+            self._offsets = offsets
+
+    def add(self, data: np.array):
+        '''
+        Adiciona um novo ponto de dados no array. `data` deve
+        ter o shape (n, num_dims).
+        '''
+        if len(data.shape) == 1:
+            data = data[:, None]
+        
+        num_elements = data.shape[0]
+        self._reserve(1, num_elements)
+        
+        start = self.num_elements
+        self._values[start:start + num_elements] = data
+        self._offsets[self.current_id + 1] = start + num_elements
+        self.current_id += 1
+
+    def add_multiple(self, data: np.ndarray, num_elements):
+        '''
+        Adiciona os múltiplos pontos em `data`.
+        
+        # Parâmetros
+        ------------
+        data:
+            Array com shape (num_points, max_num_els, num_dims) contendo
+            os pontes a serem salvos
+        num_elements:
+            Array com 1-D de tamanho num_points, contento quantos elementos
+            cada ponto possui.
+        '''
+        num_elements = np.asarray(num_elements, dtype=np.int64)
+        num_points = data.shape[0]
+        mask = np.arange(data.shape[1]) < num_elements[:, None]
+        flat_data = data[mask]
+
+        self._reserve(num_points, flat_data.shape[0])
+
+        start = self.num_elements
+        self._values[start:start + flat_data.shape[0]] = flat_data.reshape(-1, self.num_dims)
+        self._offsets[self.current_id + 1:self.current_id + num_points + 1] = start + np.cumsum(num_elements)
+        self.current_id += num_points
+
+    def reset(self):
+        self.current_id = 0
+
+    def strip(self):
+        "Libera o espaço alocado que não está sendo utilizado."
+        self._values = self.values.copy()
+        self._offsets = self.offsets.copy()
+
+    def point_ids(self) -> np.ndarray:
+        "Índice do ponto de cada elemento em `self.values`."
+        return np.repeat(np.arange(self.num_points), self.point_num_elements)
+
+    def point_sum(self, values: np.ndarray=None) -> np.ndarray:
+        '''
+        Soma dos elementos de cada ponto. Se `values` for passado, ele deve ter
+        o mesmo número de linhas que `self.values` e sua soma por ponto é retornada.
+        '''
+        if values is None:
+            values = self.values
+        
+        sums = np.zeros((self.num_points, *values.shape[1:]), dtype=values.dtype)
+        non_empty = self.point_num_elements > 0
+        if non_empty.any():
+            sums[non_empty] = np.add.reduceat(values, self.offsets[:-1][non_empty], axis=0)
+        return sums
+
+    def to_padded(self, fill_value=0) -> np.ndarray:
+        "Retorna os dados no formato de `ArraySizeAware.data`, com shape (num_points, max_num_els, num_dims)."
+        num_elements = self.point_num_elements
+        max_num_els = num_elements.max() if self.num_points > 0 else 0
+        
+        padded = np.full((self.num_points, max_num_els, self.num_dims), fill_value, dtype=self.dtype)
+        padded[np.arange(max_num_els) < num_elements[:, None]] = self.values
+        return padded
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.num_points)
+            if step != 1:
+                raise ValueError("Apenas fatias com passo 1 são suportadas.")
+            
+            ragged = RaggedArray(stop - start, self.num_dims, self.dtype)
+            ragged.values = self._values[self._offsets[start]:self._offsets[stop]]
+            ragged.offsets = self._offsets[start:stop+1] - self._offsets[start]
+            ragged.current_id = max(stop - start, 0)
+            return ragged
+
+        if key >= self.num_points:
+            raise IndexError(f"Id {key} fora das bordas [0, {self.num_points}-1].")
+        return self._values[self._offsets[key]:self._offsets[key+1]]
+
+    @property
+    def num_points(self):
+        return self.current_id
+
+    def __len__(self):
+        return self.num_points
+
+    @property
+    def is_full(self):
+        return self.current_id >= self.num_data_points
+
+    def __getstate__(self):
+        # Apenas os dados preenchidos são salvos.
+        state = self.__dict__.copy()
+        state["_values"] = self.values
+        state["_offsets"] = self.offsets
+        return state
+
+    @classmethod
+    def from_arrays(Cls, values: np.ndarray, offsets: np.ndarray):
+        '''
+        Cria um `RaggedArray` que utiliza diretamente os arrays `values` e `offsets` 
+        (que podem ser mapeados em memória), sem copiá-los.
+        '''
+        ragged = Cls.__new__(Cls)
+        ragged.num_data_points = offsets.size - 1
+        ragged.num_dims = values.shape[1]
+        ragged.chunk_size = 1024
+        ragged._values = values
+        ragged._offsets = offsets
+        ragged.current_id = offsets.size - 1
+        return ragged
+
+    @classmethod
+    def empty(Cls):
+        return Cls(0, 0)
+
+def as_ragged(data: ArraySizeAware | RaggedArray) -> RaggedArray:
+    "Retorna `data` como um `RaggedArray`, convertendo se necessário."
+    if isinstance(data, RaggedArray):
+        return data
+    return data.to_ragged()
+
+class ShardFiles:
+    '''
+    Arquivos de uma lista de dados (`RaggedArray`) dividida em vários arquivos (shards),
+    que é lida por `MultFileList`. 
+
+    O i-ésimo shard é salvo nos arquivos "{name}_{i}_values.npy" e "{name}_{i}_offsets.npy", 
+    e o arquivo "{name}_manifest.yaml" contém o número de pontos em cada shard.
+    '''
+    def __init__(self, root_path: Path, name: str) -> None:
+        self.root_path = Path(root_path)
+        self.name = name
+        self.manifest_path = self.root_path / f"{name}_manifest.yaml"
+
+    def values_path(self, file_id):
+        return self.root_path / f"{self.name}_{file_id}_values.npy"
+
+    def offsets_path(self, file_id):
+        return self.root_path / f"{self.name}_{file_id}_offsets.npy"
+
+    def load_manifest(self) -> dict:
+        with open(self.manifest_path, "r") as f:
+            return yaml.unsafe_load(f)
+
+    def save(self, data: RaggedArray, file_id: int):
+        '''
+        Salva `data` como o shard `file_id`. Shards com id maior que `file_id`
+        são removidos do manifesto.
+        '''
+        np.save(self.values_path(file_id), data.values)
+        np.save(self.offsets_path(file_id), data.offsets)
+
+        shards = []
+        if self.manifest_path.exists():
+            shards = self.load_manifest()["shards"]
+        shards = shards[:file_id] + [0] * (file_id - len(shards)) + [data.num_points]
+
+        temp_path = self.manifest_path.with_suffix(".temp")
+        with open(temp_path, "w") as f:
+            yaml.dump({"num_dims": data.num_dims, "dtype": data.dtype.str, "shards": shards}, f)
+        os.replace(temp_path, self.manifest_path)
+
+    def load(self, file_id: int, mmap_mode="r") -> RaggedArray:
+        return RaggedArray.from_arrays(
+            values=np.load(self.values_path(file_id), mmap_mode=mmap_mode),
+            offsets=np.load(self.offsets_path(file_id)),
+        )
+
 ListT = TypeVar('ListT')
 ItemT = TypeVar('ItemT')
 class MultFileList(Generic[ListT, ItemT]):
-    def __init__(self, root_path: Path, name: str) -> None:
+    def __init__(self, root_path: Path, name: str, cache_size=4) -> None:
         '''
         Iterador e indexador de uma lista de dados que está distribuída em vários arquivos.
 
-        Os arquivos devem estar no caminho `root_path` e o nome do i-ésimo arquivo 
-        deve ser "{name}_{i}.pickle". Cada arquivo deve conter uma fatia da lista
-        com um número fixo de elementos.
+        Os arquivos devem estar no caminho `root_path` e podem estar em um dos formatos:
+
+        - Shards salvos com `ShardFiles`, que são mapeados em memória. O número de pontos
+        em cada arquivo é lido do manifesto, então não é necessário carregar nenhum arquivo.
+        
+        - Formato antigo: o nome do i-ésimo arquivo deve ser "{name}_{i}.pickle". Cada 
+        arquivo deve conter uma fatia da lista com um número fixo de elementos.
+
+        Parâmetros:
+        -----------
+        cache_size:
+            Número máximo de arquivos mantidos abertos ao mesmo tempo.
         '''
         self.root_path = Path(root_path)
         self.name = name
-        self.num_files = len(list(self.root_path.glob(f"{self.name}_[0-9]*")))
+        self.cache_size = max(cache_size, 1)
+        self.shard_files = ShardFiles(self.root_path, self.name)
+        self.is_sharded = self.shard_files.manifest_path.exists()
         
-        self.data = self._load_file(0)
-        self.num_data_points_per_file = len(self.data)
-        # self.num_data_points_per_file = self.data.data.shape[0]
+        self._cache: OrderedDict[int, ListT] = OrderedDict()
+
+        if self.is_sharded:
+            points_per_file = self.shard_files.load_manifest()["shards"]
+            self.num_files = len(points_per_file)
+            self.num_data_points_per_file = points_per_file[0] if self.num_files > 0 else 0
+        else:
+            self.num_files = len(list(self.root_path.glob(f"{self.name}_[0-9]*.pickle")))
+            self.num_data_points_per_file = len(self._load_file(0))
+            
+            points_per_file = [self.num_data_points_per_file] * (self.num_files - 1)
+            points_per_file.append(len(self._load_file(self.num_files-1)))
+
+        # Índice global do primeiro ponto de cada arquivo.
+        self._file_starts = np.zeros(self.num_files + 1, dtype=np.int64)
+        np.cumsum(points_per_file, out=self._file_starts[1:])
 
         self._id = 0
         self._file_id = 0
-        self._num_total_points = (self.num_files - 1) * self.num_data_points_per_file + len(self._load_file(self.num_files-1))
+        self._num_total_points = int(self._file_starts[-1])
 
     def _reset(self):
         self._id = 0
-        self.file_id = 0
 
-    def _load_file(self, file_id) -> ListT:
+    def _read_file(self, file_id) -> ListT:
+        if self.is_sharded:
+            return self.shard_files.load(file_id)
+
         with open(self.root_path / f"{self.name}_{file_id}.pickle", "rb") as f:
             data = pickle.load(f)
         return data
 
+    def _load_file(self, file_id) -> ListT:
+        "Retorna os dados do arquivo `file_id`, utilizando os arquivos em cache quando possível."
+        if file_id in self._cache:
+            self._cache.move_to_end(file_id)
+            return self._cache[file_id]
+
+        data = self._read_file(file_id)
+        self._cache[file_id] = data
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return data
+
     @property
     def file_id(self):
         '''Id do arquivo atualmente aberto.'''
@@ -127,42 +446,41 @@ class MultFileList(Generic[ListT, ItemT]):
     
     @file_id.setter
     def file_id(self, value):
-        if value != self.file_id:
-            self._file_id = value
-            self.data = self._load_file(self.file_id)
+        self._file_id = value
+
+    @property
+    def data(self) -> ListT:
+        '''Dados do arquivo atualmente aberto.'''
+        return self._load_file(self.file_id)
 
     def get_file(self, file_id):
         self.file_id = file_id
         return self.data
 
     def _get_ids(self, id):
-        file_id = id // self.num_data_points_per_file
-        point_id = id - file_id * self.num_data_points_per_file
+        file_id = int(np.searchsorted(self._file_starts, id, side="right")) - 1
+        point_id = id - self._file_starts[file_id]
         return file_id, point_id
 
     def __getitem__(self, key) -> ItemT:
+        if key < 0:
+            key += self._num_total_points
+        if key < 0 or key >= self._num_total_points:
+            raise IndexError(f"Id {key} fora das bordas [0, {self._num_total_points}-1].")
+        
         fid, pid = self._get_ids(key)
-        self.file_id = fid
-        return self.data[pid]
+        return self.get_file(fid)[pid]
 
     def __iter__(self):
         self._reset()
         return self
 
     def __next__(self) -> ItemT:
-        fid, pid = self._get_ids(self._id)
-        
-        if fid < self.num_files:
-            self.file_id = fid
-        else:
-            self._reset()
-            raise StopIteration
-
-        if self.file_id == (self.num_files - 1) and pid >= len(self.data):
+        if self._id >= self._num_total_points:
             self._reset()
             raise StopIteration
 
-        item = self.data[pid]
+        item = self[self._id]
         self._id += 1
         return item
     
@@ -0,0 +1,346 @@
+'''
+Armazenamento consolidado de frames (snapshots) com número variável de linhas.
+
+Cada campo é salvo em um único arquivo binário "{campo}.bin", em que os frames
+são escritos um após o outro. O arquivo "index.bin" contém, para cada frame,
+o tempo, a linha inicial e o número de linhas do frame, então o intervalo de bytes
+de um frame em qualquer campo é conhecido sem ler os outros frames. O arquivo
+"fields.yaml" contém o dtype e o shape de uma linha de cada campo.
+
+Opcionalmente (ver "options.yaml"):
+
+* Campos quantizados: o campo "{nome}" é salvo nos campos "{nome}_center",
+"{nome}_offsets" e "{nome}_scale" (ver `phystem.data_utils.quantize`) e é
+decodificado na leitura. Se o espaço tem bordas periódicas, o seu tamanho ("box")
+também é salvo, e as linhas que cruzam a borda são desfeitas antes da quantização.
+
+* Compressão: os bytes de cada campo em cada frame são comprimidos separadamente
+(zlib ou lzma). Antes da compressão, os bytes são reordenados por significância 
+(todos os primeiros bytes de cada elemento, depois todos os segundos, etc.), o que 
+aumenta bastante a compressão de dados numéricos. O arquivo "chunks.bin" contém, para
+cada frame e campo, o byte inicial e o tamanho dos dados comprimidos.
+'''
+from pathlib import Path
+import os, zlib, lzma
+
+import numpy as np
+import yaml
+
+from .quantize import encode_rows, decode_rows
+
+INDEX_DTYPE = np.dtype([("time", "<f8"), ("start", "<i8"), ("num", "<i8")])
+
+COMPRESSORS = {
+    "zlib": (zlib.compress, zlib.decompress),
+    "lzma": (lzma.compress, lzma.decompress),
+}
+
+def _shuffle(data: np.ndarray) -> bytes:
+    "Bytes de `data` reordenados por significância."
+    return np.ascontiguousarray(data.view(np.uint8).reshape(-1, data.dtype.itemsize).T).tobytes()
+
+def _unshuffle(data: bytes, dtype: np.dtype) -> np.ndarray:
+    "Inverso de `_shuffle`."
+    data = np.frombuffer(data, dtype=np.uint8).reshape(dtype.itemsize, -1)
+    return np.ascontiguousarray(data.T).view(dtype).reshape(-1)
+
+def _quantized_fields(name: str, dtype, shape: tuple):
+    "Campos em que o campo quantizado `name` é salvo."
+    return {
+        f"{name}_center": (np.dtype(np.float32), (shape[-1],)),
+        f"{name}_offsets": (np.dtype(np.int16), tuple(shape)),
+        f"{name}_scale": (np.dtype(np.float32), ()),
+    }
+
+def _read_options(root_path: Path):
+    path = Path(root_path) / "options.yaml"
+    options = {"compression": None, "quantized": {}, "box": None}
+    if path.exists():
+        with open(path, "r") as f:
+            options.update(yaml.unsafe_load(f))
+    options["quantized"] = {name: (np.dtype(dtype), tuple(shape)) 
+        for name, (dtype, shape) in options["quantized"].items()}
+    return options
+
+class FrameStoreWriter:
+    def __init__(self, root_path: Path, fields: dict[str, tuple]=None, buffer_size=2**20,
+        quantized: list[str]=(), compression: str=None, box: tuple[float]=None) -> None:
+        '''
+        Escreve frames no armazenamento consolidado em `root_path`, sempre no final
+        dos arquivos. Os dados são bufferizados e o índice apenas é escrito após os
+        dados de todos os campos, em `flush`, então o índice nunca aponta
+        para dados que não estão no disco.
+
+        Parâmetros:
+        -----------
+        fields:
+            Dicionário com o nome de cada campo e a tupla (dtype, shape de uma linha).
+            Se for `None`, os campos são lidos de um armazenamento existente em `root_path`,
+            e os novos frames são escritos após os já existentes.
+
+        buffer_size:
+            Tamanho (em bytes) do buffer de escrita de cada campo.
+
+        quantized:
+            Nomes dos campos que são quantizados (ver `phystem.data_utils.quantize`).
+            Esses campos devem ter shape (N, ..., d) e são decodificados na leitura como float.
+        
+        compression:
+            Compressão utilizada nos dados de cada frame: `None`, "zlib" ou "lzma".
+
+        box:
+            Tamanho, em cada dimensão, do espaço com bordas periódicas (centrado na origem)
+            dos campos quantizados. Se for `None`, o espaço não é periódico.
+
+        Se `fields` for `None`, `quantized`, `compression` e `box` também são lidos do armazenamento existente.
+        '''
+        self.root_path = Path(root_path)
+        self.root_path.mkdir(parents=True, exist_ok=True)
+        self.buffer_size = buffer_size
+
+        fields_path = self.root_path / "fields.yaml"
+        reopen = fields is None
+        if reopen:
+            with open(fields_path, "r") as f:
+                fields = yaml.unsafe_load(f)
+            options = _read_options(self.root_path)
+            self.quantized = options["quantized"]
+            self.compression = options["compression"]
+            self.box = options["box"]
+        else:
+            if compression is not None and compression not in COMPRESSORS:
+                raise ValueError(f"Compressão '{compression}' não suportada. As opções são {list(COMPRESSORS)}.")
+            
+            self.compression = compression
+            self.box = None if box is None else [float(size) for size in box]
+            self.quantized = {}
+            raw_fields = {}
+            for name, (dtype, shape) in fields.items():
+                if name in quantized:
+                    self.quantized[name] = (np.dtype(dtype), tuple(shape))
+                    raw_fields.update(_quantized_fields(name, dtype, shape))
+                else:
+                    raw_fields[name] = (dtype, shape)
+
+            fields = {name: (np.dtype(dtype).str, tuple(shape)) for name, (dtype, shape) in raw_fields.items()}
+            # A ordem dos campos define a ordem das colunas de "chunks.bin".
+            with open(fields_path, "w") as f:
+                yaml.dump(fields, f, sort_keys=False)
+
+            with open(self.root_path / "options.yaml", "w") as f:
+                yaml.dump({
+                    "compression": self.compression,
+                    "quantized": {name: (dtype.str, shape) for name, (dtype, shape) in self.quantized.items()},
+                    "box": self.box,
+                }, f)
+
+        self.fields = {name: (np.dtype(dtype), tuple(shape)) for name, (dtype, shape) in fields.items()}
+        self.index_path = self.root_path / "index.bin"
+        self.index_path.touch()
+        self.chunks_path = self.root_path / "chunks.bin"
+        if self.compression:
+            self.chunks_path.touch()
+
+        index = np.fromfile(self.index_path, dtype=INDEX_DTYPE)
+        self._set_sizes(index)
+        self._open()
+
+        if reopen:
+            # Descarta dados escritos após o último frame presente no índice.
+            self.truncate(self.num_frames)
+
+    def _set_sizes(self, index: np.ndarray):
+        self.num_frames = index.size
+        self.num_rows = int(index["start"][-1] + index["num"][-1]) if index.size > 0 else 0
+        
+        # Número de bytes (comprimidos) de cada campo.
+        self.num_bytes = np.zeros(len(self.fields), dtype=np.int64)
+        if self.compression and index.size > 0:
+            chunks = self.read_chunks()[index.size-1]
+            self.num_bytes = chunks[:, 0] + chunks[:, 1]
+
+    def read_chunks(self):
+        return np.fromfile(self.chunks_path, dtype=np.int64).reshape(-1, len(self.fields), 2)
+
+    def _open(self):
+        self.files = {name: open(self.root_path / f"{name}.bin", "ab", buffering=self.buffer_size)
+            for name in self.fields}
+        self.pending_index = []
+        self.pending_chunks = []
+
+    def append(self, time: float, **arrays: np.ndarray):
+        '''
+        Adiciona um frame no tempo `time`. Deve ser passado um array
+        para cada campo, todos com o mesmo número de linhas.
+        '''
+        for name in self.quantized:
+            data = arrays.pop(name)
+            arrays[f"{name}_center"], arrays[f"{name}_offsets"], arrays[f"{name}_scale"] = encode_rows(data, self.box)
+
+        num = None
+        chunks = []
+        for field_id, (name, (dtype, shape)) in enumerate(self.fields.items()):
+            data = np.ascontiguousarray(arrays[name], dtype=dtype)
+            if num is None:
+                num = data.shape[0]
+            if data.shape != (num, *shape):
+                raise ValueError(f"Campo '{name}' com shape {data.shape}, mas deveria ser {(num, *shape)}.")
+            
+            if self.compression:
+                data = COMPRESSORS[self.compression][0](_shuffle(data))
+                chunks.append((self.num_bytes[field_id], len(data)))
+                self.num_bytes[field_id] += len(data)
+            else:
+                data = data.tobytes()
+            self.files[name].write(data)
+
+        if self.compression:
+            self.pending_chunks.append(chunks)
+        self.pending_index.append((time, self.num_rows, num))
+        self.num_rows += num
+        self.num_frames += 1
+
+    def flush(self):
+        "Escreve no disco os frames bufferizados."
+        for f in self.files.values():
+            f.flush()
+
+        if self.pending_chunks:
+            with open(self.chunks_path, "ab") as f:
+                f.write(np.array(self.pending_chunks, dtype=np.int64).tobytes())
+            self.pending_chunks = []
+
+        if self.pending_index:
+            with open(self.index_path, "ab") as f:
+                f.write(np.array(self.pending_index, dtype=INDEX_DTYPE).tobytes())
+            self.pending_index = []
+
+    def truncate(self, num_frames: int):
+        '''
+        Remove os frames a partir do frame `num_frames`. Utilizado para
+        voltar ao estado de um auto-salvamento.
+        '''
+        self.close()
+
+        index = np.fromfile(self.index_path, dtype=INDEX_DTYPE)[:num_frames]
+        self._set_sizes(index)
+
+        with open(self.index_path, "r+b") as f:
+            f.truncate(index.nbytes)
+        if self.compression:
+            with open(self.chunks_path, "r+b") as f:
+                f.truncate(index.size * len(self.fields) * 2 * np.dtype(np.int64).itemsize)
+
+        for field_id, (name, (dtype, shape)) in enumerate(self.fields.items()):
+            if self.compression:
+                size = self.num_bytes[field_id]
+            else:
+                size = self.num_rows * dtype.itemsize * int(np.prod(shape))
+            
+            with open(self.root_path / f"{name}.bin", "r+b") as f:
+                f.truncate(size)
+
+        self._open()
+
+    def close(self):
+        self.flush()
+        for f in self.files.values():
+            f.close()
+
+class FrameStore:
+    def __init__(self, root_path: Path) -> None:
+        '''
+        Leitor do armazenamento consolidado em `root_path`. Os campos são abertos
+        com `np.memmap`, então o acesso a um frame qualquer apenas lê os seus bytes.
+        Se o armazenamento ainda está sendo escrito, utilize `refresh` para
+        enxergar os novos frames.
+        '''
+        self.root_path = Path(root_path)
+
+        with open(self.root_path / "fields.yaml", "r") as f:
+            fields = yaml.unsafe_load(f)
+        self.fields = {name: (np.dtype(dtype), tuple(shape)) for name, (dtype, shape) in fields.items()}
+        self.field_ids = {name: field_id for field_id, name in enumerate(self.fields)}
+
+        options = _read_options(self.root_path)
+        self.quantized = options["quantized"]
+        self.compression = options["compression"]
+        self.box = options["box"]
+
+        self.refresh()
+
+    @staticmethod
+    def exists(root_path: Path):
+        return (Path(root_path) / "index.bin").exists()
+
+    def refresh(self):
+        self.index = np.fromfile(self.root_path / "index.bin", dtype=INDEX_DTYPE)
+        if self.compression:
+            self.chunks = np.fromfile(self.root_path / "chunks.bin", dtype=np.int64).reshape(-1, len(self.fields), 2)
+            self.index = self.index[:self.chunks.shape[0]]
+        self._data: dict[str, np.ndarray] = {}
+
+    @property
+    def names(self):
+        "Nomes dos campos, com os campos quantizados no lugar dos campos em que são salvos."
+        raw_names = set()
+        for name, (dtype, shape) in self.quantized.items():
+            raw_names.update(_quantized_fields(name, dtype, shape))
+        return [name for name in self.fields if name not in raw_names] + list(self.quantized)
+
+    def _field(self, name) -> np.ndarray:
+        if name not in self._data:
+            path = self.root_path / f"{name}.bin"
+            dtype, shape = self.fields[name]
+            if self.compression:
+                dtype, shape = np.uint8, ()
+            
+            if os.path.getsize(path) == 0:
+                self._data[name] = np.empty((0, *shape), dtype=dtype)
+            else:
+                self._data[name] = np.memmap(path, dtype=dtype, mode="r").reshape(-1, *shape)
+        return self._data[name]
+
+    def get_raw(self, name: str, frame: int) -> np.ndarray:
+        "Dados salvos do campo `name` no frame `frame`, sem a decodificação dos campos quantizados."
+        _, start, num = self.index[frame]
+        if not self.compression:
+            return self._field(name)[start:start+num]
+        
+        dtype, shape = self.fields[name]
+        byte_start, size = self.chunks[frame, self.field_ids[name]]
+        data = COMPRESSORS[self.compression][1](self._field(name)[byte_start:byte_start+size])
+        return _unshuffle(data, dtype).reshape(num, *shape)
+
+    @property
+    def num_frames(self):
+        return self.index.size
+
+    @property
+    def times(self):
+        return self.index["time"]
+
+    def get(self, name: str, frame: int) -> np.ndarray:
+        '''
+        Dados do campo `name` no frame `frame`. Os campos quantizados são decodificados
+        para o seu dtype original.
+        '''
+        if name in self.quantized:
+            return decode_rows(
+                self.get_raw(f"{name}_center", frame), 
+                self.get_raw(f"{name}_offsets", frame),
+                self.get_raw(f"{name}_scale", frame),
+                dtype=self.quantized[name][0],
+                box=self.box,
+            )
+        return self.get_raw(name, frame)
+
+    def __getitem__(self, frame: int) -> dict[str, np.ndarray]:
+        return {name: self.get(name, frame) for name in self.names}
+
+    def __len__(self):
+        return self.num_frames
+
+    def __iter__(self):
+        for frame in range(self.num_frames):
+            yield self[frame]
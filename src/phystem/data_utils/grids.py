@@ -104,7 +104,24 @@ class RetangularGrid:
         else:
             return  data[:-2, :-2]
 
-    def count(self, coords: np.ndarray, end_id: np.ndarray=None, remove_out_of_bounds=False, simplify_shape=False):
+    def _flat_cell_ids(self, coords: np.ndarray, offsets: np.ndarray):
+        '''
+        Dado as coordenadas `coords` (shape (N, 2)) de várias camadas concatenadas, em que a 
+        camada i é `coords[offsets[i]:offsets[i+1]]`, retorna o índice de cada coordenada no
+        array achatado de shape (num_camadas, N_l + 2, N_c + 2) e o número de camadas.
+        '''
+        num_layers = offsets.size - 1
+        num_rows, num_cols = self.shape[1] + 2, self.shape[0] + 2
+        layer_ids = np.repeat(np.arange(num_layers), np.diff(offsets))
+        
+        # Coordenadas -1 se referem à última linha/coluna, assim como na indexação com arrays.
+        rows = coords[:, 1] % num_rows
+        cols = coords[:, 0] % num_cols
+        
+        return (layer_ids * num_rows + rows) * num_cols + cols, num_layers
+
+    def count(self, coords: np.ndarray, end_id: np.ndarray=None, remove_out_of_bounds=False, simplify_shape=False,
+        offsets: np.ndarray=None):
         '''
         Contagem da quantidade de pontos em cada célula da grade, dado as coordenadas dos pontos
         na grade `coords`.
@@ -113,6 +130,10 @@ class RetangularGrid:
         -----------
         end_id:
             Array 1-D com os elementos a serem considerados em coords. Ver doc de `self.sum_by_cell`.
+        
+        offsets:
+            Se for passado, `coords` contém as coordenadas de todas as camadas concatenadas 
+            (formato de `RaggedArray`). Ver doc de `self.sum_by_cell`.
 
         Retorno:
         --------
@@ -121,18 +142,23 @@ class RetangularGrid:
             é a contagem da célula localizada na i-ésima linha e j-ésima coluna da grade.
             O índice (0, 0) é a célula no canto esquerdo inferior.
         '''
-        coords = self.adjust_shape(coords, arr_name="coords")
+        if offsets is not None:
+            cell_ids, num_layers = self._flat_cell_ids(coords, offsets)
+            count_grid_shape = (num_layers, *self.shape_mpl_t)
+            count_grid = np.bincount(cell_ids, minlength=np.prod(count_grid_shape)).reshape(count_grid_shape)
+        else:
+            coords = self.adjust_shape(coords, arr_name="coords")
 
-        count_grid_shape = [coords.shape[0], *[i+2 for i in self.shape]]
-        count_grid = np.zeros(count_grid_shape, dtype=int)
-        for idx, coords_i in enumerate(coords):
-            if end_id is not None:
-                coords_i = coords_i[:end_id[idx]]
+            count_grid_shape = [coords.shape[0], *[i+2 for i in self.shape]]
+            count_grid = np.zeros(count_grid_shape, dtype=int)
+            for idx, coords_i in enumerate(coords):
+                if end_id is not None:
+                    coords_i = coords_i[:end_id[idx]]
 
-            unique_coords, count = np.unique(coords_i, axis=0, return_counts=True)
-            count_grid[idx, unique_coords[:, 0], unique_coords[:, 1]] = count 
+                unique_coords, count = np.unique(coords_i, axis=0, return_counts=True)
+                count_grid[idx, unique_coords[:, 0], unique_coords[:, 1]] = count 
 
-        count_grid = np.transpose(count_grid, axes=(0, 2, 1))
+            count_grid = np.transpose(count_grid, axes=(0, 2, 1))
 
         if remove_out_of_bounds:
             count_grid = self.remove_cells_out_of_bounds(count_grid, many_layers=True)
@@ -143,7 +169,7 @@ class RetangularGrid:
         return count_grid
 
     def sum_by_cell(self, values: np.array, coords: np.array, end_id: np.ndarray=None, zero_value=0, 
-        remove_out_of_bounds=False, simplify_shape=False):
+        remove_out_of_bounds=False, simplify_shape=False, offsets: np.ndarray=None):
         '''
         Soma dos valores que estão na mesma célula (possuem a mesma coordenada) da grade. 
         Cada elemento em `values` possui uma coordenada na grade associada em `coords`.
@@ -165,6 +191,15 @@ class RetangularGrid:
             
             >>> coords[layer_id, :end_id[layer_id]]
 
+        offsets:
+            Array 1-D com os limites das camadas, quando os dados estão no formato 
+            de `RaggedArray`. Nesse caso `values` e `coords` contém os elementos de todas as 
+            camadas concatenados (shapes (N, ...) e (N, 2)), e a camada `layer_id` é
+            
+            >>> coords[offsets[layer_id]:offsets[layer_id+1]]
+
+            Apenas valores numéricos são suportados nesse formato (`zero_value` é ignorado).
+
         remove_out_of_bounds:
             Se for `True`, remove as células fora da grade antes de retornar o resultado.
 
@@ -205,6 +240,22 @@ class RetangularGrid:
             elemento de `values_sum[layer_id, ..., -1, ...]` se refere à célula fora da grade
             que se encontra antes da primeira linha/coluna.
         '''
+        if offsets is not None:
+            cell_ids, num_layers = self._flat_cell_ids(coords, offsets)
+            num_cells = num_layers * self.shape_mpl_t[0] * self.shape_mpl_t[1]
+            
+            flat_values = values.reshape(values.shape[0], -1)
+            values_sum = np.empty((num_cells, flat_values.shape[1]), dtype=np.result_type(values.dtype, float))
+            for idx in range(flat_values.shape[1]):
+                values_sum[:, idx] = np.bincount(cell_ids, weights=flat_values[:, idx], minlength=num_cells)
+            values_sum = values_sum.reshape(num_layers, *self.shape_mpl_t, *values.shape[1:])
+            
+            if remove_out_of_bounds:
+                values_sum = self.remove_cells_out_of_bounds(values_sum, many_layers=True)
+            if simplify_shape:
+                values_sum = self.simplify_shape(values_sum)
+            return values_sum
+
         if len(coords.shape) == 2:
             coords = self.adjust_shape(coords, arr_name="coords")
             order = len(values.shape)
@@ -235,12 +286,12 @@ class RetangularGrid:
         return values_sum
 
     def mean_by_cell(self, values: np.array, coords: np.array, end_id=None, count: np.array=None,
-        simplify_shape=False, remove_out_of_bound=False):
+        simplify_shape=False, remove_out_of_bound=False, offsets: np.ndarray=None):
         '''
         Mesma função de `self.sum_by_cell`, mas divide o resultado pela
         contagem de pontos em cada célula, assim realizando a média por célula.
         '''
-        if len(coords.shape) == 2:
+        if offsets is None and len(coords.shape) == 2:
             coords = self.adjust_shape(coords, arr_name="coords")
             order = len(values.shape)
             values = self.adjust_shape(values, expected_order=order)
@@ -248,10 +299,11 @@ class RetangularGrid:
         values_mean = self.sum_by_cell(
             values, coords, 
             end_id=end_id,
+            offsets=offsets,
         )
         
         if count is None:
-            count = self.count(coords, end_id=end_id)
+            count = self.count(coords, end_id=end_id, offsets=offsets)
 
         non_zero_mask = count > 0
 
@@ -260,6 +312,8 @@ class RetangularGrid:
         # else:
         #     num_new_axis = len(values.shape) - 1
         num_new_axis = len(values.shape) - 2
+        if offsets is not None:
+            num_new_axis = len(values.shape) - 1
 
         values_mean[non_zero_mask] /= count[non_zero_mask].reshape(-1, *[1 for _ in range(num_new_axis)])
         
@@ -310,6 +364,38 @@ class RetangularGrid:
             outside = np.logical_not((d1 < radius) | (d2 < radius) | (d3 < radius) | (d4 < radius))
             return (~outside) & (~inside)
 
+    def cell_area_outside_circle(self, radius, center=(0, 0)):
+        '''
+        Área das células descontando a parte que está dentro do círculo de centro `center` 
+        e raio `radius`. Apenas as células que intersectam o perímetro do círculo são 
+        ajustadas. O array retornado tem o mesmo shape de `self.cell_area`.
+        '''
+        from shapely.geometry import Polygon, Point
+
+        intersect_mask = self.circle_mask(radius=radius, center=center, mode="intersect")
+
+        x = self.meshgrid[0][intersect_mask]
+        y = self.meshgrid[1][intersect_mask]
+
+        w, h = np.meshgrid(*self.dim_cell_size)
+        dx = w[intersect_mask]/2
+        dy = h[intersect_mask]/2
+
+        p1 = np.array([x + dx, y - dy]).T
+        p2 = np.array([x + dx, y + dy]).T
+        p3 = np.array([x - dx, y + dy]).T
+        p4 = np.array([x - dx, y - dy]).T
+
+        circle = Point(center).buffer(radius, resolution=100)
+        intersect_areas = []
+        for idx in range(p1.shape[0]):
+            square = Polygon([p1[idx], p2[idx], p3[idx], p4[idx]])
+            intersect_areas.append(square.difference(circle).area)
+
+        cell_areas = self.cell_area.astype(float)
+        cell_areas[intersect_mask] = intersect_areas
+        return cell_areas
+
 
     def plot_grid(self, ax, adjust_lims=True):
         from matplotlib.axes import Axes
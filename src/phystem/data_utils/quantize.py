@@ -0,0 +1,89 @@
+'''
+Quantização de arrays em que cada linha é um conjunto de pontos próximos (por exemplo,
+as partículas de um anel).
+
+Cada linha é armazenada como o seu centro (média dos pontos) em float32, mais o
+deslocamento de cada ponto em relação ao centro quantizado em int16, com uma escala
+(float32) por linha. A decodificação é determinística: o mesmo dado codificado
+sempre resulta no mesmo array, com erro máximo de `scale/2` em cada coordenada.
+
+Se os pontos estão em um espaço com bordas periódicas (parâmetro `box`), as linhas
+que cruzam a borda são desfeitas (imagem mínima) antes do cálculo do centro, então 
+a escala continua sendo da ordem do tamanho da linha.
+'''
+import numpy as np
+
+INT16_MAX = np.iinfo(np.int16).max
+
+def _wrap(data: np.ndarray, box: np.ndarray):
+    "Coloca `data` dentro do espaço periódico de tamanho `box` centrado na origem."
+    return data - box * np.rint(data / box)
+
+def encode_rows(data: np.ndarray, box: np.ndarray=None):
+    '''
+    Codifica `data`, de shape (N, ..., d), em que N é o número de linhas
+    e d é o número de dimensões de cada ponto.
+
+    Parâmetros:
+    -----------
+    box:
+        Tamanho, em cada dimensão, do espaço com bordas periódicas (centrado na origem)
+        em que os pontos estão. Se for `None`, o espaço não é periódico.
+
+    Retorno:
+    --------
+    (center, offsets, scale):
+        center:
+            Array float32 de shape (N, d) com o centro de cada linha.
+
+        offsets:
+            Array int16 com o mesmo shape de `data`, contendo os deslocamentos
+            dos pontos em relação ao centro, em unidades de `scale`.
+
+        scale:
+            Array float32 de shape (N,) com a escala de cada linha.
+    '''
+    data = np.asarray(data)
+    num_rows, num_dims = data.shape[0], data.shape[-1]
+    num_points = int(np.prod(data.shape[1:-1]))
+
+    points = data.reshape(num_rows, num_points, num_dims)
+    if box is not None:
+        box = np.asarray(box, dtype=data.dtype)
+        if num_points > 0:
+            # Desfaz a quebra das linhas na borda periódica, utilizando a imagem mínima 
+            # de cada ponto em relação ao primeiro ponto da linha (como em `Ring::ring_observables`).
+            first = points[:, :1]
+            points = first + _wrap(points - first, box)
+
+    center = points.mean(axis=1)
+    if box is not None:
+        center = _wrap(center, box)
+    center = center.astype(np.float32)
+
+    # Os deslocamentos são em relação ao centro já arredondado para float32, então
+    # o erro da decodificação vem apenas da quantização dos deslocamentos.
+    diff = points - center[:, None, :].astype(data.dtype)
+    if box is not None:
+        diff = _wrap(diff, box)
+
+    max_diff = np.abs(diff).max(axis=(1, 2)) if num_points > 0 else np.zeros(num_rows)
+    scale = (max_diff / INT16_MAX).astype(np.float32)
+    scale[scale == 0] = 1
+
+    offsets = np.rint(diff / scale[:, None, None]).clip(-INT16_MAX, INT16_MAX).astype(np.int16)
+    return center, offsets.reshape(data.shape), scale
+
+def decode_rows(center: np.ndarray, offsets: np.ndarray, scale: np.ndarray, dtype=np.float64, box: np.ndarray=None):
+    '''
+    Decodifica os arrays gerados por `encode_rows`. Se `box` for dado, deve ser o mesmo
+    utilizado na codificação, e os pontos são colocados de volta dentro do espaço periódico.
+    '''
+    num_rows, num_dims = center.shape
+    num_points = int(np.prod(offsets.shape[1:-1]))
+    points = offsets.reshape(num_rows, num_points, num_dims).astype(dtype)
+    points *= np.asarray(scale, dtype=dtype)[:, None, None]
+    points += np.asarray(center, dtype=dtype)[:, None, :]
+    if box is not None:
+        points = _wrap(points, np.asarray(box, dtype=dtype))
+    return points.reshape(offsets.shape)
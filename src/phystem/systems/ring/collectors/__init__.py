@@ -1,5 +1,5 @@
 from phystem.core.collectors import ColAutoSaveCfg
-from .base import RingCol, StateSaver, ColCfg
+from .base import RingCol, Mergeable, StateSaver, ColCfg
 from .creation_rate import CreationRateCol, CreationRateColCfg
 from .delta import DeltaCol, DeltaColTime, DeltaColCfg
 from .density_vel import DenVelCol, DenVelColCfg
@@ -8,4 +8,7 @@ from .snapshots import SnapshotsCol, SnapshotsColCfg
 from .checkpoint import CheckpointCol, CheckpointColCfg
 from .area import AreaCol, AreaColCfg
 from .invasion import InvasionCol, InvasionColCfg
+from .flight_recorder import FlightRecorderCol, FlightRecorderColCfg
+from .tracer import TracerCol, TracerColCfg
+from .offline import recollect
 from .quantity_pos import *
\ No newline at end of file
@@ -12,12 +12,12 @@ class AreaColCfg(collectors.ColCfg):
         self.wait_time = wait_time
         super().__init__(autosave_cfg)
 
-class AreaCol(collectors.RingCol):
+class AreaCol(collectors.RingCol, collectors.Mergeable):
     "Coletor da área formada pelos centros das partículas do anel."
     col_cfg: AreaColCfg
 
     def setup(self):
-        self.fre_dt = self.col_cfg.freq_dt
+        self.freq_dt = self.col_cfg.freq_dt
         self.wait_time = self.col_cfg.wait_time
 
         # State
@@ -32,6 +32,10 @@ class AreaCol(collectors.RingCol):
         v.extend(["areas", "pos", "times", "last_col_time"])
         return v
 
+    @property
+    def journal_vars(self):
+        return ["areas", "pos", "times"]
+
     def collect(self) -> None:
         t = self.solver.time
 
@@ -42,19 +46,17 @@ class AreaCol(collectors.RingCol):
             return
         self.last_col_time = t
 
-        num_active = self.solver.num_active_rings
-        ids_active = np.array(self.solver.rings_ids[:num_active])
-
-        areas = np.array(self.solver.area_debug.area)[ids_active]
-        cms = np.array(self.solver.center_mass)[ids_active]
-        
-        self.areas.append(np.array(areas))
-        self.pos.append(np.array(cms))
+        self.areas.append(np.array(self.obs.areas_active))
+        self.pos.append(np.array(self.obs.cms_active))
         self.times.append(t)
 
         if self.autosave_cfg:
             self.check_autosave()
     
+    def next_due_step(self):
+        wait_time, freq_dt = self.col_cfg.wait_time, self.col_cfg.freq_dt
+        return self.first_step_where(lambda t: (t >= wait_time) & ~(t - self.last_col_time < freq_dt))
+
     def save(self):
         with open(self.data_path / "data.pickle", "wb") as f:
             pickle.dump({
@@ -67,4 +69,23 @@ class AreaCol(collectors.RingCol):
                 "num_points": len(self.times),
             }, f)
 
+    @classmethod
+    def merge(Cls, chunks_paths: list[Path], root_path: Path):
+        data = {"times": [], "areas": [], "pos": []}
+        for path in chunks_paths:
+            with open(Path(path) / "data" / "data.pickle", "rb") as f:
+                chunk_data = pickle.load(f)
+            for name, values in data.items():
+                values.extend(chunk_data[name])
+
+        data_path = Path(root_path) / "data"
+        data_path.mkdir(parents=True, exist_ok=True)
+        with open(data_path / "data.pickle", "wb") as f:
+            pickle.dump(data, f)
+
+        with open(data_path / "metadata.yaml", "w") as f:
+            yaml.dump({
+                "num_points": len(data["times"]),
+            }, f)
+
 Configs2Collector.add(AreaColCfg, AreaCol)
\ No newline at end of file
@@ -3,6 +3,7 @@ import yaml
 from abc import ABC, abstractmethod
 
 from phystem.systems.ring.solvers import CppSolver
+from phystem.systems.ring.observables import StepObservables
 from phystem.core import collectors, settings
 from phystem.core.collectors import ColAutoSaveCfg, ColCfg
 
@@ -102,6 +103,9 @@ class StateSaver:
                 "time": self.solver.time,
                 "num_time_steps": self.solver.num_time_steps,
             }
+            # O `SolverReplay` não possui contadores.
+            if hasattr(self.solver, "counters"):
+                _metadata["counters"] = self.solver.counters
             if metadata is not None:
                 for key, value in metadata.items():
                     _metadata[key] = value 
@@ -122,7 +126,8 @@ class StateSaver:
             else:
                 np.save(pos_path, np.array(self.solver.pos)[self.ring_ids])
         
-        if filenames.angle is not None:
+        # O `SolverReplay` não possui os ângulos da auto-propulsão.
+        if filenames.angle is not None and hasattr(self.solver, "self_prop_angle"):
             angle_path = directory / filenames.angle
             np.save(angle_path, np.array(self.solver.self_prop_angle)[self.ring_ids])
 
@@ -162,6 +167,21 @@ class StateSaver:
 class RingCol(collectors.Collector):
     "Base para os coletores dos anéis."
     
+    def __init__(self, col_cfg: ColCfg, solver: CppSolver, root_path: Path, configs: dict,
+        data_dirname="data", exist_ok=False, obs: StepObservables=None) -> None:
+        '''
+        Parâmetros:
+        -----------
+        obs:
+            Observáveis do passo atual (ver `StepObservables`). Coletores que coletam no mesmo 
+            passo devem compartilhar o mesmo `obs` (ver `ColManager`), para que cada observável
+            seja convertido apenas uma vez. Se for `None`, é criado um `StepObservables` próprio.
+
+        Os demais parâmetros são os mesmos de `Collector`.
+        '''
+        self.obs = obs if obs is not None else StepObservables(solver)
+        super().__init__(col_cfg, solver, root_path, configs, data_dirname, exist_ok)
+
     def before_setup(self):
         if self.autosave_cfg is not None:
             for path in self.autosave_paths:
@@ -209,4 +229,27 @@ class RingCol(collectors.Collector):
             self.state_col.save(metadata={settings.autosave_flag_name: True})
 
     def save(self):
-        pass
\ No newline at end of file
+        pass
+
+class Mergeable(ABC):
+    '''
+    Coletor cujos dados salvos por coletas independentes em partes consecutivas de uma
+    mesma simulação podem ser juntados, o que é necessário na coleta offline (ver 
+    `offline.recollect`).
+    '''
+    @classmethod
+    @abstractmethod
+    def merge(Cls, chunks_paths: list[Path], root_path: Path):
+        '''
+        Junta os dados das coletas em `chunks_paths`, salvando em `root_path` os 
+        dados no mesmo formato de `save`.
+
+        Parâmetros:
+        -----------
+        chunks_paths:
+            Pastas raiz das coletas de cada parte, na ordem temporal.
+
+        root_path:
+            Pasta raiz dos dados juntados.
+        '''
+        pass
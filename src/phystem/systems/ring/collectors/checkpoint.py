@@ -1,5 +1,5 @@
 from pathlib import Path
-from phystem.core import settings
+from phystem.core import settings, checkpoint_file
 from phystem.core.collectors import ColAutoSaveCfg
 from phystem.systems.ring.solvers import CppSolver
 from phystem.systems.ring import Simulation
@@ -8,31 +8,48 @@ from .base import RingCol, ColCfg
 from .config_to_col import Configs2Collector
 
 class CheckpointColCfg(ColCfg):
-    def __init__(self, autosave_cfg = None):
+    def __init__(self, autosave_cfg = None, single_file=False):
         '''
         Salva o estado da simulação quando ela termina. O checkpoint
         salvo estará no caminho "folder_path/checkpoint", em que "folder_path"
         é o caminho da pasta raiz da configuração de coleta de dados.
+
+        Se `single_file` for `True`, o checkpoint é salvo em um único arquivo
+        "folder_path/checkpoint.ckpt" (ver `StateSaver.save_file`).
         '''
         super().__init__(autosave_cfg)
         self.to_load_autosave = False
+        self.single_file = single_file
 
 class CheckpointCol(RingCol):
     def setup(self):
+        self.single_file = getattr(self.col_cfg, "single_file", False)
+        if self.single_file:
+            self.checkpoint_path = (self.root_path / "checkpoint").with_suffix(checkpoint_file.FILE_EXT)
+            return
+
         self.checkpoint_path = self.root_path / "checkpoint"
         
         if settings.IS_TESTING:
             exist_ok = True
         self.checkpoint_path.mkdir(parents=True, exist_ok=exist_ok)
 
-        self.check_saver = StateSaver(self.solver, self.checkpoint_path, self.configs)
+        self.check_saver = StateSaver(self.solver, self.checkpoint_path, self.configs, obs=self.obs)
 
     def collect(self) -> None:
         if self.autosave_cfg:
             self.check_autosave()
 
+    def next_due_step(self):
+        if self.autosave_cfg:
+            return self.autosave_due_step()
+        return None
+
     def save(self):
-        self.check_saver.save()
+        if self.single_file:
+            StateSaver.save_file(self.solver, self.checkpoint_path, self.configs)
+        else:
+            self.check_saver.save()
     
     @staticmethod
     def pipeline(sim: Simulation, cfg: CheckpointColCfg):
@@ -9,12 +9,36 @@ from .config_to_col import Configs2Collector
 
 class CreationRateColCfg(ColCfg):
     def __init__(self, wait_time, collect_time, collect_dt, autosave_cfg = None):
+        '''
+        Configurações do coletor da taxa de criação de anéis (fluxo de stokes).
+
+        Parâmetros:
+        -----------
+        wait_time:
+            Tempo de espera para começar a coleta.
+        
+        collect_time:
+            Duração da coleta.
+
+        collect_dt:
+            Duração dos intervalos de tempo de cada ponto coletado.
+        '''
         super().__init__(autosave_cfg)
         self.wait_time = wait_time
         self.collect_dt = collect_dt
         self.collect_time = collect_time
 
 class CreationRateCol(RingCol):
+    '''
+    Coleta, em intervalos de tempo de duração `collect_dt`, o número de anéis criados e
+    removidos, o número médio de anéis ativos e o número de invasões, utilizando os
+    contadores acumulados do solver (ver `CppSolver.counters`). Como os contadores são
+    atualizados pelo solver em todo passo, `collect` só precisa ser chamado no final
+    de cada intervalo (ver `next_due_step`).
+    '''
+    solver: solvers.CppSolver
+    col_cfg: CreationRateColCfg
+
     def setup(self):
         #  Configuration
         self.wait_time = self.col_cfg.wait_time
@@ -24,20 +48,24 @@ class CreationRateCol(RingCol):
         # State        
         self.wait_time_done = False
         self.last_time = self.solver.time
+        self.last_counters: dict = None
         self.point_id = 0
 
         # Data        
         self.num_points = int(self.collect_time/self.collect_dt)
         self.init_data_arrays()
 
-        # if to_load_autosave:
-        #     self.load_autosave()
-
     def init_data_arrays(self):
         self.time_arr = np.zeros(self.num_points, dtype=np.float32)
         self.num_created_arr = np.zeros(self.num_points, dtype=np.int32)
+        self.num_removed_arr = np.zeros(self.num_points, dtype=np.int32)
         self.num_active_arr = np.zeros(self.num_points, dtype=np.int32)
+        self.mean_active_arr = np.zeros(self.num_points, dtype=np.float32)
+        self.num_invasions_arr = np.zeros(self.num_points, dtype=np.int64)
 
+    @property
+    def is_done(self):
+        return self.point_id > self.num_points-1 or self.solver.time > self.collect_time + self.wait_time
 
     def collect(self) -> None:
         time = self.solver.time
@@ -45,49 +73,79 @@ class CreationRateCol(RingCol):
         if time < self.wait_time:
             return
 
-        self.wait_time_done = True
-
-        if time > self.collect_time + self.wait_time:
-            return
-        
-        if self.point_id > self.num_points-1:
+        if self.is_done:
             return
-
-        self.num_created_arr[self.point_id] += self.solver.num_created_rings   
         
-        if self.solver.time - self.last_time > self.collect_dt:
-            self.last_time = self.solver.time
-            self.time_arr[self.point_id] = self.solver.time
-            self.num_active_arr[self.point_id] = self.solver.num_active_rings   
+        # Início do primeiro intervalo.
+        if self.last_counters is None:
+            self.wait_time_done = True
+            self.last_time = time
+            self.last_counters = self.solver.counters
+        elif time - self.last_time > self.collect_dt:
+            counters = self.solver.counters
+            last = self.last_counters
+            i = self.point_id
+
+            self.time_arr[i] = time
+            self.num_created_arr[i] = counters["num_created"] - last["num_created"]
+            self.num_removed_arr[i] = counters["num_removed"] - last["num_removed"]
+            self.num_active_arr[i] = self.solver.num_active_rings   
+            self.mean_active_arr[i] = (counters["active_integral"] - last["active_integral"]) / (time - self.last_time)
+            self.num_invasions_arr[i] = counters["num_invasions"] - last["num_invasions"]
+            
+            self.last_time = time
+            self.last_counters = counters
             self.point_id += 1
         
         if self.autosave_cfg:
             self.check_autosave()
+    
+    def next_due_step(self):
+        if self.is_done:
+            return None
+
+        if self.last_counters is None:
+            wait_time = self.wait_time
+            return self.first_step_where(lambda t: t >= wait_time)
         
+        last_time, collect_dt = self.last_time, self.collect_dt
+        due = self.first_step_where(lambda t: t - last_time > collect_dt)
+        if self.autosave_cfg:
+            due = min(due, self.autosave_due_step())
+        return due
+
     @property
     def vars_to_save(self):
         v = super().vars_to_save
         v.extend([
             "wait_time_done",
             "last_time",
+            "last_counters",
             "point_id",
             "time_arr",
             "num_created_arr",
+            "num_removed_arr",
             "num_active_arr",
+            "mean_active_arr",
+            "num_invasions_arr",
         ]) 
         return v
 
-    def load_autosave(self, use_backup=False):
-        super().load_autosave(use_backup)
+    def load_state(self, data):
+        super().load_state(data)
         
-        time_arr = self.time_arr
-        num_created_arr = self.num_created_arr
-        num_active_arr = self.num_active_arr
+        arrays = {
+            "time_arr": self.time_arr,
+            "num_created_arr": self.num_created_arr,
+            "num_removed_arr": self.num_removed_arr,
+            "num_active_arr": self.num_active_arr,
+            "mean_active_arr": self.mean_active_arr,
+            "num_invasions_arr": self.num_invasions_arr,
+        }
 
         self.init_data_arrays()
-        self.time_arr[:time_arr.size] = time_arr
-        self.num_created_arr[:num_created_arr.size] = num_created_arr
-        self.num_active_arr[:num_active_arr.size] = num_active_arr
+        for name, values in arrays.items():
+            getattr(self, name)[:values.size] = values
 
     def save(self, data_path: Path=None):
         if data_path is None:
@@ -101,6 +159,9 @@ class CreationRateCol(RingCol):
 
         np.save(data_path / f"time.npy", self.time_arr)
         np.save(data_path / f"num_created.npy", self.num_created_arr)
+        np.save(data_path / f"num_removed.npy", self.num_removed_arr)
         np.save(data_path / f"num_active.npy", self.num_active_arr)
+        np.save(data_path / f"mean_active.npy", self.mean_active_arr)
+        np.save(data_path / f"num_invasions.npy", self.num_invasions_arr)
 
 Configs2Collector.add(CreationRateColCfg, CreationRateCol)
\ No newline at end of file
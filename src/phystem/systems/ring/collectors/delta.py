@@ -1,17 +1,93 @@
-import pickle
+import pickle, shutil
 import numpy as np
+from pathlib import Path
 from enum import Flag, auto
+from scipy.spatial import QhullError
 
 from phystem.core.collectors import ColAutoSaveCfg
 from phystem.systems.ring import collectors, utils
 
-from .base import RingCol, ColCfg
+from .base import RingCol, ColCfg, Mergeable
 from .config_to_col import Configs2Collector
 
+def save_metadata(path, metadata: dict):
+    with open(path, "wb") as f:
+        pickle.dump(metadata, f) 
+
 class State(Flag):
     starting = auto()
     waiting = auto()
 
+class DeltaLinks:
+    def __init__(self, selected: np.ndarray, cms: np.ndarray, edge_tol: float) -> None:
+        '''
+        Links iniciais (ver `utils.calc_edges`) dos anéis selecionados de um ponto 
+        experimental, utilizados para calcular o delta (como em `DeltaCalc`) quando as 
+        posições finais estiverem disponíveis.
+
+        Parâmetros:
+        -----------
+        selected:
+            Índices, em `cms`, dos anéis selecionados.
+        
+        cms:
+            Centros de massa iniciais dos anéis da região.
+        
+        edge_tol:
+            Comprimento máximo dos links.
+        '''
+        # Para cada link de um anel selecionado: índice do anel (em `cms`), 
+        # índice do vizinho e o quadrado do comprimento inicial do link.
+        self.ring_ids = np.empty(0, dtype=int)
+        self.neigh_ids = np.empty(0, dtype=int)
+        self.init_dists_sqr = np.empty(0, dtype=float)
+        
+        # Índice do anel selecionado (em `selected`) de cada link.
+        self.group = np.empty(0, dtype=int)
+        self.num_selected = len(selected)
+
+        if cms.shape[0] < 3:
+            return
+
+        try:
+            links, dists = utils.calc_edges(cms, edge_tol, return_dist=True)
+        except QhullError:
+            # Configuração degenerada (por exemplo, todos os anéis alinhados).
+            return
+        
+        selected_pos = np.full(cms.shape[0], -1, dtype=int)
+        selected_pos[selected] = np.arange(len(selected))
+
+        # Cada link aparece uma vez para cada ponta que é um anel selecionado.
+        ring_ids = np.concatenate([links[:, 0], links[:, 1]])
+        neigh_ids = np.concatenate([links[:, 1], links[:, 0]])
+        dists = np.concatenate([dists, dists])
+        
+        mask = selected_pos[ring_ids] != -1
+        self.ring_ids = ring_ids[mask]
+        self.neigh_ids = neigh_ids[mask]
+        self.init_dists_sqr = np.square(dists[mask])
+        self.group = selected_pos[self.ring_ids]
+
+    def delta(self, final_cms: np.ndarray):
+        '''
+        Retorna o delta médio dos anéis selecionados, dado as posições finais 
+        dos anéis da região `final_cms`, e o número de anéis selecionados que possuem
+        vizinhos (utilizados na média).
+        '''
+        final_dists_sqr = np.square(final_cms[self.neigh_ids] - final_cms[self.ring_ids]).sum(axis=1)
+        ratios = self.init_dists_sqr / final_dists_sqr
+
+        num_neighs = np.bincount(self.group, minlength=self.num_selected)
+        ratios_sum = np.bincount(self.group, weights=ratios, minlength=self.num_selected)
+        
+        has_neighs = num_neighs > 0
+        num_rings = int(has_neighs.sum())
+        if num_rings == 0:
+            return None, 0
+
+        return float((ratios_sum[has_neighs] / num_neighs[has_neighs]).mean()), num_rings
+
 class TrackingList:
     def __init__(self) -> None:
         self.ids: list[np.ndarray] = []
@@ -19,6 +95,11 @@ class TrackingList:
         self.end_x: list[float] = []
         self.dp_id: list[int] = []
         self.ids_region: list[np.ndarray] = []
+        self.uids_region: list[np.ndarray] = []
+        self.links: list[DeltaLinks] = []
+        
+        # uids de todos os anéis selecionados sendo rastreados.
+        self.tracked_uids: set[int] = set()
 
     def id_exists(self, id):
         for ids in self.ids:
@@ -26,20 +107,29 @@ class TrackingList:
                 return True
         return False
 
-    def add(self, id, uid, end_x, dp_id, ids_region):
+    def uid_exists(self, uid):
+        return uid in self.tracked_uids
+
+    def add(self, id, uid, end_x, dp_id, ids_region, links: DeltaLinks=None, uids_region=None):
         self.ids.append(id)
         self.uids.append(uid)
         self.end_x.append(end_x)
         self.dp_id.append(dp_id)
         self.ids_region.append(ids_region)
+        self.uids_region.append(uids_region)
+        self.links.append(links)
+        self.tracked_uids.update(np.asarray(uid).tolist())
 
     def remove(self, indexes):
         for index in sorted(indexes, reverse=True):
+            self.tracked_uids.difference_update(np.asarray(self.uids[index]).tolist())
             del self.ids[index]
             del self.uids[index]
             del self.end_x[index]
             del self.dp_id[index]
             del self.ids_region[index]
+            del self.uids_region[index]
+            del self.links[index]
 
     def get(self, name, idx):
         return getattr(self, name)[idx]
@@ -50,7 +140,8 @@ class TrackingList:
 
 class DeltaColCfg(ColCfg):
     def __init__(self, wait_dist, xlims, start_dt, check_dt, min_num_rings,
-        xtol=1, save_final_close=False, autosave_cfg = None):
+        xtol=1, save_final_close=False, autosave_cfg = None, online=False, edge_k: float=None, 
+        save_raw: bool=None):
         '''
         Coletor da quantidade delta (sólido/líquido).
         
@@ -74,6 +165,21 @@ class DeltaColCfg(ColCfg):
             xtol:
                 Comprimento (em unidades de diâmetro do anel) em que `xlims` é
                 expandido.
+            
+            online:
+                Se for `True`, o delta de cada ponto experimental é calculado durante a coleta
+                (da mesma forma que em `DeltaCalc`), e apenas as linhas 
+                (init_time, final_time, delta, n_rings) são salvas em "deltas.npy", em que
+                n_rings é o número de anéis utilizados na média.
+            
+            edge_k:
+                Apenas utilizado se `online=True`. Define o valor máximo do comprimento dos 
+                links entre anéis: 'Diâmetro do anel' * `edge_k` (ver `DeltaCalc`).
+            
+            save_raw:
+                Se for `True`, as posições dos anéis no início e no final de cada ponto experimental
+                são salvas (dados utilizados por `DeltaCalc`). Por padrão, é `True` apenas se 
+                `online=False`, mas pode ser utilizado em conjunto com `online=True` para depuração.
         '''
         super().__init__(autosave_cfg)
         self.wait_dist = wait_dist
@@ -83,8 +189,14 @@ class DeltaColCfg(ColCfg):
         self.min_num_rings = min_num_rings
         self.xtol = xtol
         self.save_final_close = save_final_close
+        self.online = online
+        self.edge_k = edge_k
+        self.save_raw = save_raw if save_raw is not None else not online
+
+        if online and edge_k is None:
+            raise ValueError("`edge_k` deve ser passado quando `online=True`.")
 
-class DeltaCol(RingCol):
+class DeltaCol(RingCol, Mergeable):
     col_cfg: DeltaColCfg
 
     def setup(self):
@@ -98,12 +210,16 @@ class DeltaCol(RingCol):
         self.min_num_rings = self.col_cfg.min_num_rings
         self.xtol = self.col_cfg.xtol
         self.save_final_close = self.col_cfg.save_final_close
+        self.online = self.col_cfg.online
+        self.save_raw = self.col_cfg.save_raw
 
         xlims = self.col_cfg.xlims
         xtol = self.col_cfg.xtol
 
         self.ring_diameter = self.configs["dynamic_cfg"].get_ring_radius() * 2
         self.xlims_extended = (xlims[0] - xtol*self.ring_diameter, xlims[1] + xtol*self.ring_diameter)
+        if self.online:
+            self.edge_tol = self.ring_diameter * self.col_cfg.edge_k
         
         ##
         # State attributes
@@ -115,6 +231,9 @@ class DeltaCol(RingCol):
         self.tracking = TrackingList()
         self.init_times = []
         self.final_times = []
+        
+        # Linhas (init_time, final_time, delta, n_rings) do modo online.
+        self.deltas = []
 
     @property
     def vars_to_save(self):
@@ -127,9 +246,14 @@ class DeltaCol(RingCol):
             "tracking",
             "init_times",
             "final_times",
+            "deltas",
         ])
         return v
 
+    @property
+    def journal_vars(self):
+        return ["init_times", "final_times", "deltas"]
+
     def collect(self):
         if self.state is State.waiting:
             if self.tracking.size == 0 or (self.solver.time > self.last_start_time + self.start_dt):
@@ -147,19 +271,25 @@ class DeltaCol(RingCol):
         if self.autosave_cfg:
             self.check_autosave()
 
-    def start(self):
-        cms = self.get_cm()
-
-        active_ids, cms_active, uids_active = self.get_active(cms)
+    def next_due_step(self):
+        if self.state is State.starting or self.tracking.size == 0:
+            return self.solver.num_time_steps + 1
+        
+        next_start_time = self.last_start_time + self.start_dt
+        next_check_time = self.last_check_time + self.check_dt
+        due = self.first_step_where(lambda t: (t > next_start_time) | (t > next_check_time))
+        
+        if self.autosave_cfg:
+            due = min(due, self.autosave_due_step())
+        return due
 
-        in_region_mask = (cms_active[:, 0] > self.xlims_extended[0]) & (cms_active[:, 0] < self.xlims_extended[1])
+    def start(self):
+        ids_region, cms_region = self.solver.rings_in_rect(self.xlims_extended, (-np.inf, np.inf))
         
-        if in_region_mask.sum() == 0:
+        if ids_region.size == 0:
             return False
 
-        cms_region = cms_active[in_region_mask]
-        uids_region = uids_active[in_region_mask]
-        ids_region = active_ids[in_region_mask]
+        uids_region = self.obs.uids[ids_region]
 
         in_center_mask = (cms_region[:, 0] > self.xlims[0]) & (cms_region[:, 0] < self.xlims[1])
         if in_center_mask.sum() == 0:
@@ -168,37 +298,42 @@ class DeltaCol(RingCol):
         possible_new_ids = ids_region[in_center_mask]
         possible_new_uids = uids_region[in_center_mask]
 
-        new_indexes = []
-        for count, id in enumerate(possible_new_ids):
-            if self.tracking.id_exists(id):
-                continue
-            new_indexes.append(count)
+        new_indexes = [count for count, uid in enumerate(possible_new_uids.tolist()) 
+            if not self.tracking.uid_exists(uid)]
 
         selected_uids = possible_new_uids[new_indexes]
         if len(selected_uids) < self.min_num_rings:
             return False
 
         selected_ids = possible_new_ids[new_indexes]
-        end_x = cms[selected_ids][:, 0].mean() + self.wait_dist
+        end_x = cms_region[in_center_mask][new_indexes][:, 0].mean() + self.wait_dist
         
+        links = None
+        if self.online:
+            selected = np.where(in_center_mask)[0][new_indexes]
+            links = DeltaLinks(selected, cms_region, self.edge_tol)
+
         self.tracking.add(
             id=selected_ids, 
             uid=selected_uids,
             end_x=end_x,
             dp_id=self.data_point_id,
             ids_region=ids_region,
+            links=links,
+            uids_region=uids_region,
         )
         
-        np.save(self.data_path / f"cms_{self.data_point_id}_i.npy", cms_region)
-        np.save(self.data_path / f"uids_{self.data_point_id}_i.npy", uids_region)
-        np.save(self.data_path / f"selected-uids_{self.data_point_id}_i.npy", np.array(selected_uids))
+        if self.save_raw:
+            self.submit_write(np.save, self.data_path / f"cms_{self.data_point_id}_i.npy", cms_region)
+            self.submit_write(np.save, self.data_path / f"uids_{self.data_point_id}_i.npy", uids_region)
+            self.submit_write(np.save, self.data_path / f"selected-uids_{self.data_point_id}_i.npy", np.array(selected_uids))
         self.init_times.append(self.solver.time)
         # self.final_times.append({})
 
         self.data_point_id += 1
         
-        with open(self.data_path / "metadata.pickle", "wb") as f:
-            pickle.dump({"num_points": self.data_point_id}, f) 
+        if self.save_raw:
+            self.submit_write(save_metadata, self.data_path / "metadata.pickle", {"num_points": self.data_point_id})
 
         return True
 
@@ -207,14 +342,23 @@ class DeltaCol(RingCol):
         cms = self.get_cm()
         has_calc_active = False
         for idx in range(self.tracking.size):
-            t_id, end_x = self.tracking.get("ids", idx), self.tracking.get("end_x", idx)
+            # Os anéis são seguidos pelos seus uids, pois os ids de anéis removidos
+            # podem ser reutilizados por novos anéis.
+            t_id = self.solver.slots_of(self.tracking.get("uids", idx))
+            ids_region = self.solver.slots_of(self.tracking.get("uids_region", idx))
+            if (t_id == -1).any() or (ids_region == -1).any():
+                # Algum anel do ponto experimental não está mais ativo.
+                idx_to_remove.append(idx)
+                continue
+            
+            end_x = self.tracking.get("end_x", idx)
             current_cm = cms[t_id]
             
             if current_cm[:, 0].mean() < end_x:
                 continue
 
             idx_to_remove.append(idx)
-            uids = np.array(self.solver.unique_rings_ids)
+            uids = self.obs.uids
 
             current_uids = self.tracking.get("uids", idx)
             current_dp_id = self.tracking.get("dp_id", idx)
@@ -229,10 +373,9 @@ class DeltaCol(RingCol):
                 cms_close = cms_active[close_mask]
                 uids_close = uids_active[close_mask]
 
-                np.save(self.data_path / f"final-cms-close_{current_dp_id}_{current_uids}.npy", cms_close)
-                np.save(self.data_path / f"final-uids-close_{current_dp_id}_{current_uids}.npy", uids_close)
+                self.submit_write(np.save, self.data_path / f"final-cms-close_{current_dp_id}_{current_uids}.npy", cms_close)
+                self.submit_write(np.save, self.data_path / f"final-uids-close_{current_dp_id}_{current_uids}.npy", uids_close)
             
-            ids_region = self.tracking.get("ids_region", idx) 
             cms_region = cms[ids_region]
             udis_region = uids[ids_region]
             
@@ -240,30 +383,70 @@ class DeltaCol(RingCol):
             # if cms_region.shape[0] != init_cms.shape[0]:
             #     print("Erro") 
 
-            np.save(self.data_path / f"cms_{current_dp_id}_f.npy", cms_region)
-            np.save(self.data_path / f"uids_{current_dp_id}_f.npy", udis_region)
+            if self.save_raw:
+                self.submit_write(np.save, self.data_path / f"cms_{current_dp_id}_f.npy", cms_region)
+                self.submit_write(np.save, self.data_path / f"uids_{current_dp_id}_f.npy", udis_region)
+
+            if self.online:
+                delta, num_rings = self.tracking.get("links", idx).delta(cms_region)
+                if num_rings > 0:
+                    init_time = self.init_times[current_dp_id]
+                    self.deltas.append((init_time, self.solver.time, delta, num_rings))
 
             self.final_times.append(self.solver.time)
 
         self.tracking.remove(idx_to_remove)
 
     def save(self):
+        self.flush_writes()
         np.save(self.data_path / "init_times.npy", np.array(self.init_times))
         np.save(self.data_path / "final_times.npy", np.array(self.final_times))
+        if self.online:
+            np.save(self.data_path / "deltas.npy", np.array(self.deltas, dtype=float).reshape(-1, 4))
+
+    @classmethod
+    def merge(Cls, chunks_paths: list[Path], root_path: Path):
+        '''
+        Junta os dados das coletas em `chunks_paths` (ver `Mergeable.merge`). Os tempos e
+        as linhas de `deltas` são concatenados, e os arquivos brutos de cada parte são 
+        copiados com os ids dos pontos deslocados pelo número de pontos das partes anteriores.
+        '''
+        data_path = Path(root_path) / "data"
+        data_path.mkdir(parents=True, exist_ok=True)
+        
+        chunks_data = [Path(path) / "data" for path in chunks_paths]
+        for name in ["init_times", "final_times", "deltas"]:
+            if (chunks_data[0] / f"{name}.npy").exists():
+                np.save(data_path / f"{name}.npy", np.concatenate([np.load(p / f"{name}.npy") for p in chunks_data]))
+
+        # Sem os dados brutos (`save_raw=False`), o arquivo de metadados não existe.
+        if not any((p / "metadata.pickle").exists() for p in chunks_data):
+            return
+
+        # Nomes dos arquivos brutos: "{nome}_{id do ponto}_{sufixo}.npy".
+        num_points = 0
+        for path in chunks_data:
+            for file_path in path.glob("*_*_*.npy"):
+                name, dp_id, suffix = file_path.stem.split("_", 2)
+                shutil.copy(file_path, data_path / f"{name}_{int(dp_id) + num_points}_{suffix}.npy")
+            
+            num_points += np.load(path / "init_times.npy").size
+        
+        save_metadata(data_path / "metadata.pickle", {"num_points": num_points})
         
     def get_active(self, cm, uids=None):
-        active_ids = np.array(self.solver.rings_ids[:self.solver.num_active_rings])
+        active_ids = self.obs.active_ids
         cms_active = cm[active_ids]
         
         if uids is None:
-            uids_active = np.array(self.solver.unique_rings_ids)[active_ids] 
+            uids_active = self.obs.uids_active
         else:
             uids_active = uids[active_ids] 
 
         return active_ids, cms_active, uids_active
 
     def get_cm(self):
-        return np.array(self.solver.center_mass) 
+        return self.obs.cms
 
 
 class DeltaColTime(collectors.RingCol):
@@ -336,6 +519,10 @@ class DeltaColTime(collectors.RingCol):
         ])
         return v
 
+    @property
+    def journal_vars(self):
+        return ["init_times", "final_times"]
+
     def collect(self):
         if self.state is State.waiting:
             # TODO: Se em uma passo temporal é maior do que self.start_dt, 
@@ -384,16 +571,15 @@ class DeltaColTime(collectors.RingCol):
             ids_region=ids_region,
         )
         
-        np.save(self.data_path / f"cms_{self.data_point_id}_i.npy", cms_region)
-        np.save(self.data_path / f"uids_{self.data_point_id}_i.npy", uids_region)
-        np.save(self.data_path / f"selected-uids_{self.data_point_id}_i.npy", np.array(selected_uids))
+        self.submit_write(np.save, self.data_path / f"cms_{self.data_point_id}_i.npy", cms_region)
+        self.submit_write(np.save, self.data_path / f"uids_{self.data_point_id}_i.npy", uids_region)
+        self.submit_write(np.save, self.data_path / f"selected-uids_{self.data_point_id}_i.npy", np.array(selected_uids))
         self.init_times.append(self.solver.time)
         # self.final_times.append({})
 
         self.data_point_id += 1
         
-        with open(self.data_path / "metadata.pickle", "wb") as f:
-            pickle.dump({"num_points": self.data_point_id}, f) 
+        self.submit_write(save_metadata, self.data_path / "metadata.pickle", {"num_points": self.data_point_id})
 
         return True
 
@@ -414,7 +600,7 @@ class DeltaColTime(collectors.RingCol):
             current_cm = cms[t_id]
             
             idx_to_remove.append(idx)
-            uids = np.array(self.solver.unique_rings_ids)
+            uids = self.obs.uids
 
             current_uids = self.tracking.get("uids", idx)
             current_dp_id = self.tracking.get("dp_id", idx)
@@ -429,8 +615,8 @@ class DeltaColTime(collectors.RingCol):
                 cms_close = cms_active[close_mask]
                 uids_close = uids_active[close_mask]
 
-                np.save(self.data_path / f"final-cms-close_{current_dp_id}_{current_uids}.npy", cms_close)
-                np.save(self.data_path / f"final-uids-close_{current_dp_id}_{current_uids}.npy", uids_close)
+                self.submit_write(np.save, self.data_path / f"final-cms-close_{current_dp_id}_{current_uids}.npy", cms_close)
+                self.submit_write(np.save, self.data_path / f"final-uids-close_{current_dp_id}_{current_uids}.npy", uids_close)
             
             ids_region = self.tracking.get("ids_region", idx) 
             cms_region = cms[ids_region]
@@ -440,30 +626,31 @@ class DeltaColTime(collectors.RingCol):
             # if cms_region.shape[0] != init_cms.shape[0]:
             #     print("Erro") 
 
-            np.save(self.data_path / f"cms_{current_dp_id}_f.npy", cms_region)
-            np.save(self.data_path / f"uids_{current_dp_id}_f.npy", udis_region)
+            self.submit_write(np.save, self.data_path / f"cms_{current_dp_id}_f.npy", cms_region)
+            self.submit_write(np.save, self.data_path / f"uids_{current_dp_id}_f.npy", udis_region)
 
             self.final_times.append(self.solver.time)
 
         self.tracking.remove(idx_to_remove)
 
     def save(self):
+        self.flush_writes()
         np.save(self.data_path / "init_times.npy", np.array(self.init_times))
         np.save(self.data_path / "final_times.npy", np.array(self.final_times))
         
     def get_active(self, cm, uids=None):
-        active_ids = np.array(self.solver.rings_ids[:self.solver.num_active_rings])
+        active_ids = self.obs.active_ids
         cms_active = cm[active_ids]
         
         if uids is None:
-            uids_active = np.array(self.solver.unique_rings_ids)[active_ids] 
+            uids_active = self.obs.uids_active
         else:
             uids_active = uids[active_ids] 
 
         return active_ids, cms_active, uids_active
 
     def get_cm(self):
-        return np.array(self.solver.center_mass) 
+        return self.obs.cms
 
 
 
@@ -172,14 +172,13 @@ class DenVelCol(RingCol):
         if not collect_den and not collect_vel and not collect_pol:
             return
 
-        num_active = self.solver.num_active_rings
-        ids_active = np.array(self.solver.rings_ids[:num_active])
-        cms = np.array(self.solver.center_mass)
+        ids_active = self.obs.active_ids
+        cms = self.obs.cms
         
         ids_in_region = None
         cms_in_region = None
         if collect_pol or collect_den or (collect_vel and self.vel_frame == 0):
-            cms_active = cms[ids_active]
+            cms_active = self.obs.cms_active
         
             mask_in_region = (cms_active[:, 0] > self.xlims[0]) & (cms_active[:, 0] < self.xlims[1])
             if mask_in_region.sum() == 0:
@@ -263,7 +262,7 @@ class DenVelCol(RingCol):
 
     def col_polarity(self, time, ids_in_region):
         self.time_pol_arr.append(time)
-        self.pol_data.add(self.solver.self_prop_angle[ids_in_region])
+        self.pol_data.add(self.obs.angles[ids_in_region])
 
     def save_data(self, data: ArraySizeAware, name: DataName):
         if name is self.DataName.velocity:
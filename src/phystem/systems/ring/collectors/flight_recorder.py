@@ -0,0 +1,260 @@
+import copy, yaml
+import numpy as np
+
+from phystem.core.collectors import ColAutoSaveCfg, Collector
+from phystem.core import settings
+from phystem.systems.ring.solvers import CppSolver
+
+from .base import RingCol, ColCfg
+from .config_to_col import Configs2Collector
+from .snapshots import SnapshotsColCfg
+
+class FlightRecorderColCfg(ColCfg):
+    # Gatilhos disponíveis pelo nome.
+    triggers = ("invasion", "high_vel", "ring_drop")
+
+    def __init__(self, trigger, num_before: int, num_after: int, freq_steps=1, ring_drop=1,
+        max_events: int=None, wait_time: float=0, autosave_cfg: ColAutoSaveCfg=None) -> None:
+        '''
+        Configurações do gravador de voo: os últimos `num_before` estados do sistema são
+        mantidos em um buffer circular em memória e, quando o gatilho dispara, esses estados
+        e os `num_after` estados seguintes são salvos em disco.
+
+        Parâmetros:
+        -----------
+        trigger:
+            Condição que dispara o salvamento. Pode ser o nome de um gatilho pronto
+
+            - "invasion": Existe alguma invasão no `InPolChecker`.
+            - "high_vel": O solver encontrou alguma velocidade alta (`update_debug.high_vel`).
+            - "ring_drop": O número de anéis ativos diminuiu em pelo menos `ring_drop` desde
+                o estado gravado anterior.
+
+            ou uma função `trigger(solver) -> bool`. Para que as configurações salvas possam
+            ser carregadas, a função deve ser definida no nível de um módulo.
+
+            O gatilho dispara apenas quando a condição passa de falsa para verdadeira.
+
+        num_before:
+            Número de estados anteriores ao disparo do gatilho mantidos em memória.
+
+        num_after:
+            Número de estados salvos após o estado em que o gatilho disparou.
+
+        freq_steps:
+            Número de passos temporais entre os estados gravados.
+
+        ring_drop:
+            Diminuição mínima do número de anéis do gatilho "ring_drop".
+
+        max_events:
+            Número máximo de eventos salvos. Se for `None`, não há limite.
+
+        wait_time:
+            Tempo de espera para começar a gravar.
+        '''
+        super().__init__(autosave_cfg)
+        if isinstance(trigger, str) and trigger not in self.triggers:
+            raise ValueError(f"Gatilho '{trigger}' inválido. Os gatilhos disponíveis são {self.triggers}.")
+        if num_before < 0 or num_after < 0:
+            raise ValueError("'num_before' e 'num_after' não podem ser negativos.")
+
+        self.trigger = trigger
+        self.num_before = num_before
+        self.num_after = num_after
+        self.freq_steps = freq_steps
+        self.ring_drop = ring_drop
+        self.max_events = max_events
+        self.wait_time = wait_time
+
+class FlightRecorderCol(RingCol):
+    '''
+    Gravador de voo: mantém os últimos estados do sistema (posições, polarizações e uids
+    dos anéis ativos) em um buffer circular pré-alocado e os salva em disco apenas
+    quando o gatilho dispara (ver `FlightRecorderColCfg`).
+
+    Cada evento é salvo na pasta "data/event_{i}", no mesmo formato das snapshots
+    salvas por `SnapshotsCol` sem o armazenamento consolidado, então pode ser reproduzido
+    com `ReplayDataCfg(root_path=".../data/event_{i}")`.
+
+    OBS: O buffer não é salvo no auto-salvamento, então, ao carregar um auto-salvamento,
+    os estados gravados antes dele são perdidos.
+    '''
+    solver: CppSolver
+    col_cfg: FlightRecorderColCfg
+
+    def setup(self):
+        cfg = self.col_cfg
+        num_max_rings = self.solver.num_max_rings
+        num_particles = self.solver.num_particles
+
+        # Buffer circular, com os `num_before` estados anteriores mais o estado atual.
+        self.buffer_capacity = cfg.num_before + 1
+        self.buffer_pos = np.empty((self.buffer_capacity, num_max_rings, num_particles, 2), dtype=np.float64)
+        self.buffer_angle = np.empty((self.buffer_capacity, num_max_rings), dtype=np.float64)
+        self.buffer_uids = np.empty((self.buffer_capacity, num_max_rings), dtype=np.uint64)
+        self.buffer_num_rings = np.zeros(self.buffer_capacity, dtype=int)
+        self.buffer_times = np.zeros(self.buffer_capacity, dtype=float)
+        self.buffer_start = 0
+        self.buffer_size = 0
+
+        # State
+        self.last_rec_step = self.solver.num_time_steps - cfg.freq_steps
+        self.last_num_rings = None
+        self.last_trigger_value = False
+        self.num_events = 0
+        self.event_frame = 0
+        self.num_after_left = 0
+        self.events = []
+
+    @property
+    def vars_to_save(self):
+        v = super().vars_to_save
+        v.extend(["last_rec_step", "last_num_rings", "last_trigger_value", "num_events",
+            "event_frame", "num_after_left", "events"])
+        return v
+
+    @property
+    def is_recording_event(self):
+        return self.num_after_left > 0
+
+    @property
+    def trigger_name(self):
+        trigger = self.col_cfg.trigger
+        return trigger if isinstance(trigger, str) else getattr(trigger, "__name__", "custom")
+
+    def event_path(self, event_id):
+        return self.data_path / f"event_{event_id}"
+
+    def check_trigger(self, num_rings):
+        trigger = self.col_cfg.trigger
+        if trigger == "invasion":
+            value = self.solver.in_pol_checker.num_inside_points > 0
+        elif trigger == "high_vel":
+            value = bool(self.solver.update_debug.high_vel)
+        elif trigger == "ring_drop":
+            value = self.last_num_rings is not None and self.last_num_rings - num_rings >= self.col_cfg.ring_drop
+        else:
+            value = bool(trigger(self.solver))
+
+        fired = value and not self.last_trigger_value
+        self.last_trigger_value = value
+        return fired
+
+    def record(self):
+        "Adiciona o estado atual no buffer circular."
+        obs = self.obs
+        ids = obs.active_ids
+        num_rings = ids.size
+
+        idx = (self.buffer_start + self.buffer_size) % self.buffer_capacity
+        if self.buffer_size == self.buffer_capacity:
+            self.buffer_start = (self.buffer_start + 1) % self.buffer_capacity
+        else:
+            self.buffer_size += 1
+
+        self.buffer_pos[idx, :num_rings] = obs.pos[ids]
+        self.buffer_angle[idx, :num_rings] = obs.angles[ids]
+        self.buffer_uids[idx, :num_rings] = obs.uids[ids]
+        self.buffer_num_rings[idx] = num_rings
+        self.buffer_times[idx] = self.solver.time
+        return idx
+
+    def write_frame(self, idx):
+        "Salva o estado `idx` do buffer no evento atual."
+        path = self.event_path(self.num_events - 1) / "data"
+        num_rings = self.buffer_num_rings[idx]
+
+        # Cópias, pois o buffer é reutilizado antes da escrita em segundo plano terminar.
+        for name, buffer in (("pos", self.buffer_pos), ("angle", self.buffer_angle), ("uids", self.buffer_uids)):
+            self.submit_write(np.save, path / f"{name}_{self.event_frame}.npy", buffer[idx, :num_rings].copy())
+
+        self.events[-1]["times"].append(float(self.buffer_times[idx]))
+        self.event_frame += 1
+
+    def start_event(self):
+        "Cria a pasta do evento e salva os estados do buffer."
+        cfg = self.col_cfg
+        self.num_events += 1
+        self.event_frame = 0
+        self.num_after_left = cfg.num_after + 1
+        self.events.append({"trigger_time": self.solver.time, "times": []})
+
+        event_path = self.event_path(self.num_events - 1)
+        (event_path / "data").mkdir(parents=True, exist_ok=True)
+
+        # Configurações utilizadas no replay (ver `ReplayDataCfg`).
+        configs = copy.copy(self.configs)
+        configs["run_cfg"] = copy.copy(configs["run_cfg"])
+        configs["run_cfg"].func_cfg = SnapshotsColCfg(snaps_dt=cfg.freq_steps * self.solver.dt)
+        Collector.save_cfg(configs, event_path / settings.system_config_fname)
+
+        for i in range(self.buffer_size - 1):
+            self.write_frame((self.buffer_start + i) % self.buffer_capacity)
+
+    def finish_event(self):
+        "Salva os tempos e os metadados do evento atual."
+        event = self.events[-1]
+        path = self.event_path(self.num_events - 1) / "data"
+
+        def write(times, metadata):
+            np.save(path / "times.npy", np.array(times))
+            with open(path / "metadata.yaml", "w") as f:
+                yaml.dump(metadata, f)
+
+        self.submit_write(write, list(event["times"]), {
+            "frame_dt": self.col_cfg.freq_steps * self.solver.dt,
+            "init_time": event["times"][0],
+            "num_frames": len(event["times"]),
+            "consolidated": False,
+            "trigger": self.trigger_name,
+            "trigger_time": event["trigger_time"],
+        })
+        self.num_after_left = 0
+
+    def collect(self) -> None:
+        cfg = self.col_cfg
+        if self.solver.time < cfg.wait_time:
+            return
+
+        if self.solver.num_time_steps - self.last_rec_step < cfg.freq_steps:
+            return
+        self.last_rec_step = self.solver.num_time_steps
+
+        idx = self.record()
+        num_rings = self.buffer_num_rings[idx]
+        fired = self.check_trigger(num_rings)
+        self.last_num_rings = num_rings
+
+        can_start = cfg.max_events is None or self.num_events < cfg.max_events
+        if fired and can_start and not self.is_recording_event:
+            self.start_event()
+
+        if self.is_recording_event:
+            self.write_frame(idx)
+            self.num_after_left -= 1
+            if self.num_after_left == 0:
+                self.finish_event()
+
+        if self.autosave_cfg:
+            self.check_autosave()
+
+    def next_due_step(self):
+        wait_time = self.col_cfg.wait_time
+        next_step = max(self.last_rec_step + self.col_cfg.freq_steps, self.solver.num_time_steps + 1)
+        return max(next_step, self.first_step_where(lambda t: t >= wait_time))
+
+    def save(self):
+        # Evento que ainda não gravou todos os estados após o gatilho.
+        if self.is_recording_event:
+            self.finish_event()
+        self.flush_writes()
+
+        with open(self.data_path / "metadata.yaml", "w") as f:
+            yaml.dump({
+                "num_events": self.num_events,
+                "trigger_times": [event["trigger_time"] for event in self.events],
+                "num_frames": [len(event["times"]) for event in self.events],
+            }, f)
+
+Configs2Collector.add(FlightRecorderColCfg, FlightRecorderCol)
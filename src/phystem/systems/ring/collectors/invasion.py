@@ -1,8 +1,8 @@
-import pickle, yaml
+import yaml
 import numpy as np
 
 from phystem.systems.ring.solvers import CppSolver
-from phystem.cpp_lib.managers import ColInfo, InPolChecker 
+from phystem.cpp_lib.managers import InPolChecker
 from .base import RingCol, ColCfg
 from .config_to_col import Configs2Collector
 
@@ -12,6 +12,17 @@ class InvasionColCfg(ColCfg):
         self.freq_dt = freq_dt
 
 class InvasionCol(RingCol):
+    '''
+    Coleta as invasões (partículas dentro de outros anéis) detectadas pelo `InPolChecker`.
+
+    Os dados são salvos como arrays do numpy:
+
+    - times.npy, num_invasions.npy, unique_invasions.npy: Um elemento por coleta.
+    - invasions_pos.npy, relative_areas.npy: Posições das partículas invasoras e áreas dos
+        anéis com colisões não resolvidas de todas as coletas, concatenadas. Os elementos da
+        i-ésima coleta estão em `[offsets[i]:offsets[i+1]]`, em que `offsets` está no arquivo
+        com o sufixo "_offsets" (ver `RaggedArray`).
+    '''
     solver: CppSolver
     col_cfg: InvasionColCfg
 
@@ -31,6 +42,10 @@ class InvasionCol(RingCol):
             "times", "last_col_time", "relative_areas", "unique_invasions"])
         return v
 
+    @property
+    def journal_vars(self):
+        return ["invasions_pos", "num_invasions", "times", "relative_areas", "unique_invasions"]
+
     def collect(self) -> None:
         t = self.solver.time
         t_dt = self.solver.num_time_steps
@@ -39,41 +54,47 @@ class InvasionCol(RingCol):
         self.last_col_time = t_dt
 
         in_pol_checker: InPolChecker = self.solver.in_pol_checker
-
-        num_inside = in_pol_checker.num_inside_points
-        inside_points = in_pol_checker.inside_points
-
-        self.num_invasions.append(num_inside)
-        self.invasions_pos.append(np.array(inside_points[:num_inside]))
-        self.unique_invasions.append(self.count_unique_invasions(in_pol_checker.collisions[:in_pol_checker.num_inside_points]))
+        collisions = in_pol_checker.collisions_array()
+        
+        self.num_invasions.append(in_pol_checker.num_inside_points)
+        self.invasions_pos.append(in_pol_checker.inside_points_array())
+        self.unique_invasions.append(self.count_unique_invasions(collisions))
         self.times.append(t)
 
-        relative_areas = []
-        for id, is_resolved in enumerate(self.solver.in_pol_checker.is_col_resolved):
-            if not is_resolved:
-                ring_id = self.solver.in_pol_checker.collisions[id].ring_id
-                relative_areas.append(self.solver.area_debug.area[ring_id])
-        self.relative_areas.append(relative_areas)
+        not_resolved = collisions["ring_id"][~collisions["resolved"]]
+        self.relative_areas.append(self.obs.areas[not_resolved])
     
         if self.autosave_cfg:
             self.check_autosave()
     
-    def count_unique_invasions(self, collisions: list[ColInfo]):
-        unique_collisions = set()
-        for collision in collisions:
-            ids = tuple(sorted([collision.col_ring_id, collision.ring_id]))
-            unique_collisions.add(ids)
-        return len(unique_collisions)
+    def next_due_step(self):
+        return max(self.last_col_time + self.col_cfg.freq_dt, self.solver.num_time_steps + 1)
+
+    @staticmethod
+    def count_unique_invasions(collisions: np.ndarray):
+        "Número de pares distintos de anéis nas colisões em `collisions` (ver `InPolChecker.collisions_array`)."
+        if collisions.size == 0:
+            return 0
+        pairs = np.sort(np.stack([collisions["ring_id"], collisions["col_ring_id"]], axis=1), axis=1)
+        return len(np.unique(pairs, axis=0))
 
     def save(self):
-        with open(self.data_path / "data.pickle", "wb") as f:
-            pickle.dump({
-                "times": self.times, 
-                "num_invasions": self.num_invasions,
-                "invasions_pos": self.invasions_pos,
-                "unique_invasions": self.unique_invasions,
-                "relative_areas": self.relative_areas,
-            }, f)
+        ragged = {
+            "invasions_pos": (self.invasions_pos, (0, 2)),
+            "relative_areas": (self.relative_areas, (0,)),
+        }
+        for name, (points, empty_shape) in ragged.items():
+            sizes = [len(p) for p in points]
+            offsets = np.zeros(len(points) + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum(sizes)
+            values = np.concatenate(points) if points else np.empty(empty_shape)
+
+            np.save(self.data_path / f"{name}.npy", values)
+            np.save(self.data_path / f"{name}_offsets.npy", offsets)
+
+        np.save(self.data_path / "times.npy", np.array(self.times, dtype=float))
+        np.save(self.data_path / "num_invasions.npy", np.array(self.num_invasions, dtype=int))
+        np.save(self.data_path / "unique_invasions.npy", np.array(self.unique_invasions, dtype=int))
 
         with open(self.data_path / "metadata.yaml", "w") as f:
             yaml.dump({
@@ -1,3 +1,4 @@
+import heapq
 from pathlib import Path
 from phystem.core.collectors import ColAutoSaveCfg
 from phystem.systems.ring.solvers import CppSolver
@@ -18,6 +19,7 @@ class ColManager(RingCol):
     
     def setup(self):
         self.cols: dict[str, RingCol] = {}
+        self.cols_states: dict[str, bytes] = None
 
         for name, col_i_cfg in self.col_cfg.cols_cfgs.items():
             self.add_collector(col_i_cfg, name)
@@ -38,7 +40,7 @@ class ColManager(RingCol):
         root_path = self.root_path / name
         ColT: type[RingCol] = Configs2Collector.get(type(configs))
         col = ColT(col_cfg=configs, 
-            solver=self.solver, root_path=root_path, configs=self.configs,
+            solver=self.solver, root_path=root_path, configs=self.configs, obs=self.obs,
         )
 
         self.cols[name] = col
@@ -57,16 +59,89 @@ class ColManager(RingCol):
         if self.autosave_cfg:
             self.check_autosave()
     
-    def autosave(self):
-        super().autosave()
+    def schedule(self):
+        '''
+        Monta a fila de prioridade com o próximo passo em que cada coletor precisa
+        coletar (ver `Collector.next_due_step`). Deve ser chamado antes de `advance`
+        e sempre que o estado dos coletores for alterado fora de `advance`.
+        '''
+        self.due_queue = []
+        for order, col in enumerate(self.cols.values()):
+            self.push_due(order, col)
         
-        for col in self.cols.values():
+        self.autosave_due = None
+        if self.autosave_cfg:
+            self.autosave_due = self.autosave_due_step()
+
+    def push_due(self, order: int, col: RingCol):
+        due = col.next_due_step()
+        if due is not None:
+            heapq.heappush(self.due_queue, (due, order))
+
+    def advance(self, tf: float):
+        '''
+        Avança o solver até o próximo passo em que algum coletor precisa coletar 
+        (ou até o tempo `tf`) e chama `collect` apenas dos coletores que precisam coletar
+        nesse passo. O resultado é o mesmo de chamar `solver.update()` e `self.collect()` 
+        a cada passo.
+        '''
+        solver = self.solver
+        
+        target = self.due_queue[0][0] if self.due_queue else None
+        if self.autosave_due is not None:
+            target = self.autosave_due if target is None else min(target, self.autosave_due)
+
+        while solver.time < tf:
+            solver.update()
+            if target is not None and solver.num_time_steps >= target:
+                break
+        else:
+            return
+
+        step = solver.num_time_steps
+        cols = list(self.cols.values())
+
+        due_orders = []
+        while self.due_queue and self.due_queue[0][0] <= step:
+            due_orders.append(heapq.heappop(self.due_queue)[1])
+        
+        for order in sorted(due_orders):
+            cols[order].collect()
+            self.push_due(order, cols[order])
+
+        if self.autosave_due is not None and self.autosave_due <= step:
+            self.check_autosave()
+            self.autosave_due = self.autosave_due_step()
+    
+    @property
+    def vars_to_save(self):
+        v = super().vars_to_save
+        v.append("cols_states")
+        return v
+
+    def autosave(self):
+        # Os estados dos coletores são salvos no mesmo arquivo do estado do gerenciador,
+        # então o auto-salvamento de todos os coletores é confirmado de uma única vez
+        # (ver `AutoSavable.exec_autosave`) e sempre é consistente.
+        self.cols_states = {}
+        for name, col in self.cols.items():
             col.autosave_last_time = self.solver.time
-            col.exec_autosave()
+            self.cols_states[name] = col.dump_state()
+        
+        super().autosave()
+        self.cols_states = None
 
     def load_autosave(self, use_backup=False):
+        self.cols_states = None
         r = super().load_autosave(use_backup)
 
+        if self.cols_states is not None:
+            for name, col in self.cols.items():
+                col.load_state(self.cols_states[name])
+            self.cols_states = None
+            return r
+
+        # Auto-salvamentos antigos, em que cada coletor possui o seu próprio auto-salvamento.
         for name, col in self.cols.items():
             col.load_autosave()
 
@@ -100,11 +175,11 @@ class ColManager(RingCol):
             # for name, ColT in cols.items():
             #     collectors.add_collector(ColT, ColT.get_kwargs_configs(cfg[name]), name)
 
+            collectors.schedule()
             prog = progress.Continuos(collect_cfg.tf)
             while solver.time < collect_cfg.tf:
                 prog.update(solver.time)
-                solver.update()
-                collectors.collect()
+                collectors.advance(collect_cfg.tf)
 
             if collectors.autosave_cfg:
                 collectors.exec_autosave()
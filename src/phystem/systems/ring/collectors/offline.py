@@ -0,0 +1,182 @@
+'''
+Coleta offline: executa um coletor dos anéis sobre snapshots já salvas (ver `SnapshotsCol`),
+dividindo os frames em partes que são processadas em paralelo.
+'''
+import copy, os, shutil, yaml
+import numpy as np
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from phystem.core.run_config import CollectDataCfg
+from phystem.systems.ring.run_config import ReplayDataCfg
+from phystem.systems.ring.solvers import SolverReplay
+from phystem.systems.ring.solver_config import ReplaySolverCfg
+from phystem.utils import progress
+
+from .base import RingCol, ColCfg, Mergeable
+from .config_to_col import Configs2Collector
+
+def chunk_frames(start: int, stop: int, num_chunks: int) -> list[tuple[int, int]]:
+    "Divide os frames no intervalo [start, stop) em até `num_chunks` partes consecutivas."
+    bounds = np.linspace(start, stop, num_chunks + 1).round().astype(int)
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+def get_replay_sim(replay_path, col_cfg: ColCfg, folder_path, data_dirname="data", solver_cfg: ReplaySolverCfg=None):
+    '''
+    Simulação no modo de coleta de dados com as snapshots em `replay_path`
+    (ver `CollectDataCfg.replay_data_cfg`), cujo solver é um `SolverReplay`.
+    '''
+    from phystem.systems.ring.simulation import Simulation
+
+    replay_cfg = ReplayDataCfg(replay_path, data_dirname, solver_cfg=solver_cfg)
+    configs = dict(replay_cfg.system_cfg)
+    configs["run_cfg"] = CollectDataCfg(int_cfg=replay_cfg.int_cfg, tf=np.inf, folder_path=folder_path,
+        func_cfg=col_cfg, replay_data_cfg=replay_cfg)
+    return Simulation(**configs)
+
+def collect_chunk(replay_path, col_cfg: ColCfg, chunk_path, frames: tuple[int, int],
+    data_dirname="data", solver_cfg: ReplaySolverCfg=None):
+    '''
+    Executa o coletor de `col_cfg` nos frames [start, stop) = `frames` das snapshots em
+    `replay_path`, salvando os dados em `chunk_path`. Ao terminar, é criado o arquivo
+    "done.yaml" em `chunk_path`.
+    '''
+    start, stop = frames
+    chunk_path = Path(chunk_path)
+
+    sim = get_replay_sim(replay_path, col_cfg, chunk_path, data_dirname, solver_cfg)
+    solver: SolverReplay = sim.solver
+    sim.run_cfg.tf = float(solver.times[stop - 1])
+
+    # O coletor é inicializado no frame anterior, então ele coleta a partir de `start`,
+    # como se a coleta tivesse sido feita em uma única execução.
+    solver.seek(max(start - 1, 0))
+
+    ColT: RingCol = Configs2Collector.get(type(col_cfg))
+    collector = ColT(col_cfg, solver, chunk_path, sim.configs, exist_ok=True)
+    while solver.frame < stop - 1:
+        solver.update()
+        collector.collect()
+
+    collector.save()
+    collector.flush_writes()
+
+    with open(chunk_path / "done.yaml", "w") as f:
+        yaml.dump({"frames": [start, stop]}, f)
+    return frames
+
+def recollect(replay_path, col_cfg: ColCfg, folder_path, frames: tuple[int, int]=None, num_chunks: int=None,
+    num_workers: int=None, data_dirname="data", solver_cfg: ReplaySolverCfg=None, resume=True, keep_chunks=False):
+    '''
+    Executa o coletor de `col_cfg` sobre as snapshots salvas em `replay_path`. Os frames são
+    divididos em partes consecutivas e cada parte é coletada por um processo, com seu próprio
+    `SolverReplay`. No final, os dados das partes são juntados em `folder_path` com o método
+    `merge` do coletor, que deve ser um `Mergeable`.
+
+    Cada parte é uma coleta independente que começa no seu primeiro frame, então coletores
+    com intervalos entre coletas maiores que o intervalo entre frames podem ter as coletas
+    deslocadas nas bordas das partes.
+
+    As partes são salvas em "{folder_path}/chunks/chunk_{i}". Se `resume` for `True`, as
+    partes já terminadas em uma execução anterior (interrompida) não são coletadas novamente.
+
+    Parâmetros:
+    -----------
+    replay_path:
+        Pasta raiz das snapshots (mesmo que `ReplayDataCfg.root_path`).
+
+    col_cfg:
+        Configurações do coletor. O auto-salvamento não é utilizado.
+
+    folder_path:
+        Pasta raiz dos dados coletados.
+
+    frames:
+        Intervalo [start, stop) dos frames coletados. Se for `None`, são utilizados
+        todos os frames.
+
+    num_chunks:
+        Número de partes. Se for `None`, é igual ao número de processos.
+
+    num_workers:
+        Número de processos. Se for `None`, é igual ao número de CPUs. Se for 1, as
+        partes são coletadas no processo atual.
+
+    solver_cfg:
+        Configurações do `SolverReplay`.
+
+    resume:
+        Se for `False`, as partes de execuções anteriores são apagadas.
+
+    keep_chunks:
+        Se for `False`, as partes são apagadas após serem juntadas.
+    '''
+    ColT: RingCol = Configs2Collector.get(type(col_cfg))
+    if not issubclass(ColT, Mergeable):
+        raise ValueError(f"O coletor '{ColT.__name__}' não implementa `merge`, necessário na coleta offline.")
+
+    col_cfg = copy.copy(col_cfg)
+    col_cfg.autosave_cfg = None
+
+    folder_path = Path(folder_path)
+    chunks_root = folder_path / "chunks"
+
+    if frames is None:
+        solver: SolverReplay = get_replay_sim(replay_path, col_cfg, folder_path, data_dirname, solver_cfg).solver
+        frames = (0, solver.num_frames - solver.cfg.calc_vel_dframes)
+
+    if num_workers is None:
+        num_workers = os.cpu_count()
+    if num_chunks is None:
+        num_chunks = num_workers
+
+    plan = {
+        "replay_path": str(Path(replay_path).absolute()),
+        "collector": ColT.__name__,
+        "chunks": [list(c) for c in chunk_frames(frames[0], frames[1], num_chunks)],
+    }
+
+    plan_path = chunks_root / "plan.yaml"
+    if plan_path.exists():
+        if not resume:
+            shutil.rmtree(chunks_root)
+        else:
+            with open(plan_path, "r") as f:
+                old_plan = yaml.unsafe_load(f)
+            if old_plan != plan:
+                raise ValueError((
+                    f"As partes em '{chunks_root}' foram geradas com outra divisão dos frames. "
+                    "Utilize `resume=False` para apagá-las."
+                ))
+
+    chunks_root.mkdir(parents=True, exist_ok=True)
+    with open(plan_path, "w") as f:
+        yaml.dump(plan, f)
+
+    chunks_paths = [chunks_root / f"chunk_{i}" for i in range(len(plan["chunks"]))]
+    pending = [(path, tuple(c)) for path, c in zip(chunks_paths, plan["chunks"]) if not (path / "done.yaml").exists()]
+
+    num_frames = frames[1] - frames[0]
+    done_frames = num_frames - sum(c[1] - c[0] for _, c in pending)
+    prog = progress.Continuos(num_frames)
+    prog.update(done_frames)
+
+    args = (data_dirname, solver_cfg)
+    if num_workers == 1:
+        for path, c in pending:
+            collect_chunk(replay_path, col_cfg, path, c, *args)
+            done_frames += c[1] - c[0]
+            prog.update(done_frames)
+    else:
+        with ProcessPoolExecutor(num_workers) as executor:
+            futures = [executor.submit(collect_chunk, replay_path, col_cfg, path, c, *args) for path, c in pending]
+            for future in as_completed(futures):
+                start, stop = future.result()
+                done_frames += stop - start
+                prog.update(done_frames)
+
+    ColT.merge(chunks_paths, folder_path)
+    shutil.copy(chunks_paths[0] / "config.yaml", folder_path / "config.yaml")
+
+    if not keep_chunks:
+        shutil.rmtree(chunks_root)
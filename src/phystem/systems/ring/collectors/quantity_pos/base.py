@@ -1,12 +1,12 @@
 from enum import Enum, auto
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-import pickle
 import yaml
 
-from phystem.core.collectors import ColAutoSaveCfg
-from phystem.data_utils.data_types import ArraySizeAware
+from phystem.core.collectors import ColAutoSaveCfg, get_writer
+from phystem.data_utils.data_types import RaggedArray, ShardFiles
 from phystem.systems.ring.solvers import CppSolver
+from phystem.systems.ring.observables import StepObservables
 
 @dataclass
 class QuantityPosState:
@@ -23,7 +23,7 @@ class QuantityState:
     "Variáveis que caracterizam o estado dos coletores gerenciados."
     
     # Container dos dados coletados.
-    data: ArraySizeAware
+    data: RaggedArray
     
     # Id do arquivo atualmente sendo preenchido de dados.
     file_id:int = 0
@@ -57,12 +57,15 @@ class QuantityPosCfg:
         Configurações do gerenciador de coletores com quantidades associadas às posições
         do centro dos anéis. Para escolher quais coletores serão utilizados, basta
         adicionar a sua configuração no parâmetro `quantities_cfg`. Por padrão,
-        sempre é adicionado um coletor de posições dos anéis.
+        sempre é adicionado um coletor de posições dos anéis, exceto quando todos
+        os coletores acumulam seus dados em grades durante a coleta (ver `GridQuantityCfg`),
+        caso em que nenhum dado por anel é salvo.
 
-        Em cada coletor, os dados são guardados em um array com dimensão (N, n_p, d) em que:
+        Em cada coletor, os dados são guardados em um `RaggedArray` com N pontos, em que
+        o i-ésimo ponto é um array com shape (n_i, d):
         
         N   : Número de pontos coletados
-        n_p : Número de anéis em um ponto coletado
+        n_i : Número de anéis no i-ésimo ponto coletado
         d   : Dimensão dos elementos que constituem o ponto
 
         OBS: Se a coleta for muito longa, os dados coletados vão ser salvos em arquivos separados, mas que em
@@ -152,9 +155,12 @@ class QuantityCol(ABC):
     StateT = QuantityState
     
     def __init__(self, configs: QuantityCfg, root_state: QuantityPosState, root_configs: QuantityPosCfg, 
-        solver: CppSolver, num_max_rings, num_data_points_per_file, data_path):
+        solver: CppSolver, num_data_points_per_file, data_path, obs: StepObservables=None, 
+        sim_configs: dict=None):
         "Base dos coletores gerenciados por `QuantityPos`."
         self.solver = solver
+        self.sim_configs = sim_configs
+        self.obs = obs if obs is not None else StepObservables(solver)
         self.configs = configs
         self.root_state = root_state
         self.root_configs = root_configs
@@ -163,7 +169,7 @@ class QuantityCol(ABC):
 
         self.metadata = {}
 
-        self.state = self.StateT(self.create_data(num_data_points_per_file, num_max_rings))
+        self.state = self.StateT(self.create_data(num_data_points_per_file))
 
         self.init_metadata(self.metadata)
 
@@ -177,8 +183,8 @@ class QuantityCol(ABC):
     def before_save_metadata(self, metadata: dict):
         pass
 
-    def create_data(self, num_data_points_per_file, num_max_rings):
-        return ArraySizeAware(num_data_points_per_file, num_max_rings, self.configs.num_dims)
+    def create_data(self, num_data_points_per_file):
+        return RaggedArray(num_data_points_per_file, self.configs.num_dims)
 
     def to_collect(self, time_dt: int, is_time: bool) -> bool:
         '''
@@ -195,15 +201,30 @@ class QuantityCol(ABC):
         '''
         return is_time
 
+    def next_due_step(self) -> int:
+        '''
+        Próximo passo temporal em que `to_collect` retorna `True` independentemente
+        de `is_time`, ou `None` se o coletor apenas coleta quando `is_time` é `True`.
+        '''
+        return None
+
     @abstractmethod
     def collect(self, ids_in_region, cms_in_region):
         pass
 
+    def flush_if_full(self):
+        "Salva os dados e esvazia o container, caso ele esteja cheio."
+        if self.state.data.is_full:
+            self.save_data()
+            self.state.file_id += 1
+            self.state.data.reset()
+
     def save_data(self):
-        filename = f"{self.configs.name}_{self.state.file_id}"
-        file_path = self.data_path / (filename + ".pickle")
-        with open(file_path, "wb") as f:
-            pickle.dump(self.state.data, f)
+        # Os dados são copiados, pois o container é reutilizado após o salvamento.
+        data = self.state.data
+        data = RaggedArray.from_arrays(data.values.copy(), data.offsets.copy())
+        get_writer().submit(ShardFiles(self.data_path, self.configs.name).save, data, self.state.file_id, 
+            key=id(self))
     
     def save(self):
         self.save_data()
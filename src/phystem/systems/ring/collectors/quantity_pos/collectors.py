@@ -1,6 +1,9 @@
 from dataclasses import dataclass
+from abc import abstractmethod
 import numpy as np
+import yaml
 
+from phystem.data_utils.grids import RegularGrid
 from .base import QuantityCfg, QuantityCol, QuantityState
 
 class CmsCfg(QuantityCfg):
@@ -21,13 +24,13 @@ class VelocityCfg(QuantityCfg):
         Configurações do coletor de velocidades dos anéis. 
         A dimensão dos pontos é 4 e a interpretação dos dados é a seguinte:
             
-        collector.data[i] -> i-ésimo ponto. Array com dimensão (n_p, 4)
-        collector.data[i, :, :2] -> Centros de massa na primeira coleta, digamos no tempo T = t.
-        collector.data[i, :, 2:] -> Centros de massa na segunda coleta, no tempo T = t + `frame_dt`.
+        collector.data[i] -> i-ésimo ponto. Array com dimensão (n_i, 4)
+        collector.data[i][:, :2] -> Centros de massa na primeira coleta, digamos no tempo T = t.
+        collector.data[i][:, 2:] -> Centros de massa na segunda coleta, no tempo T = t + `frame_dt`.
 
-        Então, a velocidade de todos os pontos é dado por
+        Então, a velocidade de todos os anéis de todos os pontos é dado por
         
-        >>> (collector.data[:,:,2:] - collector.data[:,:,:2])/ (frame_dt * dt)
+        >>> (collector.data.values[:, 2:] - collector.data.values[:, :2])/ (frame_dt * dt)
 
         Parâmetros:
         ----------
@@ -60,20 +63,30 @@ class VelocityCol(QuantityCol):
 
         return time_dt - self.root_state.col_last_time >= self.configs.frame_dt
 
+    def next_due_step(self):
+        if self.state.vel_frame == 0:
+            return None
+        return self.root_state.col_last_time + self.configs.frame_dt
+
     def collect(self, ids_in_region, cms_in_region):
         if self.state.vel_frame == 0:
             self.state.vel_point_ids = ids_in_region
-            self.state.vel_point_data = np.empty((cms_in_region.shape[0], 4), dtype=self.state.data.data.dtype)
+            dtype = self.state.data.dtype if self.state.data is not None else float
+            self.state.vel_point_data = np.empty((cms_in_region.shape[0], 4), dtype=dtype)
             self.state.vel_point_data[:,:2] = cms_in_region
         else:
-            self.state.vel_point_data[:,2:] = self.solver.center_mass[self.state.vel_point_ids]
-            self.state.data.add(self.state.vel_point_data)
+            self.state.vel_point_data[:,2:] = self.obs.cms[self.state.vel_point_ids]
+            self.add_point(self.state.vel_point_data)
         
         if self.state.vel_frame == 0:
             self.state.vel_frame = 1
         else:
             self.state.vel_frame = 0
 
+    def add_point(self, point_data):
+        "Adiciona o ponto completo (após as duas coletas) `point_data`."
+        self.state.data.add(point_data)
+
 
 class PolarityCfg(QuantityCfg):
     "Configurações do coletor do ângulo das polarizações."
@@ -82,7 +95,7 @@ class PolarityCfg(QuantityCfg):
 
 class PolarityCol(QuantityCol):
     def collect(self, ids_in_region, cms_in_region):
-        self.data.add(self.solver.self_prop_angle[ids_in_region])
+        self.data.add(self.obs.angles[ids_in_region])
 
 
 class AreaCfg(QuantityCfg):
@@ -97,8 +110,211 @@ class AreaCfg(QuantityCfg):
 
 class AreaCol(QuantityCol):
     def collect(self, ids_in_region, cms_in_region):
-        areas = np.array(self.solver.area_debug.area)[ids_in_region]
-        self.data.add(areas)
+        self.data.add(self.obs.areas[ids_in_region])
+
+
+class GridQuantityCfg(QuantityCfg):
+    # Os dados não são armazenados ponto a ponto.
+    num_dims = None
+
+    def __init__(self, grid: RegularGrid):
+        '''
+        Base das configurações dos coletores que acumulam os dados na grade `grid` 
+        no momento da coleta, em vez de salvar os dados de cada anel. Apenas as somas
+        por célula (e o número de pontos coletados) são mantidas, e ao final da coleta
+        o resultado é salvo na pasta "data/{name}", no mesmo formato dos calculadores
+        equivalentes (ver `phystem.systems.ring.quantities.calculators`).
+        '''
+        self.grid = grid
+
+@dataclass
+class GridState(QuantityState):
+    # Soma, em todos os pontos, dos valores de cada célula da grade.
+    cell_sum: np.ndarray = None
+    
+    # Número de pontos coletados.
+    num_points: int = 0
+
+class GridQuantityCol(QuantityCol):
+    configs: GridQuantityCfg
+    state: GridState
+    StateT = GridState
+
+    # Nome do arquivo do resultado (sem a extensão).
+    result_name: str
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.grid = self.configs.grid
+        self.state.cell_sum = np.zeros(self.sum_shape(), dtype=float)
+
+    def sum_shape(self):
+        return self.grid.shape_mpl_t
+
+    def create_data(self, num_data_points_per_file):
+        return None
+
+    def flush_if_full(self):
+        pass
+
+    def save_data(self):
+        pass
+
+    def accumulate(self, cms: np.ndarray, values: np.ndarray=None):
+        '''
+        Acumula um ponto. Se `values` for `None`, acumula a contagem de anéis em 
+        cada célula, caso contrário, a média por célula de `values`.
+        '''
+        coords = self.grid.coords(cms, simplify_shape=True)
+        offsets = np.array([0, cms.shape[0]])
+        
+        if values is None:
+            cell_values = self.grid.count(coords, offsets=offsets)
+        else:
+            cell_values = self.grid.mean_by_cell(values, coords, offsets=offsets)
+
+        self.state.cell_sum += cell_values[0]
+        self.state.num_points += 1
+
+    @abstractmethod
+    def result(self) -> np.ndarray:
+        "Resultado final, calculado a partir das somas acumuladas."
+        pass
+
+    def save(self):
+        path = self.data_path / self.configs.name
+        path.mkdir(parents=True, exist_ok=True)
+
+        self.grid.save_configs(path / "grid_configs.yaml")
+        np.save(path / f"{self.result_name}.npy", self.result())
+
+        self.before_save_metadata(self.metadata)
+        self.metadata["num_points"] = self.state.num_points
+        with open(path / "metadata.yaml", "w") as f:
+            yaml.dump(self.metadata, f)
+
+
+class DensityGridCfg(GridQuantityCfg):
+    name = "den_grid"
+    def __init__(self, grid: RegularGrid, den_eq: float=None):
+        '''
+        Configurações do coletor da densidade média de anéis em cada célula de `grid`.
+        Resultado equivalente ao de `DensityCalc`.
+
+        Parâmetros:
+        ----------
+        den_eq:
+            Se for passado, a densidade salva é relativa a `den_eq`: `den/den_eq - 1`.
+        '''
+        super().__init__(grid)
+        self.den_eq = den_eq
+
+class DensityGridCol(GridQuantityCol):
+    configs: DensityGridCfg
+    result_name = "den"
+
+    def init_metadata(self, metadata):
+        metadata["den_eq"] = self.configs.den_eq
+
+    def collect(self, ids_in_region, cms_in_region):
+        self.accumulate(cms_in_region)
+
+    def result(self):
+        cell_den = self.grid.remove_cells_out_of_bounds(self.state.cell_sum) / self.state.num_points
+
+        if self.configs.den_eq is not None:
+            return cell_den / (self.grid.cell_area * self.configs.den_eq) - 1
+        
+        stokes_cfg = None
+        if self.sim_configs is not None:
+            stokes_cfg = self.sim_configs["other_cfgs"].get("stokes", None)
+        
+        if stokes_cfg is None:
+            return cell_den / self.grid.cell_area
+        
+        cell_areas = self.grid.cell_area_outside_circle(
+            radius=stokes_cfg.obstacle_r,
+            center=(stokes_cfg.obstacle_x, stokes_cfg.obstacle_y),
+        )
+        return cell_den / cell_areas
+
+
+class VelocityGridCfg(GridQuantityCfg):
+    name = "vel_grid"
+    def __init__(self, grid: RegularGrid, frame_dt: int):
+        '''
+        Configurações do coletor da velocidade média dos anéis em cada célula de `grid`.
+        A velocidade é calculada como em `VelocityCfg`, e a célula de cada anel é a 
+        da sua posição na primeira coleta. Resultado equivalente ao de `VelocityCalc`.
+
+        Parâmetros:
+        ----------
+        frame_dt:
+            Intervalo de tempo utilizado entre as coletas para calcular as velocidades
+            em unidades de passos temporais.
+        '''
+        super().__init__(grid)
+        self.frame_dt = frame_dt
+
+@dataclass
+class VelGridState(VelState, GridState):
+    pass
+
+class VelocityGridCol(GridQuantityCol, VelocityCol):
+    configs: VelocityGridCfg
+    state: VelGridState
+    StateT = VelGridState
+    result_name = "vels"
+
+    def sum_shape(self):
+        return (*self.grid.shape_mpl_t, 2)
+
+    def add_point(self, point_data):
+        cms = point_data[:, :2]
+        vels = (point_data[:, 2:] - cms) / (self.configs.frame_dt * self.solver.dt)
+        self.accumulate(cms, vels)
+
+    def result(self):
+        return self.grid.remove_cells_out_of_bounds(self.state.cell_sum) / self.state.num_points
+
+
+class PolarityGridCfg(GridQuantityCfg):
+    '''
+    Configurações do coletor da polarização média dos anéis em cada célula da grade.
+    O resultado é o ângulo do vetor polarização médio, equivalente ao de `PolarityCalc`.
+    '''
+    name = "pol_grid"
+
+class PolarityGridCol(GridQuantityCol):
+    result_name = "pol"
+
+    def sum_shape(self):
+        return (*self.grid.shape_mpl_t, 2)
+
+    def collect(self, ids_in_region, cms_in_region):
+        angles = self.obs.angles[ids_in_region]
+        self.accumulate(cms_in_region, np.stack([np.cos(angles), np.sin(angles)], axis=-1))
+
+    def result(self):
+        cell_sum = self.grid.remove_cells_out_of_bounds(self.state.cell_sum)
+        return np.arctan2(cell_sum[..., 1], cell_sum[..., 0])
+
+
+class AreaGridCfg(GridQuantityCfg):
+    '''
+    Configurações do coletor da área média dos anéis em cada célula da grade.
+    Resultado equivalente ao de `AreaCalc` (ver a observação de `AreaCfg`).
+    '''
+    name = "area_grid"
+
+class AreaGridCol(GridQuantityCol):
+    result_name = "areas"
+
+    def collect(self, ids_in_region, cms_in_region):
+        self.accumulate(cms_in_region, self.obs.areas[ids_in_region])
+
+    def result(self):
+        return self.grid.remove_cells_out_of_bounds(self.state.cell_sum) / self.state.num_points
 
 
 quantity_cfg_to_col = {
@@ -106,4 +322,8 @@ quantity_cfg_to_col = {
     CmsCfg: CmsCol,
     PolarityCfg: PolarityCol,
     AreaCfg: AreaCol,
+    DensityGridCfg: DensityGridCol,
+    VelocityGridCfg: VelocityGridCol,
+    PolarityGridCfg: PolarityGridCol,
+    AreaGridCfg: AreaGridCol,
 }
\ No newline at end of file
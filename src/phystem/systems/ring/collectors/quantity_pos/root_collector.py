@@ -1,27 +1,33 @@
+import shutil
 import numpy as np
+from pathlib import Path
 
-from phystem.systems.ring.collectors import RingCol
+from phystem.systems.ring.collectors import RingCol, Mergeable
+from phystem.data_utils.data_types import ShardFiles
 from phystem.systems.ring.solvers import CppSolver
 from phystem.systems.ring.run_config import RingCfg
 from phystem.systems.ring.configs import SpaceCfg
 
-from .base import QuantityPosState, QuantityPosCfg, QuantityCol, CheckType
-from .collectors import CmsCfg, quantity_cfg_to_col
+from .base import QuantityPosState, QuantityPosCfg, QuantityCol
+from .collectors import CmsCfg, GridQuantityCfg, quantity_cfg_to_col
 
 from phystem.systems.ring.collectors.config_to_col import Configs2Collector
 
-class QuantityPosCol(RingCol):
+class QuantityPosCol(RingCol, Mergeable):
     solver: CppSolver
     col_cfg: QuantityPosCfg
 
     def setup(self):
         has_cms_cfg = False
+        has_raw_cfg = len(self.col_cfg.quantities_cfg) == 0
         for q in self.col_cfg.quantities_cfg:
             if type(q) is CmsCfg:
                 has_cms_cfg = True
-                break
+            if not isinstance(q, GridQuantityCfg):
+                has_raw_cfg = True
         
-        if not has_cms_cfg:
+        # Quando todas as quantidades são acumuladas em grades, nenhum dado por anel é salvo.
+        if has_raw_cfg and not has_cms_cfg:
             self.col_cfg.quantities_cfg.append(CmsCfg())
 
         dynamic_cfg: RingCfg = self.configs["dynamic_cfg"]
@@ -38,14 +44,17 @@ class QuantityPosCol(RingCol):
         if h > space_cfg.height:
             h = space_cfg.height
         
-        num_max_rings = int(l * h / area_eq * 2.5)
+        # Os dados não possuem preenchimento, então o número de pontos por arquivo
+        # é estimado com o número de anéis no equilíbrio.
+        num_rings_eq = max(int(l * h / area_eq), 1)
         num_dims = 4
-        num_data_points_per_file = int(self.col_cfg.memory_per_file / (num_max_rings * num_dims * 4))            
+        num_data_points_per_file = max(int(self.col_cfg.memory_per_file / (num_rings_eq * num_dims * 4)), 1)
 
         self.state = QuantityPosState(self.solver.num_time_steps)
         
         self.quantities: list[QuantityCol] = [
-            quantity_cfg_to_col[type(q_cfg)](q_cfg, self.state, self.col_cfg, self.solver, num_max_rings, num_data_points_per_file, self.data_path)
+            quantity_cfg_to_col[type(q_cfg)](q_cfg, self.state, self.col_cfg, self.solver, num_data_points_per_file, self.data_path, 
+                self.obs, self.configs)
             for q_cfg in self.col_cfg.quantities_cfg
         ]
 
@@ -59,6 +68,10 @@ class QuantityPosCol(RingCol):
             "quantities_states",
         ])
         return v
+
+    @property
+    def journal_vars(self):
+        return ["state.times"]
     
     @staticmethod
     def get_kwargs_configs(cfg: QuantityPosCfg):
@@ -79,33 +92,25 @@ class QuantityPosCol(RingCol):
         Retorna as posições dos anéis e seus ids na lista
         global de anéis que estão dentro da região de coleta.
         '''
-        num_active = self.solver.num_active_rings
-        ids_active = self.solver.rings_ids[:num_active]
-        cms = self.solver.center_mass
-        
-        cms_active = cms[ids_active]
-        
-        if self.col_cfg.check_type is not CheckType.none:
-            if self.col_cfg.check_type is CheckType.only_x:
-                mask_in_region = self.mask_x_region(cms_active)
-            elif self.col_cfg.check_type is CheckType.only_y:
-                mask_in_region = self.mask_y_region(cms_active)
-            else:
-                mask_in_region = self.mask_y_region(cms_active) & self.mask_x_region(cms_active)
+        if not (self.col_cfg.check_x or self.col_cfg.check_y):
+            return self.obs.active_ids, self.obs.cms_active
 
-            ids_in_region = ids_active[mask_in_region]
-            cms_in_region = cms_active[mask_in_region]
-        else:
-            ids_in_region = ids_active
-            cms_in_region = cms_active
+        return self.solver.rings_in_rect(self.col_cfg.xlims, self.col_cfg.ylims)
 
-        return ids_in_region, cms_in_region
+    def next_due_step(self):
+        transient_time = self.col_cfg.transient_time
+        transient_step = self.first_step_where(lambda t: t >= transient_time)
 
-    def mask_x_region(self, cms_active):
-        return (cms_active[:, 0] > self.col_cfg.xlims[0]) & (cms_active[:, 0] < self.col_cfg.xlims[1])
+        due = self.state.col_last_time + self.col_cfg.collect_dt
+        for q in self.quantities:
+            q_due = q.next_due_step()
+            if q_due is not None:
+                due = min(due, q_due)
+        
+        if self.autosave_cfg:
+            due = min(due, self.autosave_due_step())
 
-    def mask_y_region(self, cms_active):
-        return (cms_active[:, 1] > self.col_cfg.ylims[0]) & (cms_active[:, 1] < self.col_cfg.ylims[1])
+        return max(due, transient_step, self.solver.num_time_steps + 1)
 
     def collect(self):
         if self.solver.time < self.col_cfg.transient_time:
@@ -122,10 +127,7 @@ class QuantityPosCol(RingCol):
             if q.to_collect(time_dt, is_time):
                 q.collect(ids_in_region, cms_in_region)
         
-            if q.state.data.is_full:
-                q.save_data()
-                q.state.file_id += 1
-                q.state.data.reset()
+            q.flush_if_full()
 
         if is_time:
             self.state.times.append(self.solver.time)
@@ -139,14 +141,47 @@ class QuantityPosCol(RingCol):
             q.save()
 
         np.save(self.data_path / "times.npy", np.array(self.state.times))
+        self.flush_writes()
+
+    @classmethod
+    def merge(Cls, chunks_paths: list[Path], root_path: Path):
+        '''
+        Junta os dados das coletas em `chunks_paths` (ver `Mergeable.merge`). Os shards
+        de cada quantidade são concatenados, na ordem das partes, em uma única lista.
 
-    def load_autosave(self, use_backup=False):
-        r = super().load_autosave(use_backup)
+        OBS: Quantidades acumuladas em grades (ver `GridQuantityCfg`) não podem ser juntadas,
+        pois apenas o resultado final de cada parte é salvo.
+        '''
+        chunks_data = [Path(path) / "data" for path in chunks_paths]
+        grids_names = [p.name for p in chunks_data[0].iterdir() if p.is_dir()]
+        if len(grids_names) > 0:
+            raise ValueError(f"As quantidades em grades {grids_names} não podem ser juntadas.")
+
+        data_path = Path(root_path) / "data"
+        data_path.mkdir(parents=True, exist_ok=True)
+
+        np.save(data_path / "times.npy", np.concatenate([np.load(p / "times.npy") for p in chunks_data]))
+
+        suffix = "_manifest.yaml"
+        for manifest_path in chunks_data[0].glob(f"*{suffix}"):
+            name = manifest_path.name[:-len(suffix)]
+            
+            merged = ShardFiles(data_path, name)
+            file_id = 0
+            for path in chunks_data:
+                shards = ShardFiles(path, name)
+                for i in range(len(shards.load_manifest()["shards"])):
+                    merged.save(shards.load(i), file_id)
+                    file_id += 1
+            
+            # Os metadados da última parte descrevem o final da coleta.
+            shutil.copy(chunks_data[-1] / f"{name}_metadata.yaml", data_path / f"{name}_metadata.yaml")
+
+    def load_state(self, data):
+        super().load_state(data)
         
         for q, s in zip(self.quantities, self.quantities_states):
             q.state = s
             q.root_state = self.state
 
-        return r
-
 Configs2Collector.add(QuantityPosCfg, QuantityPosCol)
\ No newline at end of file
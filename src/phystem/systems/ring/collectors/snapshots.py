@@ -1,7 +1,10 @@
 import numpy as np
 from pathlib import Path
 from phystem.core.collectors import ColAutoSaveCfg
+from phystem.core import settings
+from phystem.data_utils.frame_store import FrameStore, FrameStoreWriter
 from phystem.systems.ring.solvers import CppSolver
+from phystem.systems.ring.run_config import UpdateType
 from phystem.systems.ring.simulation import Simulation
 from phystem.systems.ring.state_saver import StateSaver, StateData
 
@@ -9,14 +12,43 @@ from .base import RingCol, ColCfg
 from .config_to_col import Configs2Collector
 
 class SnapshotsColCfg(ColCfg):
-    def __init__(self, snaps_dt: float, xlims=(-1, -1), wait_time: float = 0, autosave_cfg: ColAutoSaveCfg = None) -> None:
+    def __init__(self, snaps_dt: float, xlims=(-1, -1), wait_time: float = 0, autosave_cfg: ColAutoSaveCfg = None,
+        consolidated=True, quantized=False, compression: str=None) -> None:
+        '''
+        Parâmetros:
+        -----------
+        consolidated:
+            Se for `True`, as snapshots são salvas no armazenamento consolidado
+            (ver `phystem.data_utils.frame_store`), na pasta "data/snaps". Caso contrário,
+            cada snapshot é salva em arquivos separados ("pos_{i}.npy", "angle_{i}.npy", "uids_{i}.npy").
+        
+        quantized:
+            Se for `True`, as posições são salvas como o centro de massa de cada anel (float32) 
+            mais as posições das partículas em relação a ele quantizadas em int16 
+            (ver `phystem.data_utils.quantize`), e os ângulos são salvos em float32. 
+            O erro máximo nas posições é de ~1.5e-5 vezes o tamanho do anel, inclusive 
+            para os anéis que cruzam a borda periódica. Apenas disponível com `consolidated=True`.
+        
+        compression:
+            Compressão dos dados de cada snapshot: `None`, "zlib" ou "lzma". 
+            Apenas disponível com `consolidated=True`.
+        '''
         super().__init__(autosave_cfg)
         self.snaps_dt = snaps_dt
         self.xlims = xlims
         self.wait_time = wait_time
         self.autosave_cfg = autosave_cfg
+        self.consolidated = consolidated
+        self.quantized = quantized
+        self.compression = compression
+
+        if not consolidated and (quantized or compression is not None):
+            raise ValueError("'quantized' e 'compression' apenas podem ser utilizados com 'consolidated=True'.")
 
 class SnapshotsCol(RingCol):
+    # Dados salvos no armazenamento consolidado.
+    store_fields = ("pos", "angle", "uids")
+
     def setup(self):
         self.cfgs = self.col_cfg
 
@@ -28,8 +60,31 @@ class SnapshotsCol(RingCol):
 
         self.snaps_saver = StateSaver(
             solver=self.solver, root_path=self.data_path, configs=self.configs, xlims=self.col_cfg.xlims,
+            obs=self.obs,
         )
 
+        self.store = None
+        if self.cfgs.consolidated:
+            quantized = getattr(self.cfgs, "quantized", False)
+            state = self.snaps_saver.get_state(self.store_fields)
+            fields = {name: (value.dtype, value.shape[1:]) for name, value in state.items()}
+            if quantized:
+                fields["angle"] = (np.float32, fields["angle"][1])
+            
+            # No escoamento de Stokes as bordas não são periódicas.
+            box = None
+            if self.configs["run_cfg"].int_cfg.update_type is not UpdateType.STOKES:
+                space_cfg = self.configs["space_cfg"]
+                box = (space_cfg.length, space_cfg.height)
+
+            self.store = FrameStoreWriter(
+                root_path=self.data_path / settings.snaps_store_dirname,
+                fields=fields,
+                quantized=("pos",) if quantized else (),
+                compression=getattr(self.cfgs, "compression", None),
+                box=box,
+            )
+
     @property
     def vars_to_save(self):
         v = super().vars_to_save
@@ -37,6 +92,10 @@ class SnapshotsCol(RingCol):
             ["snaps_count", "snaps_last_time", "init_time", "times"]            
         )
         return v
+
+    @property
+    def journal_vars(self):
+        return ["times"]
     
     def collect(self) -> None:
         if self.solver.time < self.cfgs.wait_time:
@@ -47,15 +106,12 @@ class SnapshotsCol(RingCol):
         
         self.snaps_last_time = self.solver.time
 
-        self.snaps_saver.save(
-            filenames=StateSaver.FileNames(
-                pos=f"pos_{self.snaps_count}",
-                angle=f"angle_{self.snaps_count}",
-                uids=f"uids_{self.snaps_count}",
-                metadata=None,
-                ids=None,
-            )
-        )
+        state = self.snaps_saver.get_state(self.store_fields)
+        if self.store is not None:
+            self.submit_write(self.store.append, self.solver.time, **state)
+        else:
+            for name, value in state.items():
+                self.submit_write(np.save, self.data_path / f"{name}_{self.snaps_count}.npy", value)
         self.times.append(self.solver.time)
 
         self.snaps_count += 1
@@ -63,10 +119,31 @@ class SnapshotsCol(RingCol):
         if self.autosave_cfg:
             self.check_autosave()
     
+    def dump_state(self):
+        if self.store is not None:
+            self.store.flush()
+        return super().dump_state()
+
+    def load_state(self, data):
+        super().load_state(data)
+
+        # Snapshots coletadas após o auto-salvamento são descartadas.
+        if self.store is not None:
+            self.store.truncate(self.snaps_count)
+
+    def next_due_step(self):
+        wait_time = self.cfgs.wait_time
+        next_snap_time = self.snaps_last_time + self.cfgs.snaps_dt
+        return self.first_step_where(lambda t: (t >= wait_time) & (t >= next_snap_time))
+
     def save(self):
         import yaml
         import numpy as np
 
+        self.flush_writes()
+        if self.store is not None:
+            self.store.flush()
+
         np.save(self.data_path / "times.npy", np.array(self.times))
 
         with open(self.data_path / "metadata.yaml", "w") as f:
@@ -74,6 +151,9 @@ class SnapshotsCol(RingCol):
                 "frame_dt": self.cfgs.snaps_dt,
                 "init_time": self.init_time,
                 "num_frames": self.snaps_count,
+                "consolidated": self.store is not None,
+                "quantized": self.store is not None and "pos" in self.store.quantized,
+                "compression": self.store.compression if self.store is not None else None,
             }, f)
 
     @staticmethod
@@ -101,11 +181,20 @@ class SnapshotsCol(RingCol):
     
     @staticmethod
     def load_snaps(root_path):
-        "Carrega todas as snapshot no caminho raiz `root_path`."
+        '''
+        Carrega todas as snapshot no caminho raiz `root_path`. Se as snapshots
+        estão no armazenamento consolidado, os arrays retornados são mapeados em memória.
+        '''
         data_path = Path(root_path) / "data"
         
+        store_path = data_path / settings.snaps_store_dirname
+        if FrameStore.exists(store_path):
+            store = FrameStore(store_path)
+            return [StateData(pos=frame["pos"], angle=frame["angle"], uids=frame["uids"], ids=None) 
+                for frame in store]
+
         def value_path(name, id):
-            return Path(data_path / f"{name}_{count}.npy")
+            return Path(data_path / f"{name}_{id}.npy")
 
         snaps: list[StateData] = []
         count = 0
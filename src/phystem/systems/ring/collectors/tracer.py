@@ -0,0 +1,243 @@
+import yaml
+import numpy as np
+from pathlib import Path
+
+from phystem.core.collectors import ColAutoSaveCfg
+from phystem.systems.ring.solvers import CppSolver
+from phystem.systems.ring import rings_quantities
+
+from .base import RingCol, ColCfg
+from .config_to_col import Configs2Collector
+
+class TracerColCfg(ColCfg):
+    def __init__(self, num_tracers: int=None, uids=None, xlims=None, ylims=None, freq_steps=1,
+        num_points: int=None, unwrapped=True, wait_time: float=0, seed: int=None,
+        autosave_cfg: ColAutoSaveCfg=None) -> None:
+        '''
+        Configurações do coletor dos centros de massa de um subconjunto de anéis (traçadores).
+
+        Parâmetros:
+        -----------
+        num_tracers:
+            Número de traçadores, escolhidos aleatoriamente entre os anéis ativos
+            (dentro da região, se `xlims` ou `ylims` forem passados) no início da coleta.
+            Se for `None`, todos os anéis da região são utilizados.
+
+        uids:
+            uids dos traçadores. Se for passado, `num_tracers`, `xlims` e `ylims` são ignorados.
+
+        xlims, ylims:
+            Limites da região em que os traçadores são escolhidos. Se for `None`, não há
+            limite na respectiva direção.
+
+        freq_steps:
+            Número de passos temporais entre as coletas.
+
+        num_points:
+            Número máximo de pontos coletados (tamanho da primeira dimensão dos arquivos).
+            Se for `None`, é calculado com o tempo final da simulação (`run_cfg.tf`), então
+            deve ser passado se o tempo final não for finito (ex.: coleta sobre snapshots).
+
+        unwrapped:
+            Se for `True`, também é salvo o deslocamento acumulado dos traçadores sem a quebra
+            nas bordas periódicas. O deslocamento entre duas coletas deve ser menor que
+            metade do tamanho do espaço.
+
+        wait_time:
+            Tempo de espera para começar a coleta.
+
+        seed:
+            Semente utilizada na escolha aleatória dos traçadores.
+        '''
+        super().__init__(autosave_cfg)
+        self.num_tracers = num_tracers
+        self.uids = uids
+        self.xlims = xlims
+        self.ylims = ylims
+        self.freq_steps = freq_steps
+        self.num_points = num_points
+        self.unwrapped = unwrapped
+        self.wait_time = wait_time
+        self.seed = seed
+
+class TracerCol(RingCol):
+    '''
+    Coleta, a cada `freq_steps` passos temporais, os centros de massa de um subconjunto
+    fixo de anéis, para o cálculo do MSD, autocorrelação da velocidade, etc. Os centros
+    de massa são os do passo atual (ver o observável "cm" de `CppSolver.ring_observables`).
+
+    Os dados são escritos diretamente em arquivos ".npy" abertos com `np.lib.format.open_memmap`:
+
+    - cms.npy: Centros de massa, array float32 (num_points, num_tracers, 2).
+    - unwrapped.npy: Posições sem a quebra nas bordas periódicas (se `unwrapped=True`),
+        mesmo formato de "cms.npy".
+    - times.npy: Tempos das coletas.
+    - uids.npy: uids dos traçadores.
+
+    Traçadores removidos (fluxo de stokes) possuem `nan` a partir da sua remoção.
+    Utilize `TracerCol.load` para carregar apenas os pontos coletados.
+    '''
+    solver: CppSolver
+    col_cfg: TracerColCfg
+
+    def setup(self):
+        cfg = self.col_cfg
+
+        self.num_points = cfg.num_points
+        if self.num_points is None:
+            tf = getattr(self.configs["run_cfg"], "tf", None)
+            if tf is None or not np.isfinite(tf):
+                raise ValueError((
+                    f"O tempo final da simulação não é finito (tf={tf}), então "
+                    "'num_points' deve ser passado nas configurações do coletor."
+                ))
+            num_steps = (tf - max(self.solver.time, cfg.wait_time)) / self.solver.dt
+            self.num_points = int(np.ceil(num_steps / cfg.freq_steps)) + 1
+
+        self.files: dict[str, np.ndarray] = {}
+
+        # State
+        self.last_rec_step = None
+        self.point_count = 0
+        self.tracer_uids: np.ndarray = None
+        self.last_cms: np.ndarray = None
+        self.unwrapped_pos: np.ndarray = None
+
+    @property
+    def vars_to_save(self):
+        v = super().vars_to_save
+        # `num_points` é salvo pois, ao carregar o auto-salvamento, seria recalculado com o tempo atual.
+        v.extend(["num_points", "last_rec_step", "point_count", "tracer_uids", "last_cms", "unwrapped_pos"])
+        return v
+
+    def select_tracers(self):
+        "Escolhe os uids dos traçadores."
+        cfg = self.col_cfg
+        if cfg.uids is not None:
+            return np.array(cfg.uids, dtype=np.uint64)
+
+        xlims = cfg.xlims if cfg.xlims is not None else (-np.inf, np.inf)
+        ylims = cfg.ylims if cfg.ylims is not None else (-np.inf, np.inf)
+        ids, _ = self.solver.rings_in_rect(xlims, ylims)
+        uids = self.obs.uids[ids]
+
+        if cfg.num_tracers is not None and cfg.num_tracers < uids.size:
+            rng = np.random.default_rng(cfg.seed)
+            uids = np.sort(rng.choice(uids, cfg.num_tracers, replace=False))
+
+        return uids.astype(np.uint64)
+
+    def open_files(self, mode):
+        num_tracers = self.tracer_uids.size
+        shapes = {
+            "cms": ((num_tracers, 2), np.float32),
+            "times": ((), np.float64),
+        }
+        if self.col_cfg.unwrapped:
+            shapes["unwrapped"] = ((num_tracers, 2), np.float32)
+
+        for name, (shape, dtype) in shapes.items():
+            self.files[name] = np.lib.format.open_memmap(self.data_path / f"{name}.npy", mode=mode,
+                dtype=dtype, shape=(self.num_points, *shape))
+
+    def start(self):
+        self.tracer_uids = self.select_tracers()
+        np.save(self.data_path / "uids.npy", self.tracer_uids)
+        self.open_files("w+")
+
+    def collect(self) -> None:
+        cfg = self.col_cfg
+        if self.solver.time < cfg.wait_time:
+            return
+
+        step = self.solver.num_time_steps
+        if self.last_rec_step is not None and step - self.last_rec_step < cfg.freq_steps:
+            return
+
+        if self.point_count >= self.num_points:
+            return
+        self.last_rec_step = step
+
+        if self.tracer_uids is None:
+            self.start()
+
+        # Linha de cada anel ativo nos observáveis por anel.
+        active_ids = self.obs.active_ids
+        rows = np.empty(self.solver.num_max_rings, dtype=int)
+        rows[active_ids] = np.arange(active_ids.size)
+
+        slots = self.solver.slots_of(self.tracer_uids)
+        is_active = slots != -1
+        cms = np.full((self.tracer_uids.size, 2), np.nan)
+        cms[is_active] = self.obs.ring_observables("cm")["cm"][rows[slots[is_active]]]
+
+        i = self.point_count
+        self.files["cms"][i] = cms
+        self.files["times"][i] = self.solver.time
+
+        if cfg.unwrapped:
+            if self.unwrapped_pos is None:
+                self.unwrapped_pos = cms.copy()
+            else:
+                space_cfg = self.configs["space_cfg"]
+                self.unwrapped_pos += rings_quantities.get_dist_pb(self.last_cms, cms,
+                    space_cfg.height, space_cfg.length)
+            self.files["unwrapped"][i] = self.unwrapped_pos
+
+        self.last_cms = cms
+        self.point_count += 1
+
+        if self.autosave_cfg:
+            self.check_autosave()
+
+    def next_due_step(self):
+        if self.last_rec_step is None:
+            wait_time = self.col_cfg.wait_time
+            return self.first_step_where(lambda t: t >= wait_time)
+        return max(self.last_rec_step + self.col_cfg.freq_steps, self.solver.num_time_steps + 1)
+
+    def flush(self):
+        "Escreve no disco os dados dos arquivos e os metadados."
+        for data in self.files.values():
+            data.flush()
+
+        with open(self.data_path / "metadata.yaml", "w") as f:
+            yaml.dump({
+                "num_points": self.point_count,
+                "num_tracers": 0 if self.tracer_uids is None else int(self.tracer_uids.size),
+                "frame_dt": self.col_cfg.freq_steps * self.solver.dt,
+                "unwrapped": self.col_cfg.unwrapped,
+            }, f)
+
+    def dump_state(self):
+        # Chamado tanto no auto-salvamento próprio quanto pelo `ColManager`.
+        self.flush()
+        return super().dump_state()
+
+    def load_state(self, data):
+        super().load_state(data)
+
+        # Os pontos coletados após o auto-salvamento são sobrescritos.
+        if self.tracer_uids is not None:
+            self.open_files("r+")
+
+    def save(self):
+        self.flush()
+
+    @staticmethod
+    def load(root_path, mmap_mode="r") -> dict[str, np.ndarray]:
+        '''
+        Carrega os dados salvos em `root_path`, apenas os pontos efetivamente coletados.
+        '''
+        data_path = Path(root_path) / "data"
+        with open(data_path / "metadata.yaml", "r") as f:
+            num_points = yaml.unsafe_load(f)["num_points"]
+
+        data = {"uids": np.load(data_path / "uids.npy")}
+        for name in ("cms", "unwrapped", "times"):
+            path = data_path / f"{name}.npy"
+            if path.exists():
+                data[name] = np.load(path, mmap_mode=mmap_mode)[:num_points]
+        return data
+
+Configs2Collector.add(TracerColCfg, TracerCol)
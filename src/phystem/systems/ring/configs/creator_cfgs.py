@@ -1,5 +1,6 @@
 from phystem.systems.ring.creators import (
     CreatorCfg, 
     RectangularGridCfg, 
+    RandomPackingCfg,
     InvaginationCreatorCfg,
 )
\ No newline at end of file
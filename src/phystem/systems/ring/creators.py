@@ -119,24 +119,23 @@ class Creator(CreatorCore):
         InitData:
             Dados da configuração inicial
         '''
-        pos = []
-        self_prop_angle = []
+        # Configuração nula (ver `CreatorCfg.empty`), em que `num_particles` não é definido.
+        if self.num_rings == 0:
+            return InitData(np.array([]), np.array([]))
 
-        for ring_id in range(self.num_rings):
-            ring_pos_angles = np.arange(0, np.pi*2, np.pi*2/self.num_particles)
-            
-            if ring_pos_angles.size != self.num_particles:
-                raise Exception(f"'pos_angle' tem tamanho '{ring_pos_angles.size}', mas deveria ter '{self.num_particles}'")
-
-            ring_pos = np.array([np.cos(ring_pos_angles), np.sin(ring_pos_angles)]) * self.r[ring_id]
+        ring_pos_angles = np.arange(0, np.pi*2, np.pi*2/self.num_particles)
+        
+        if ring_pos_angles.size != self.num_particles:
+            raise Exception(f"'pos_angle' tem tamanho '{ring_pos_angles.size}', mas deveria ter '{self.num_particles}'")
 
-            ring_pos[0] += self.center[ring_id][0]
-            ring_pos[1] += self.center[ring_id][1]
+        # Anel de raio unitário com shape (num_particles, 2)
+        unit_ring = np.array([np.cos(ring_pos_angles), np.sin(ring_pos_angles)]).T
 
-            pos.append(ring_pos.T)
-            self_prop_angle.append(self.angle[ring_id])
+        r = np.asarray(self.r, dtype=np.float64).reshape(-1, 1, 1)
+        center = np.asarray(self.center, dtype=np.float64).reshape(-1, 1, 2)
+        pos = unit_ring * r + center
 
-        return InitData(np.array(pos), np.array(self_prop_angle))
+        return InitData(pos, np.array(self.angle, dtype=np.float64))
 
 
 class RectangularGridCfg:
@@ -225,22 +224,188 @@ class RectangularGridCreator(CreatorCore):
         base_pos = self.base_ring_pos * self.ring_radius_k
         real_ring_d = self.real_ring_d
         
-        pos = []
-        for i in range(self.num_x):
-            x = (i + 1/2) * (self.space_x + real_ring_d)
-            for j in range(self.num_y):
-                y = (j + 1/2) * (self.space_y + real_ring_d)
-                pos.append(base_pos + [x, y])
+        x = (np.arange(self.num_x) + 1/2) * (self.space_x + real_ring_d)
+        y = (np.arange(self.num_y) + 1/2) * (self.space_y + real_ring_d)
         
         height = self.num_y * (real_ring_d + self.space_y)
         width = self.num_x * (real_ring_d + self.space_x)
-        central_point = [width/2, height/2]
 
-        pos = np.array(pos) - central_point
+        # Centers ordered with y varying fastest, shape (num_rings, 1, 2)
+        centers = np.stack(np.meshgrid(x - width/2, y - height/2, indexing="ij"), axis=-1)
+        pos = base_pos + centers.reshape(-1, 1, 2)
         random_angles = np.random.random(num_rings) * 2*np.pi 
 
         return InitData(pos, random_angles)
 
+class RandomPackingCfg:
+    def __init__(self, num_rings: int, density: float, dynamic_cfg: RingCfg, aspect_ratio=1, 
+        max_packing_fraction=0.45, max_attempts_per_ring=100) -> None:
+        '''
+        Cria `num_rings` anéis em posições aleatórias sem sobreposição (adição sequencial aleatória)
+        em um espaço retangular periódico cuja área resulta em uma densidade total igual a `density`.
+        Na verificação de sobreposição, os anéis são tratados como discos de raio `real_ring_radius`.
+        As direções das polarizações são aleatórias com distribuição uniforme em [0, 2*pi).
+
+        Parâmetros:
+        -----------
+        num_rings:
+            Número de anéis.
+
+        density:
+            Número de anéis por unidade de área.
+
+        dynamic_cfg:
+            Configurações da dinâmica, utilizadas para obter o formato e o raio dos anéis.
+
+        aspect_ratio:
+            Razão entre o comprimento e a altura do espaço.
+
+        max_packing_fraction:
+            Fração máxima do espaço coberta pelos discos dos anéis. A adição sequencial aleatória
+            trava perto de 0.547 e fica muito lenta ao se aproximar desse valor, então, se a
+            fração necessária for maior, os anéis são comprimidos (como em `RectangularGridCfg.from_density`)
+            para atingir esse valor.
+
+        max_attempts_per_ring:
+            O criador desiste após `max_attempts_per_ring * num_rings` posições candidatas.
+        '''
+        self.num_rings = num_rings
+        self.density = density
+        self.aspect_ratio = aspect_ratio
+        self.max_packing_fraction = max_packing_fraction
+        self.max_attempts_per_ring = max_attempts_per_ring
+
+        self.base_ring_pos = dynamic_cfg.ring_spawn_pos()
+        self.ring_radius = dynamic_cfg.get_ring_radius()
+        self.particle_radius = dynamic_cfg.diameter / 2
+
+        self.ring_radius_k = 1
+        packing_fraction = density * np.pi * self.ring_radius**2
+        if packing_fraction > max_packing_fraction:
+            max_radius = (max_packing_fraction / (density * np.pi))**.5
+            self.ring_radius_k = (max_radius - self.particle_radius) / (self.ring_radius - self.particle_radius)
+        
+        self.real_ring_radius = (self.ring_radius - self.particle_radius) * self.ring_radius_k + self.particle_radius
+
+    @classmethod
+    def from_relative_density(cls, num_rings, rel_density, dynamic_cfg: RingCfg, **kwargs):
+        '''
+        Configurações com densidade relativa igual a `rel_density` (ver
+        `RectangularGridCfg.from_relative_density`).
+        '''
+        den_eq = 1 / dynamic_cfg.get_equilibrium_area()
+        density = (rel_density + 1) * den_eq
+        return cls(num_rings, density, dynamic_cfg, **kwargs)
+
+    def get_space_cfg(self):
+        "Retorna o `SpaceCfg` em que os anéis são posicionados."
+        area = self.num_rings / self.density
+        length = (area * self.aspect_ratio)**.5
+        return SpaceCfg(area / length, length)
+
+class RandomPackingCreator(CreatorCore):
+    def __init__(self, cfg: RandomPackingCfg, rng_seed: int=None) -> None:
+        "Ver doc de `RandomPackingCfg`."
+        super().__init__(rng_seed)
+        self.cfg = cfg
+        self.num_rings = cfg.num_rings
+        self.base_ring_pos = cfg.base_ring_pos * cfg.ring_radius_k
+        self.ring_d = 2 * cfg.real_ring_radius
+
+        space_cfg = cfg.get_space_cfg()
+        self.length = space_cfg.length
+        self.height = space_cfg.height
+
+    def pack(self) -> np.ndarray:
+        '''
+        Adição sequencial aleatória de discos com diâmetro `ring_d` no espaço periódico.
+        As posições candidatas são propostas em lotes e comparadas com os discos já
+        posicionados utilizando uma grade de células com no máximo um disco por célula.
+
+        Retorno:
+        --------
+        centers: ndarray com shape (num_rings, 2)
+            Centros dos anéis, com a origem no centro do espaço.
+        '''
+        length, height, d = self.length, self.height, self.ring_d
+        size = np.array([length, height])
+
+        # Células com diagonal menor que `d`, então cada célula contém no máximo um disco.
+        num_cols = max(int(np.ceil(length / (d / 2**.5))), 1)
+        num_rows = max(int(np.ceil(height / (d / 2**.5))), 1)
+        cell_size = size / [num_cols, num_rows]
+        reach = int(np.ceil(d / cell_size.min()))
+        offsets = np.arange(-reach, reach+1)
+        off_c, off_r = [o.ravel() for o in np.meshgrid(offsets, offsets)]
+
+        grid = np.full((num_rows, num_cols), -1, dtype=np.int64)
+        centers = np.empty((self.num_rings, 2))
+        num_placed = 0
+        num_attempts = 0
+        max_attempts = self.cfg.max_attempts_per_ring * self.num_rings
+
+        def overlaps(cand, other):
+            diff = cand - other
+            diff -= size * np.round(diff / size)
+            return (diff**2).sum(axis=-1) < d**2
+
+        while num_placed < self.num_rings:
+            if num_attempts >= max_attempts:
+                raise ValueError((
+                    f"Apenas {num_placed} de {self.num_rings} anéis foram posicionados após {num_attempts} tentativas. "
+                    "Tente uma densidade ou `max_packing_fraction` menor."
+                ))
+            
+            remaining = self.num_rings - num_placed
+            batch_size = min(max(4 * remaining, 4096), max_attempts - num_attempts)
+            num_attempts += batch_size
+
+            # As células ocupadas estão inteiramente cobertas pelo seu disco, então as
+            # candidatas são sorteadas uniformemente apenas dentro das células vazias.
+            empty_cells = np.flatnonzero(grid == -1)
+            cells = empty_cells[self.rng.integers(empty_cells.size, size=batch_size)]
+            rows, cols = np.divmod(cells, num_cols)
+            cand = (np.stack([cols, rows], axis=1) + self.rng.random((batch_size, 2))) * cell_size
+            neigh_rows = (rows[:, None] + off_r) % num_rows
+            neigh_cols = (cols[:, None] + off_c) % num_cols
+            
+            # Sobreposição com os discos já posicionados.
+            neigh = grid[neigh_rows, neigh_cols]
+            has_neigh = neigh != -1
+            hit = np.zeros(neigh.shape, dtype=bool)
+            hit[has_neigh] = overlaps(cand[np.nonzero(has_neigh)[0]], centers[neigh[has_neigh]])
+            ok = ~hit.any(axis=1)
+
+            # Sobreposição entre candidatas do mesmo lote: a candidata
+            # com o menor índice é mantida.
+            batch_grid = np.full_like(grid, batch_size)
+            ok_ids = np.nonzero(ok)[0]
+            np.minimum.at(batch_grid, (rows[ok_ids], cols[ok_ids]), ok_ids)
+            neigh = batch_grid[neigh_rows[ok_ids], neigh_cols[ok_ids]]
+            is_prev = neigh < ok_ids[:, None]
+            hit = np.zeros(neigh.shape, dtype=bool)
+            hit[is_prev] = overlaps(cand[ok_ids[np.nonzero(is_prev)[0]]], cand[neigh[is_prev]])
+            ok_ids = ok_ids[~hit.any(axis=1)]
+
+            ok_ids = ok_ids[:remaining]
+            new_ids = np.arange(num_placed, num_placed + ok_ids.size)
+            centers[new_ids] = cand[ok_ids]
+            grid[rows[ok_ids], cols[ok_ids]] = new_ids
+            num_placed += ok_ids.size
+
+        return centers - size/2
+
+    def create(self) -> InitData:
+        centers = self.pack()
+        pos = self.base_ring_pos + centers[:, None, :]
+
+        # Coloca as partículas dentro do espaço periódico.
+        size = np.array([self.length, self.height])
+        pos = (pos + size/2) % size - size/2
+
+        random_angles = self.rng.random(self.num_rings) * 2*np.pi 
+        return InitData(pos, random_angles)
+
 class InvaginationCreatorCfg:
     def __init__(self, num_rings: int, height: int, length: int, diameter: float) -> None:
         self.num_rings = num_rings
@@ -394,6 +559,7 @@ class CreatorRD(CreatorCore):
 config_to_creator: dict[Any ,CreatorCore] = {
     CreatorCfg: Creator,
     RectangularGridCfg: RectangularGridCreator,
+    RandomPackingCfg: RandomPackingCreator,
     InvaginationCreatorCfg: InvaginationCreator,
 }    
 
@@ -0,0 +1,177 @@
+'''
+Cache local de estados equilibrados.
+
+Os estados são salvos com `StateSaver` em sub-pastas do cache cujo nome é um hash
+estável das configurações que determinam a física do sistema, junto com o tempo
+de transiente utilizado para equilibrar o sistema.
+'''
+import hashlib, json, shutil, os, time
+from enum import Enum
+from pathlib import Path
+
+import numpy as np
+
+from phystem.core.run_config import CheckpointCfg
+from phystem.systems.ring.state_saver import StateSaver
+from phystem.systems.ring.solvers import CppSolver
+
+def _to_stable(obj):
+    '''
+    Converte `obj` em uma estrutura composta apenas por dicionários, listas,
+    strings e números, com representação independente da execução.
+    '''
+    if isinstance(obj, Enum):
+        return f"{type(obj).__qualname__}.{obj.name}"
+    if isinstance(obj, (bool, int, str)) or obj is None:
+        return obj
+    if isinstance(obj, (float, np.floating)):
+        return repr(float(obj))
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, np.ndarray):
+        return _to_stable(obj.tolist())
+    if isinstance(obj, (list, tuple)):
+        return [_to_stable(v) for v in obj]
+    if isinstance(obj, dict):
+        return {str(k): _to_stable(v) for k, v in sorted(obj.items(), key=lambda kv: str(kv[0]))}
+    if hasattr(obj, "__dict__"):
+        return {"__type__": type(obj).__qualname__, **_to_stable(vars(obj))}
+    return repr(obj)
+
+class EquilibriumCache:
+    info_fname = "cache_info.yaml"
+
+    def __init__(self, root_path: Path, max_size_mb: float=None) -> None:
+        '''
+        Cache de estados equilibrados. Cada entrada é uma pasta no formato de um
+        checkpoint (salvo por `StateSaver`), então pode ser carregada com `CheckpointCfg`.
+
+        Parâmetros:
+        -----------
+        root_path:
+            Pasta do cache.
+
+        max_size_mb:
+            Espaço máximo em disco (em MB) utilizado pelo cache. Quando excedido, as entradas
+            acessadas há mais tempo são removidas. Se for `None`, o cache não tem limite.
+        '''
+        self.root_path = Path(root_path)
+        self.max_size_mb = max_size_mb
+        self.root_path.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def fingerprint(configs: dict, transient_time: float) -> str:
+        '''
+        Hash das configurações relevantes para a física do sistema
+        (`creator_cfg`, `dynamic_cfg`, `space_cfg`, `other_cfgs`, `rng_seed` e
+        `run_cfg.int_cfg`) junto com `transient_time`.
+        '''
+        relevant = {name: configs.get(name) for name in
+            ("creator_cfg", "dynamic_cfg", "space_cfg", "other_cfgs", "rng_seed")}
+        relevant["int_cfg"] = configs["run_cfg"].int_cfg
+        relevant["transient_time"] = transient_time
+
+        text = json.dumps(_to_stable(relevant), sort_keys=True)
+        return hashlib.sha256(text.encode()).hexdigest()[:32]
+
+    def entry_path(self, key: str):
+        return self.root_path / key
+
+    def get(self, key: str) -> Path:
+        '''
+        Retorna o caminho da entrada `key`, ou `None` se ela não existe.
+        O tempo de acesso da entrada é atualizado.
+        '''
+        path = self.entry_path(key)
+        if not (path / self.info_fname).exists():
+            return None
+
+        now = time.time()
+        os.utime(path, (now, now))
+        return path
+
+    def checkpoint_cfg(self, key: str, **kwargs) -> CheckpointCfg:
+        '''
+        Retorna o `CheckpointCfg` da entrada `key` (os argumentos em `kwargs` são passados
+        para `CheckpointCfg`), ou `None` se ela não existe.
+        '''
+        path = self.get(key)
+        if path is None:
+            return None
+        return CheckpointCfg(path, **kwargs)
+
+    def store(self, key: str, solver: CppSolver, configs: dict, transient_time: float) -> Path:
+        '''
+        Salva o estado atual de `solver` na entrada `key` e remove
+        entradas antigas caso o espaço máximo seja excedido.
+        '''
+        import yaml
+
+        path = self.entry_path(key)
+        temp_path = self.root_path / f"{key}.temp"
+        if temp_path.exists():
+            shutil.rmtree(temp_path)
+
+        StateSaver(solver, temp_path, configs).save()
+
+        # O arquivo de informação é escrito por último e marca a entrada como completa.
+        with open(temp_path / self.info_fname, "w") as f:
+            yaml.dump({"key": key, "transient_time": transient_time}, f)
+
+        if path.exists():
+            shutil.rmtree(path)
+        os.rename(temp_path, path)
+
+        self.evict(keep=key)
+        return path
+
+    @staticmethod
+    def entry_size(path: Path):
+        return sum(p.stat().st_size for p in path.iterdir() if p.is_file())
+
+    def entries(self):
+        "Lista com os caminhos das entradas, ordenada da acessada há mais tempo para a mais recente."
+        paths = [p for p in self.root_path.iterdir() if (p / self.info_fname).exists()]
+        return sorted(paths, key=lambda p: p.stat().st_mtime)
+
+    def evict(self, keep: str=None):
+        "Remove as entradas acessadas há mais tempo até o cache caber em `max_size_mb`."
+        if self.max_size_mb is None:
+            return
+
+        entries = self.entries()
+        sizes = {p: self.entry_size(p) for p in entries}
+        total = sum(sizes.values())
+        for p in entries:
+            if total <= self.max_size_mb * 1e6:
+                break
+            if p.name == keep:
+                continue
+            shutil.rmtree(p)
+            total -= sizes[p]
+
+    def clear(self):
+        for p in self.entries():
+            shutil.rmtree(p)
+
+class EquilibriumCheckpointCfg:
+    def __init__(self, cache: EquilibriumCache | Path, transient_time: float) -> None:
+        '''
+        Checkpoint no estado obtido após integrar o sistema por `transient_time`, salvo em `cache`.
+        Pode ser utilizado em `run_cfg.checkpoint` no lugar de um `CheckpointCfg`: ao criar a 
+        simulação, se o estado não está no cache, o transiente é integrado e o estado resultante 
+        é salvo no cache. Em ambos os casos, a simulação é carregada a partir do estado do 
+        cache, com o tempo começando em zero.
+
+        Parâmetros:
+        -----------
+        cache:
+            Cache dos estados equilibrados, ou o caminho da sua pasta.
+
+        transient_time:
+            Tempo de integração até o estado equilibrado.
+        '''
+        if not isinstance(cache, EquilibriumCache):
+            cache = EquilibriumCache(cache)
+        self.cache = cache
+        self.transient_time = transient_time
@@ -0,0 +1,129 @@
+'''
+Observáveis do sistema no passo temporal atual, compartilhados entre os coletores.
+'''
+import numpy as np
+
+from .solvers import CppSolver
+
+class StepObservables:
+    def __init__(self, solver: CppSolver) -> None:
+        '''
+        Observáveis do sistema no passo atual do `solver`. Cada observável é convertido
+        para um array do numpy apenas no primeiro acesso de cada passo, então todos os
+        coletores que coletam no mesmo passo utilizam a mesma conversão.
+
+        Os arrays retornados são compartilhados e não devem ser alterados.
+
+        Os observáveis sem o sufixo "_active" são indexados pelos ids dos anéis
+        (`solver.rings_ids`), ou seja, contém todos os anéis, inclusive os não ativos.
+        Os observáveis com o sufixo "_active" contém apenas os anéis ativos, na
+        ordem de `active_ids`.
+        '''
+        self.solver = solver
+        self._step = None
+        self._cache: dict[str, np.ndarray] = {}
+
+    def _check_step(self):
+        "Descarta os observáveis calculados em passos anteriores."
+        step = (getattr(self.solver, "num_time_steps", None), self.solver.time)
+        if step != self._step:
+            self._step = step
+            self._cache.clear()
+
+    def _get(self, name: str, func):
+        self._check_step()
+        if name not in self._cache:
+            self._cache[name] = func()
+        return self._cache[name]
+
+    @property
+    def num_active(self) -> int:
+        return self.solver.num_active_rings
+
+    @property
+    def active_ids(self) -> np.ndarray:
+        "Ids dos anéis ativos."
+        return self._get("active_ids", lambda: np.array(self.solver.rings_ids[:self.solver.num_active_rings]))
+
+    @property
+    def cms(self) -> np.ndarray:
+        "Centros de massa."
+        return self._get("cms", lambda: np.array(self.solver.center_mass))
+
+    @property
+    def uids(self) -> np.ndarray:
+        "Ids únicos."
+        return self._get("uids", lambda: np.array(self.solver.unique_rings_ids))
+
+    @property
+    def areas(self) -> np.ndarray:
+        "Áreas dos polígonos formados pelos centros das partículas."
+        return self._get("areas", lambda: np.array(self.solver.area_debug.area))
+
+    @property
+    def angles(self) -> np.ndarray:
+        "Ângulos das polarizações."
+        return self._get("angles", lambda: np.array(self.solver.self_prop_angle))
+
+    @property
+    def pos(self) -> np.ndarray:
+        "Posições das partículas."
+        return self._get("pos", lambda: np.array(self.solver.pos))
+
+    @property
+    def pos_continuos(self) -> np.ndarray:
+        "Posições das partículas sem a quebra dos anéis na borda periódica."
+        return self._get("pos_continuos", lambda: np.array(self.solver.pos_continuos))
+
+    @property
+    def vel(self) -> np.ndarray:
+        "Velocidades das partículas."
+        return self._get("vel", lambda: np.array(self.solver.vel))
+
+    def ring_observables(self, fields) -> dict[str, np.ndarray]:
+        '''
+        Observáveis por anel dos anéis ativos, na ordem de `active_ids` (ver
+        `CppSolver.ring_observables`). Os observáveis ainda não calculados no passo
+        atual são calculados em uma única chamada ao solver.
+        '''
+        if isinstance(fields, str):
+            fields = [fields]
+
+        self._check_step()
+        missing = [name for name in fields if "ring_obs_" + name not in self._cache]
+        if missing:
+            for name, value in self.solver.ring_observables(missing).items():
+                self._cache["ring_obs_" + name] = value
+
+        return {name: self._cache["ring_obs_" + name] for name in fields}
+
+    @property
+    def vel_cm_active(self) -> np.ndarray:
+        "Velocidades dos centros de massa."
+        return self.ring_observables("vel_cm")["vel_cm"]
+
+    @property
+    def perimeters_active(self) -> np.ndarray:
+        "Perímetros dos polígonos formados pelos centros das partículas."
+        return self.ring_observables("perimeter")["perimeter"]
+
+    @property
+    def asphericity_active(self) -> np.ndarray:
+        "Asfericidades dos anéis (ver `CppSolver.ring_observables`)."
+        return self.ring_observables("asphericity")["asphericity"]
+
+    @property
+    def cms_active(self) -> np.ndarray:
+        return self._get("cms_active", lambda: self.cms[self.active_ids])
+
+    @property
+    def uids_active(self) -> np.ndarray:
+        return self._get("uids_active", lambda: self.uids[self.active_ids])
+
+    @property
+    def areas_active(self) -> np.ndarray:
+        return self._get("areas_active", lambda: self.areas[self.active_ids])
+
+    @property
+    def angles_active(self) -> np.ndarray:
+        return self._get("angles_active", lambda: self.angles[self.active_ids])
@@ -5,13 +5,12 @@ from abc import ABC, abstractmethod
 from collections import namedtuple
 import yaml
 
-from shapely.geometry import Polygon, Point
-
 from phystem.core import settings
 from phystem.core.autosave import AutoSavable
 from phystem.systems import ring
 from phystem.systems.ring import utils
 from .datas import *
+from phystem.data_utils.data_types import as_ragged
 
 import textures as tx
 import grids
@@ -227,7 +226,7 @@ class DeltaCalc(Calculator):
                         pickle.dump(value, f)
 
             init_uids = self.data.init_uids[pid]
-            selected_ids = np.where(np.in1d(init_uids, self.data.init_selected_uids[pid]))[0]
+            selected_ids = np.where(np.isin(init_uids, self.data.init_selected_uids[pid]))[0]
             deltas = []
             for i in selected_ids:
                 neighs = neighbors[i]
@@ -372,19 +371,15 @@ class VelocityCalc(Calculator):
         cms_vel_data = data.vel
         self.vel_time = []
         while self.next_file_id < cms_vel_data.num_files:
-            vels_cms = cms_vel_data.get_file(self.next_file_id)
-            vels_cms.strip()
+            vels_cms = as_ragged(cms_vel_data.get_file(self.next_file_id))
 
-            cms1 = vels_cms.data[:,:,:2]
-            cms2 = vels_cms.data[:,:,2:]
+            cms1 = vels_cms.values[:, :2]
+            cms2 = vels_cms.values[:, 2:]
             vels = (cms2 - cms1)/data.frame_dt
             
-            coords = self.grid.coords(cms1)
+            coords = self.grid.coords(cms1, simplify_shape=True)
             
-            # if vels.shape[0] == 1:
-            #     vels = self.grid.simplify_shape(vels)
-            
-            cell_vel = self.grid.mean_by_cell(vels, coords, end_id=vels_cms.point_num_elements)
+            cell_vel = self.grid.mean_by_cell(vels, coords, offsets=vels_cms.offsets)
 
             self.vel_time.append(cell_vel)
 
@@ -523,8 +518,7 @@ class DensityCalc(Calculator):
     def calc_quantity(self):
         begin_id = 0
         while self.next_file_id < self.data.cms.num_files:
-            cms = self.data.cms.get_file(self.next_file_id)
-            cms.strip()
+            cms = as_ragged(self.data.cms.get_file(self.next_file_id))
 
             end_id = begin_id + len(cms) - 1
 
@@ -535,8 +529,9 @@ class DensityCalc(Calculator):
             if self.start_id >= begin_id:
                 cut_id = self.start_id - begin_id
 
-            coords = self.grid.coords(cms.data[cut_id:])
-            count = self.grid.count(coords, end_id=cms.point_num_elements[cut_id:])
+            cms = cms[cut_id:]
+            coords = self.grid.coords(cms.values, simplify_shape=True)
+            count = self.grid.count(coords, offsets=cms.offsets)
 
             self.cell_den_mean += count.sum(axis=0)
             self.num_points += count.shape[0]
@@ -553,35 +548,10 @@ class DensityCalc(Calculator):
             if self.stokes_cfg is None:
                 self.cell_den_mean /= self.grid.cell_area
             else:
-                obs_center = (self.stokes_cfg.obstacle_x, self.stokes_cfg.obstacle_x)
-                obs_r = self.stokes_cfg.obstacle_r
-                intersect_mask = self.grid.circle_mask(
+                cell_areas = self.grid.cell_area_outside_circle(
                     radius=self.stokes_cfg.obstacle_r,
-                    center=obs_center,
-                    mode="intersect",
+                    center=(self.stokes_cfg.obstacle_x, self.stokes_cfg.obstacle_y),
                 )
-
-                x = self.grid.meshgrid[0][intersect_mask] 
-                y = self.grid.meshgrid[1][intersect_mask] 
-                
-                dx = self.grid.cell_size[0]/2
-                dy = self.grid.cell_size[1]/2
-
-                p1 = np.array([x + dx, y - dy]).T
-                p2 = np.array([x + dx, y + dy]).T
-                p3 = np.array([x - dx, y + dy]).T
-                p4 = np.array([x - dx, y - dy]).T
-
-                intersect_areas = []
-                for idx in range(p1.shape[0]):
-                    square = Polygon([p1[idx], p2[idx], p3[idx], p4[idx]])
-                    circle = Point(obs_center).buffer(obs_r, resolution=100)
-                    area = square.difference(circle).area
-                    intersect_areas.append(area)
-
-                cell_areas = np.full_like(self.cell_den_mean, self.grid.cell_area)
-                cell_areas[intersect_mask] = intersect_areas
-
                 self.cell_den_mean /= cell_areas
 
         self.metadata["num_points"] = self.num_points
@@ -630,8 +600,7 @@ class DensityTimeCalc(Calculator):
 
     def calc_quantity(self):
         while self.next_file_id < self.data.cms.num_files:
-            cms = self.data.cms.get_file(self.next_file_id)
-            cms.strip()
+            cms = as_ragged(self.data.cms.get_file(self.next_file_id))
             
             end_id = self.start_id + cms.point_num_elements.size
             self.den[self.start_id:end_id] = cms.point_num_elements
@@ -793,18 +762,17 @@ class PolarityCalc(Calculator):
 
     def calc_quantity(self):
         while self.next_file_id < self.data.pol.num_files:
-            pols = self.data.pol.get_file(self.next_file_id)
-            cms = self.data.cms.get_file(self.next_file_id)
-            pols.strip()
-            cms.strip()
+            pols = as_ragged(self.data.pol.get_file(self.next_file_id))
+            cms = as_ragged(self.data.cms.get_file(self.next_file_id))
 
-            pols_data = pols.data[..., 0]
+            pols_data = pols.values[:, 0]
             pol_x = np.cos(pols_data)
             pol_y = np.sin(pols_data)
 
-            coords = self.grid.coords(cms.data)
-            cell_pol_x = self.grid.mean_by_cell(pol_x, coords, end_id=cms.point_num_elements)
-            cell_pol_y = self.grid.mean_by_cell(pol_y, coords, end_id=cms.point_num_elements)
+            coords = self.grid.coords(cms.values, simplify_shape=True)
+            count = self.grid.count(coords, offsets=cms.offsets)
+            cell_pol_x = self.grid.mean_by_cell(pol_x, coords, count=count, offsets=cms.offsets)
+            cell_pol_y = self.grid.mean_by_cell(pol_y, coords, count=count, offsets=cms.offsets)
 
             self.cell_pol_sum[0] += cell_pol_x.sum(axis=0)
             self.cell_pol_sum[1] += cell_pol_y.sum(axis=0)
@@ -848,17 +816,16 @@ class VelocityOrderParCalc(Calculator):
         vel_par_order = np.zeros(len(data.vel), dtype=float)
         start_id = 0
         for fid in range(data.vel.num_files):
-            vels_cms = data.vel.get_file(fid)
-            vels_cms.strip()
+            vels_cms = as_ragged(data.vel.get_file(fid))
 
-            vels = (vels_cms.data[:,:,2:] - vels_cms.data[:,:,:2])/data.frame_dt
-            speeds = np.sqrt((vels**2).sum(axis=2))
+            vels = (vels_cms.values[:, 2:] - vels_cms.values[:, :2])/data.frame_dt
+            speeds = np.sqrt((vels**2).sum(axis=1))
 
             is_zero_speed = speeds == 0
             speeds[is_zero_speed] = 1
 
-            vels_norm = vels / speeds.reshape(vels.shape[0], -1, 1)
-            vels_norm_mean = (vels_norm).sum(axis=1) / vels_cms.point_num_elements.reshape(-1, 1)
+            vels_norm = vels / speeds.reshape(-1, 1)
+            vels_norm_mean = vels_cms.point_sum(vels_norm) / vels_cms.point_num_elements.reshape(-1, 1)
             vel_par_order_i = ((vels_norm_mean**2).sum(axis=1))**.5
 
             final_id = start_id + len(vels_cms)
@@ -976,13 +943,11 @@ class AreaCalc(Calculator):
 
     def calc_quantity(self):
         while self.next_file_id < self.data.area.num_files:
-            cms = self.data.cms.get_file(self.next_file_id)
-            areas = self.data.area.get_file(self.next_file_id)
-            cms.strip()
-            areas.strip()
+            cms = as_ragged(self.data.cms.get_file(self.next_file_id))
+            areas = as_ragged(self.data.area.get_file(self.next_file_id))
 
-            coords = self.grid.coords(cms.data)
-            cell_area = self.grid.mean_by_cell(areas.data[..., 0], coords, end_id=cms.point_num_elements)
+            coords = self.grid.coords(cms.values, simplify_shape=True)
+            cell_area = self.grid.mean_by_cell(areas.values[:, 0], coords, offsets=cms.offsets)
 
             self.cell_area_sum += cell_area.sum(axis=0)
             self.num_points += cell_area.shape[0]
@@ -6,7 +6,7 @@ from pathlib import Path
 
 from phystem.core import settings
 from phystem.core.run_config import load_configs
-from phystem.data_utils.data_types import ArraySizeAware, MultFileList
+from phystem.data_utils.data_types import ArraySizeAware, RaggedArray, MultFileList
 from phystem.systems.ring.collectors.quantity_pos.collectors import (
     VelocityCfg, CmsCfg, PolarityCfg, AreaCfg
 )
@@ -103,6 +103,11 @@ class CreationRateData(BaseData):
         self.num_created = np.load(self.data_path / "num_created.npy")[:num_points]
         self.num_active = np.load(self.data_path / "num_active.npy")[:num_points]
 
+        # Dados que não existem nas coletas antigas.
+        for name in ("num_removed", "mean_active", "num_invasions"):
+            path = self.data_path / f"{name}.npy"
+            setattr(self, name, np.load(path)[:num_points] if path.exists() else None)
+
 
 class CmsData(BaseData):
     def __init__(self, root_path: Path) -> None:
@@ -113,7 +118,7 @@ class CmsData(BaseData):
         '''
         super().__init__(root_path)
         self.times = np.load(self.data_path / "times.npy")
-        self.cms = MultFileList[ArraySizeAware, np.ndarray](self.data_path, CmsCfg.name) 
+        self.cms = MultFileList[RaggedArray, np.ndarray](self.data_path, CmsCfg.name) 
 
 class VelData(BaseData):
     def __init__(self, root_path: Path) -> None:
@@ -124,8 +129,8 @@ class VelData(BaseData):
         '''
         super().__init__(root_path)
         self.times = np.load(self.data_path / "times.npy")
-        self.vel = MultFileList[ArraySizeAware, np.ndarray](self.data_path, VelocityCfg.name) 
-        self.cms = MultFileList[ArraySizeAware, np.ndarray](self.data_path, CmsCfg.name) 
+        self.vel = MultFileList[RaggedArray, np.ndarray](self.data_path, VelocityCfg.name) 
+        self.cms = MultFileList[RaggedArray, np.ndarray](self.data_path, CmsCfg.name) 
 
         with open(self.data_path / f"{VelocityCfg.name}_metadata.yaml", "r") as f:
             metadata = yaml.unsafe_load(f)
@@ -141,8 +146,8 @@ class PolData(BaseData):
         '''
         super().__init__(root_path)
         self.times = np.load(self.data_path / "times.npy")
-        self.pol = MultFileList[ArraySizeAware, np.ndarray](self.data_path, PolarityCfg.name) 
-        self.cms = MultFileList[ArraySizeAware, np.ndarray](self.data_path, CmsCfg.name) 
+        self.pol = MultFileList[RaggedArray, np.ndarray](self.data_path, PolarityCfg.name) 
+        self.cms = MultFileList[RaggedArray, np.ndarray](self.data_path, CmsCfg.name) 
 
 class AreaData(BaseData):
     def __init__(self, root_path: Path) -> None:
@@ -153,8 +158,8 @@ class AreaData(BaseData):
         '''
         super().__init__(root_path)
         self.times = np.load(self.data_path / "times.npy")
-        self.area = MultFileList[ArraySizeAware, np.ndarray](self.data_path, AreaCfg.name) 
-        self.cms = MultFileList[ArraySizeAware, np.ndarray](self.data_path, CmsCfg.name) 
+        self.area = MultFileList[RaggedArray, np.ndarray](self.data_path, AreaCfg.name) 
+        self.cms = MultFileList[RaggedArray, np.ndarray](self.data_path, CmsCfg.name) 
 
 
 class DenVelData(BaseData):
@@ -193,13 +198,32 @@ class DenVelData(BaseData):
 
 class InvasionData(BaseData):
     def __init__(self, root_path):
+        '''
+        Dados salvos por `InvasionCol`. `invasions_pos` e `relative_areas` são `RaggedArray`,
+        em que o i-ésimo elemento contém os dados da i-ésima coleta.
+        '''
         super().__init__(root_path)
 
-        with open(self.data_path / "data.pickle", "rb") as f:
-            data = pickle.load(f)
+        # Formato antigo, com os dados em listas.
+        if (self.data_path / "data.pickle").exists():
+            with open(self.data_path / "data.pickle", "rb") as f:
+                data = pickle.load(f)
 
-        self.times = data["times"]
-        self.num_invasions = data["num_invasions"]
-        self.invasions_pos = data["invasions_pos"]
-        self.unique_invasions = data["unique_invasions"]
-        self.relative_areas = data["relative_areas"]
\ No newline at end of file
+            self.times = data["times"]
+            self.num_invasions = data["num_invasions"]
+            self.invasions_pos = data["invasions_pos"]
+            self.unique_invasions = data["unique_invasions"]
+            self.relative_areas = data["relative_areas"]
+            return
+
+        self.times = np.load(self.data_path / "times.npy")
+        self.num_invasions = np.load(self.data_path / "num_invasions.npy")
+        self.unique_invasions = np.load(self.data_path / "unique_invasions.npy")
+        self.invasions_pos = RaggedArray.from_arrays(
+            np.load(self.data_path / "invasions_pos.npy"),
+            np.load(self.data_path / "invasions_pos_offsets.npy"),
+        )
+        self.relative_areas = RaggedArray.from_arrays(
+            np.load(self.data_path / "relative_areas.npy")[:, None],
+            np.load(self.data_path / "relative_areas_offsets.npy"),
+        )
\ No newline at end of file
@@ -109,6 +109,42 @@ def get_area(rings: np.array):
     areas /= 2
     return areas
 
+def get_perimeter(rings: np.array):
+    '''
+    Retorna os perímetros dos polígonos formados pelas partículas dos anéis em `rings`.
+    Ver a doc de `get_cm` para informações sobre o tipo de `rings`.
+    '''
+    diff = np.roll(rings, -1, axis=1) - rings
+    return np.sqrt(np.square(diff).sum(axis=2)).sum(axis=1)
+
+def get_gyration_tensor(rings: np.array):
+    '''
+    Retorna o tensor de giro R_ab = (1/N_p) sum_i r_{i,a} r_{i,b} dos anéis em `rings`,
+    em que r_i é a posição da i-ésima partícula em relação ao centro de massa.
+    Ver a doc de `get_cm` para informações sobre o tipo de `rings`.
+
+    Retorno:
+        Array com shape (N_a, 2, 2).
+    '''
+    relative_pos = rings - get_cm(rings)[:, None, :]
+    return np.einsum("npi,npj->nij", relative_pos, relative_pos) / rings.shape[1]
+
+def get_asphericity(gyration_tensor: np.array):
+    '''
+    Asfericidade dos anéis dado seus tensores de giro (ver `get_gyration_tensor`):
+
+        A = (lambda_1 - lambda_2)² / (lambda_1 + lambda_2)² = 1 - 4 det(R) / Tr(R)²
+    '''
+    radius_squared = np.trace(gyration_tensor, axis1=1, axis2=2)
+    determinant = np.linalg.det(gyration_tensor)
+
+    asphericity = np.zeros_like(radius_squared)
+    nonzero = radius_squared > np.finfo(float).eps
+    asphericity[nonzero] = 1.0 - 4.0 * determinant[nonzero] / radius_squared[nonzero]**2
+
+    # Remove pequenas violações, por erros numéricos, do intervalo teórico.
+    return np.clip(asphericity, 0.0, 1.0)
+
 def get_in_obstacle_mask(grid: utils.RegularGrid, stokes_cfg: StokesCfg):
     "Determines whether points in a grid are within a circular obstacle."
     x, y = grid.meshgrid[0] - stokes_cfg.obstacle_x, grid.meshgrid[1] - stokes_cfg.obstacle_y
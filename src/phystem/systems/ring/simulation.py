@@ -22,12 +22,64 @@ class Simulation(SimulationCore):
     dynamic_cfg: RingCfg
 
     def __init__(self, creator_cfg: CreatorCfg, dynamic_cfg: RingCfg, space_cfg, run_cfg: RunCfg, other_cfgs: dict = None, rng_seed: float = None) -> None:
+        from phystem.systems.ring.equilibrium_cache import EquilibriumCheckpointCfg
+
         int_cfg: IntegrationCfg = run_cfg.int_cfg
         if int_cfg.update_type is UpdateType.INVAGINATION and type(creator_cfg) != InvaginationCreatorCfg:
             raise ValueError(f"In mode 'INVAGINATION', the `creator_cfg` must be of type 'InvaginationCreatorCfg', but is {type(creator_cfg)}.")
         
+        if isinstance(run_cfg.checkpoint, EquilibriumCheckpointCfg):
+            configs = {
+                "creator_cfg": creator_cfg, "dynamic_cfg": dynamic_cfg, "space_cfg": space_cfg,
+                "run_cfg": run_cfg, "other_cfgs": other_cfgs, "rng_seed": rng_seed,
+            }
+            run_cfg.checkpoint = self.equilibrium_checkpoint(run_cfg.checkpoint, configs)
+
         super().__init__(creator_cfg, dynamic_cfg, space_cfg, run_cfg, other_cfgs, rng_seed)
 
+    @classmethod
+    def equilibrium_checkpoint(cls, eq_checkpoint, configs: dict):
+        '''
+        Retorna o `CheckpointCfg` do estado equilibrado de `eq_checkpoint` (um `EquilibriumCheckpointCfg`) 
+        para as configurações `configs`. Se o estado não está no cache, o transiente é integrado e 
+        o estado resultante é salvo no cache.
+        '''
+        from copy import deepcopy
+        from phystem.systems.ring.equilibrium_cache import EquilibriumCheckpointCfg
+        eq_checkpoint: EquilibriumCheckpointCfg
+        
+        cache, transient_time = eq_checkpoint.cache, eq_checkpoint.transient_time
+        key = cache.fingerprint(configs, transient_time)
+
+        checkpoint = cache.checkpoint_cfg(key, override_cfgs=True)
+        if checkpoint is None:
+            transient_configs = deepcopy(configs)
+            transient_configs["run_cfg"].checkpoint = None
+            sim = cls(**transient_configs)
+            while sim.solver.time < transient_time:
+                sim.solver.update()
+            
+            cache.store(key, sim.solver, sim.configs, transient_time)
+            checkpoint = cache.checkpoint_cfg(key, override_cfgs=True)
+
+        return checkpoint
+
+    @classmethod
+    def from_equilibrium_cache(cls, cache, transient_time: float, creator_cfg: CreatorCfg, dynamic_cfg: RingCfg, 
+        space_cfg, run_cfg: RunCfg, other_cfgs: dict = None, rng_seed: float = None):
+        '''
+        Cria a simulação a partir do estado obtido após integrar o sistema por `transient_time`,
+        utilizando o cache `cache` (um `EquilibriumCache`). É o mesmo que utilizar
+        `run_cfg.checkpoint = EquilibriumCheckpointCfg(cache, transient_time)`.
+
+        O tempo da simulação começa em zero, então os tempos de transiente/espera dos coletores
+        não devem incluir `transient_time`.
+        '''
+        from phystem.systems.ring.equilibrium_cache import EquilibriumCheckpointCfg
+
+        run_cfg.checkpoint = EquilibriumCheckpointCfg(cache, transient_time)
+        return cls(creator_cfg, dynamic_cfg, space_cfg, run_cfg, other_cfgs, rng_seed)
+
     def adjust_configs(self):
         from phystem.systems.ring.collectors.config_to_col import Configs2Collector, RingCol
 
@@ -102,6 +154,11 @@ class Simulation(SimulationCore):
             if self.run_cfg.checkpoint.is_autosave or self.run_cfg.checkpoint.set_time:
                 solver.cpp_solver.sim_time = metadata["time"] 
                 solver.cpp_solver.num_time_steps = metadata["num_time_steps"] 
+                if "counters" in metadata:
+                    solver.set_counters(metadata["counters"])
+            
+            if metadata is not None and "rng_state" in metadata:
+                solver.set_rng_state(metadata["rng_state"])
         
         int_cfg: IntegrationCfg = self.run_cfg.int_cfg
         if int_cfg.update_type is UpdateType.INVAGINATION:
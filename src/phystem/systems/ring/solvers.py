@@ -2,6 +2,8 @@ import numpy as np
 import os, yaml
 
 from phystem.core.run_config import ReplayDataCfg
+from phystem.core import settings
+from phystem.data_utils.frame_store import FrameStore
 from phystem.systems.ring.configs import RingCfg, SpaceCfg, StokesCfg
 from phystem.systems.ring.run_config import IntegrationCfg, UpdateType, IntegrationType, ParticleWindows, InPolCheckerCfg
 from phystem import cpp_lib
@@ -9,6 +11,40 @@ from phystem import cpp_lib
 from .solver_config import *
 from . import utils, rings_quantities
 
+# Número de colunas de cada observável por anel (ver `CppSolver.ring_observables`).
+RING_OBSERVABLES = {
+    "vel_cm": 2,
+    "cm": 2,
+    "area": 1,
+    "perimeter": 1,
+    "gyration": 3,
+    "asphericity": 1,
+    "polarity": 2,
+}
+
+def check_observables(fields):
+    if isinstance(fields, str):
+        fields = [fields]
+
+    for name in fields:
+        if name not in RING_OBSERVABLES:
+            raise ValueError(f"Observável '{name}' inválido. Os observáveis disponíveis são {list(RING_OBSERVABLES)}.")
+    return list(fields)
+
+def split_observables(fields: list[str], data: np.ndarray):
+    '''
+    Separa as colunas de `data`, que contém os observáveis `fields` concatenados, em um
+    dicionário: nome do observável -> array. Os observáveis com apenas uma coluna
+    possuem shape (N,).
+    '''
+    observables = {}
+    start = 0
+    for name in fields:
+        size = RING_OBSERVABLES[name]
+        observables[name] = data[:, start] if size == 1 else data[:, start:start+size]
+        start += size
+    return observables
+
 class CppSolver:
     def __init__(self, pos: np.ndarray, self_prop_angle: np.ndarray, num_particles: int,
         dynamic_cfg: RingCfg, space_cfg: SpaceCfg, int_cfg: IntegrationCfg, stokes_cfg: StokesCfg=None, rng_seed=None) -> None:
@@ -236,6 +272,35 @@ class CppSolver:
     @property
     def num_created_rings(self):
         return self.cpp_solver.num_created_rings
+
+    # Nome dos contadores acumulados do solver (ver `CppSolver.counters`).
+    counters_names = ("num_steps", "num_created", "num_removed", "active_integral", "num_invasions")
+
+    @property
+    def counters(self) -> dict[str, float]:
+        '''
+        Contadores acumulados desde o início da simulação, atualizados pelo solver em
+        todo passo temporal:
+
+        - num_steps: Número de passos temporais.
+        - num_created, num_removed: Número de anéis criados e removidos (fluxo de stokes).
+        - active_integral: Integral no tempo do número de anéis ativos.
+        - num_invasions: Soma do número de pontos invasores (`in_pol_checker.num_inside_points`)
+            em cada passo.
+
+        As quantidades em um intervalo de tempo são obtidas pela diferença entre os 
+        contadores no final e no início do intervalo, então não é necessário ler os
+        contadores em todo passo.
+        '''
+        counters = self.cpp_solver.counters
+        return {name: getattr(counters, name) for name in self.counters_names}
+
+    def set_counters(self, values: dict[str, float]):
+        "Seta os contadores acumulados (ver `counters`), utilizado no carregamento de checkpoints."
+        counters = cpp_lib.solvers.StepCounters()
+        for name in self.counters_names:
+            setattr(counters, name, values.get(name, 0))
+        self.cpp_solver.counters = counters
     
     @property
     def windows_manager(self):
@@ -251,6 +316,75 @@ class CppSolver:
 
         self.cpp_solver.load_checkpoint(pos, angle, ids, uids)
 
+    @property
+    def rand_seed(self) -> int:
+        '''
+        Seed base do gerador utilizado nos ruídos. O gerador é reiniciado no início de
+        cada passo temporal com uma seed derivada desta e do passo atual.
+        '''
+        return self.cpp_solver.rand_seed
+
+    def set_rand_seed(self, seed: int):
+        self.cpp_solver.set_rand_seed(seed)
+
+    def slots_of(self, uids) -> np.ndarray:
+        '''
+        Ids (posições no array de anéis) dos anéis com uids `uids`, ou -1 para os 
+        anéis que não estão mais ativos. A busca é feita em uma tabela hash mantida 
+        pelo solver, então não é necessário ordenar os uids.
+        '''
+        return self.cpp_solver.slots_of(np.asarray(uids, dtype=np.uint64))
+
+    def rings_in_rect(self, xlims, ylims, margin: float=None):
+        '''
+        Anéis ativos cujo centro de massa está dentro do retângulo de limites `xlims` 
+        e `ylims` (os limites podem ser infinitos). Apenas os anéis nas janelas de partículas
+        próximas ao retângulo são verificados, então o custo não depende do número total de anéis.
+
+        Parâmetros:
+        -----------
+        margin:
+            Distância em que o retângulo é expandido para selecionar as janelas de partículas.
+            Deve ser maior do que a distância entre o centro de massa de um anel e as suas 
+            partículas. Se for `None`, é utilizado o diâmetro do anel.
+
+        Retorno:
+        --------
+        (ids, cms):
+            Ids dos anéis (em ordem crescente) e seus centros de massa.
+        '''
+        if margin is None:
+            margin = -1
+        return self.cpp_solver.rings_in_rect(xlims[0], xlims[1], ylims[0], ylims[1], margin)
+
+    def rings_near(self, point, radius: float, k: int=None, margin: float=None):
+        '''
+        Anéis ativos cujo centro de massa está a uma distância menor ou igual a `radius`
+        de `point`, considerando as bordas periódicas, ordenados pela distância. Se `k` for
+        passado, apenas os `k` anéis mais próximos são retornados. Ver `rings_in_rect`.
+
+        Retorno:
+        --------
+        (ids, cms):
+            Ids dos anéis e seus centros de massa.
+        '''
+        if k is None:
+            k = -1
+        if margin is None:
+            margin = -1
+        return self.cpp_solver.rings_near(point[0], point[1], radius, k, margin)
+
+    def get_stokes_rng_state(self) -> str:
+        return self.cpp_solver.get_stokes_rng_state()
+
+    def set_rng_state(self, rng_state: dict):
+        '''
+        Seta o estado dos geradores de números aleatórios salvo 
+        em um checkpoint (ver `StateSaver.save_file`).
+        '''
+        self.cpp_solver.set_rand_seed(rng_state["rand_seed"])
+        self.cpp_solver.set_stokes_rng_state(rng_state["stokes"])
+
     def update_visual_aids(self):
         self.cpp_solver.update_visual_aids()
 
@@ -263,13 +397,37 @@ class CppSolver:
     def mean_vel(self, ring_id: int):
         return self.cpp_solver.mean_vel(ring_id)
 
+    def ring_observables(self, fields):
+        '''
+        Observáveis por anel calculados em C++, em um único loop paralelo sobre
+        os anéis ativos.
+
+        Parâmetros:
+        -----------
+        fields:
+            Nomes dos observáveis (ou apenas um nome):
+
+            - vel_cm: Velocidade do centro de massa (N, 2).
+            - cm: Centro de massa no passo atual, dentro do espaço periódico (N, 2). 
+                Diferente de `center_mass`, que é calculado antes da integração.
+            - area: Área (com sinal) do polígono formado pelas partículas (N,).
+            - perimeter: Perímetro do polígono formado pelas partículas (N,).
+            - gyration: Tensor de giro, colunas R_xx, R_xy, R_yy (N, 3).
+            - asphericity: Asfericidade, 1 - 4 det(R) / Tr(R)^2 (N,).
+            - polarity: Vetor unitário da polarização (N, 2).
+
+        Retorno:
+        --------
+        Dicionário com os observáveis. As linhas são os anéis ativos, na
+        ordem de `rings_ids[:num_active_rings]`.
+        '''
+        fields = check_observables(fields)
+        cpp_fields = [getattr(cpp_lib.solvers.RingObservable, name) for name in fields]
+        return split_observables(fields, self.cpp_solver.ring_observables(cpp_fields))
+
     def get_vel_cm(self):
-        ids = self.rings_ids[:self.num_active_rings]
-        vels = np.array(self.vel)[ids]
-        vels_cm = np.sum(vels, axis=1) / vels.shape[1]
-        # vels_cm_norm = np.sum(vels_cm**2, 1)**(1/2)
+        vels_cm = self.ring_observables("vel_cm")["vel_cm"]
         vels_cm_dir = np.arctan2(vels_cm[:, 1], vels_cm[:, 0])
-        # vels_cm_dir = vels_cm / vels_cm_norm[:, None]
         return vels_cm, vels_cm_dir
     
 class SolverReplay:
@@ -285,11 +443,18 @@ class SolverReplay:
         self.solver_cfg: ReplaySolverCfg
         self.set_solver_cfg(run_cfg)
 
-        with open(self.root_path / "metadata.yaml", "r") as f:
-            metadata = yaml.unsafe_load(f)
-            self.num_frames = metadata["num_frames"]
+        # Snapshots salvos no armazenamento consolidado (ver `SnapshotsCol`).
+        self.store = None
+        if FrameStore.exists(self.root_path / settings.snaps_store_dirname):
+            self.store = FrameStore(self.root_path / settings.snaps_store_dirname)
+            self.num_frames = self.store.num_frames
+            self.times = self.store.times
+        else:
+            with open(self.root_path / "metadata.yaml", "r") as f:
+                metadata = yaml.unsafe_load(f)
+                self.num_frames = metadata["num_frames"]
 
-        self.times = np.load(self.root_path / "times.npy") 
+            self.times = np.load(self.root_path / "times.npy") 
         
         self.area_debug = AreaDebug(self)
 
@@ -325,6 +490,43 @@ class SolverReplay:
     def center_mass(self):
         return rings_quantities.get_cm(self.pos)
 
+    @property
+    def unique_rings_ids(self):
+        "uids dos anéis em `pos`."
+        if self.solver_cfg.vel_from_solver:
+            return self.ids
+        return self.common_ids
+
+    @property
+    def num_time_steps(self):
+        "Passo temporal da simulação original no frame atual."
+        return int(round(self.time / self.dt))
+
+    def slots_of(self, uids) -> np.ndarray:
+        '''
+        Mesmo que `CppSolver.slots_of`, com os anéis do frame atual: ids (posições em `pos`)
+        dos anéis com uids `uids`, ou -1 para os anéis que não estão no frame.
+        '''
+        uids = np.asarray(uids)
+        frame_uids = np.asarray(self.unique_rings_ids)
+        if frame_uids.size == 0:
+            return np.full(uids.shape, -1, dtype=int)
+
+        order = np.argsort(frame_uids)
+        idx = np.clip(np.searchsorted(frame_uids, uids, sorter=order), 0, frame_uids.size - 1)
+        slots = order[idx]
+        return np.where(frame_uids[slots] == uids, slots, -1)
+
+    def rings_in_rect(self, xlims, ylims, margin: float=None):
+        '''
+        Mesmo que `CppSolver.rings_in_rect`, com os anéis do frame atual. Todos os
+        anéis são verificados, então `margin` não é utilizado.
+        '''
+        cms = self.center_mass
+        mask = (cms[:, 0] > xlims[0]) & (cms[:, 0] < xlims[1]) & (cms[:, 1] > ylims[0]) & (cms[:, 1] < ylims[1])
+        ids = np.flatnonzero(mask)
+        return ids, cms[ids]
+
     def set_solver_cfg(self, run_cfg: ReplayDataCfg):
         self.solver_cfg = run_cfg.solver_cfg
         if self.solver_cfg is None:
@@ -338,11 +540,24 @@ class SolverReplay:
         if not self.solver_cfg.vel_from_solver:
             self.pos2_original, self.ids2 = self.load(frame)
 
+    def seek(self, frame):
+        '''
+        Posiciona o replay no frame `frame`, com o mesmo estado obtido chamando
+        `update` a partir do início até chegar nesse frame.
+        '''
+        self.time_sign = 1
+        self.init(frame)
+        self.frame = frame - 1
+        self.update()
+
     def load(self, frame):
         '''
         Carrega e retorna as posições e uids do frame
         de índice `frame`.
         '''
+        if self.store is not None:
+            return np.array(self.store.get("pos", frame)), np.array(self.store.get("uids", frame))
+
         pos = np.load(self.root_path / f"pos_{frame}.npy")
         ids = np.load(self.root_path / f"uids_{frame}.npy")
         return pos, ids
@@ -364,6 +579,34 @@ class SolverReplay:
         vel_cm_dir = np.arctan2(vel_cm[:, 1], vel_cm[:, 0])
         return vel_cm, vel_cm_dir
 
+    def ring_observables(self, fields):
+        '''
+        Mesmo que `CppSolver.ring_observables`, mas calculado com os dados do frame atual.
+        A polarização não é salva nas snapshots, então não está disponível.
+        '''
+        fields = check_observables(fields)
+
+        observables = {}
+        for name in fields:
+            if name == "vel_cm":
+                observables[name] = self.get_vel_cm()[0]
+            elif name == "cm":
+                observables[name] = self.center_mass
+            elif name == "area":
+                observables[name] = self.area_debug.area
+            elif name == "perimeter":
+                observables[name] = rings_quantities.get_perimeter(self.pos)
+            elif name == "gyration":
+                gyration = rings_quantities.get_gyration_tensor(self.pos)
+                observables[name] = gyration[:, [0, 0, 1], [0, 1, 1]]
+            elif name == "asphericity":
+                gyration = rings_quantities.get_gyration_tensor(self.pos)
+                observables[name] = rings_quantities.get_asphericity(gyration)
+            else:
+                raise ValueError(f"O observável '{name}' não está disponível no replay.")
+
+        return observables
+
     def update_pos(self):
         "Atualiza as posições para o frame atual"
         if self.frame >= self.num_frames-self.cfg.calc_vel_dframes:
@@ -3,7 +3,8 @@ import yaml
 from pathlib import Path
 
 from .solvers import CppSolver
-from phystem.core import collectors, settings
+from .observables import StepObservables
+from phystem.core import collectors, settings, checkpoint_file
 
 class StateData:
     def __init__(self, pos, angle, ids, uids) -> None:
@@ -42,7 +43,8 @@ class StateSaver:
                 "metadata": self.metadata,
             }
     
-    def __init__(self, solver: CppSolver, root_path: Path, configs: dict, xlims=(-1, -1), filenames: FileNames=None) -> None:
+    def __init__(self, solver: CppSolver, root_path: Path, configs: dict, xlims=(-1, -1), filenames: FileNames=None,
+        obs: StepObservables=None) -> None:
         '''
         Coletor para salvar o estado do sistema. O seu método `collect` não está implementado, para 
         salvar o estado do sistema utilize `self.save`.
@@ -60,12 +62,17 @@ class StateSaver:
             os nomes padrões definidos em `FileNames`.
             
             Para não salvar algum dado, sete para `None` o nome do seu arquivo.
+
+        obs:
+            Observáveis do passo atual compartilhados com outros coletores. Se for `None`,
+            é criado um `StepObservables` próprio.
         '''
         self.solver = solver 
         self.root_path = Path(root_path)
         self.configs = configs
         self.filenames = filenames
         self.xlims = xlims
+        self.obs = obs if obs is not None else StepObservables(solver)
         
         self.needs_mask = self.xlims[0] != -1 or self.xlims[1] != -1
 
@@ -103,6 +110,9 @@ class StateSaver:
                 "time": self.solver.time,
                 "num_time_steps": self.solver.num_time_steps,
             }
+            # O `SolverReplay` não possui contadores.
+            if hasattr(self.solver, "counters"):
+                _metadata["counters"] = self.solver.counters
             if metadata is not None:
                 for key, value in metadata.items():
                     _metadata[key] = value 
@@ -113,8 +123,19 @@ class StateSaver:
         ##
         # Salvando estado do sistema
         ##
-        self.ring_ids = self.solver.rings_ids[:self.solver.num_active_rings]
-        cms = np.array(self.solver.center_mass)[self.ring_ids]
+        names = [name for name in ("pos", "angle", "uids", "ids", "vel") if getattr(filenames, name) is not None]
+        state = self.get_state(names, continuos_ring)
+        for name, value in state.items():
+            np.save(directory / getattr(filenames, name), value)
+
+    def get_state(self, names=("pos", "angle", "uids", "ids", "vel"), continuos_ring=False) -> dict[str, np.ndarray]:
+        '''
+        Retorna os dados em `names` do estado atual do sistema, apenas para os
+        anéis ativos dentro de `xlims`.
+        '''
+        obs = self.obs
+        self.ring_ids = obs.active_ids
+        cms = obs.cms_active
         mask = np.full(cms.shape[0], True)
         if self.xlims[0] != -1:
             mask = np.logical_and(mask, cms[:, 0] > self.xlims[0])
@@ -122,34 +143,79 @@ class StateSaver:
         if self.xlims[1] != -1:
             mask = np.logical_and(mask, cms[:, 0] < self.xlims[1])
         
-        if filenames.pos is not None:
-            pos_path = directory / filenames.pos
-
-            if continuos_ring:
-                np.save(pos_path, np.array(self.solver.pos_continuos)[self.ring_ids][mask])
+        state = {}
+        for name in names:
+            if name == "pos":
+                value = obs.pos_continuos if continuos_ring else obs.pos
+            elif name == "angle":
+                value = obs.angles
+            elif name == "uids":
+                value = obs.uids
+            elif name == "vel":
+                value = obs.vel
+            elif name == "ids":
+                state[name] = self.ring_ids[mask]
+                continue
             else:
-                np.save(pos_path, np.array(self.solver.pos)[self.ring_ids][mask])
-        
-        if filenames.angle is not None:
-            angle_path = directory / filenames.angle
-            np.save(angle_path, np.array(self.solver.self_prop_angle)[self.ring_ids][mask])
+                raise ValueError(f"Dado '{name}' não reconhecido.")
 
-        if filenames.uids is not None:
-            uids_path = directory / filenames.uids
-            np.save(uids_path, np.array(self.solver.unique_rings_ids)[self.ring_ids][mask])
+            state[name] = value[self.ring_ids][mask]
         
-        if filenames.ids is not None:
-            ids_path = directory / filenames.ids
-            np.save(ids_path, np.array(self.ring_ids)[mask])
+        return state
 
-        if filenames.vel is not None:
-            vel_path = directory / filenames.vel
-            np.save(vel_path, np.array(self.solver.vel)[self.ring_ids][mask])
+    @staticmethod
+    def save_file(solver: CppSolver, path: Path, configs: dict, metadata: dict[str]=None) -> None:
+        '''
+        Salva o estado do sistema em um único arquivo (ver `phystem.core.checkpoint_file`),
+        incluindo as configurações e o estado dos geradores de números aleatórios do solver.
+
+        O gerador utilizado nos ruídos (`rand()` do C++) não permite a leitura do seu estado,
+        mas ele é reiniciado a cada passo temporal com uma seed derivada da seed base do solver
+        e do passo atual (ver `CppSolver.rand_seed`), então apenas a seed base é salva. Assim, 
+        o salvamento não altera a simulação, e a simulação carregada a partir desse arquivo 
+        continua exatamente como a simulação que o salvou.
+        '''
+        ring_ids = solver.rings_ids[:solver.num_active_rings]
+        arrays = {
+            "pos": np.array(solver.pos)[ring_ids],
+            "angle": np.array(solver.self_prop_angle)[ring_ids],
+            "ids": np.array(ring_ids),
+            "uids": np.array(solver.unique_rings_ids)[ring_ids],
+        }
+
+        _metadata = {
+            "time": solver.time,
+            "num_time_steps": solver.num_time_steps,
+        }
+        # O `SolverReplay` não possui contadores.
+        if hasattr(solver, "counters"):
+            _metadata["counters"] = solver.counters
+        if metadata is not None:
+            _metadata.update(metadata)
+
+        rng_state = {
+            "rand_seed": solver.rand_seed,
+            "stokes": solver.get_stokes_rng_state(),
+        }
+
+        checkpoint_file.save(path, arrays, _metadata, collectors.Collector.configs_to_yaml(configs), rng_state)
 
     @staticmethod
     def load(path: Path, filenames: FileNames=None):
+        '''
+        Carrega o estado salvo em `path`, que pode ser uma pasta (salva com `save`)
+        ou um arquivo (salvo com `save_file`). No último caso, os metadados também contém 
+        o estado dos geradores de números aleatórios, na chave "rng_state".
+        '''
         path = Path(path)
 
+        if checkpoint_file.is_checkpoint_file(path):
+            arrays, header = checkpoint_file.load(path)
+            metadata = dict(header["metadata"])
+            metadata["rng_state"] = header["rng_state"]
+            state_data = StateData(arrays["pos"], arrays["angle"], arrays["ids"], arrays["uids"])
+            return state_data, metadata
+
         if filenames is None:
             filenames = StateSaver.FileNames()
         
@@ -357,7 +357,7 @@ class CellArea(ColorBarableComp):
         return self.ax.figure.colorbar(self.artist, ax=self.ax, **self.configs.colorbar_kwargs)
 
     def get_area(self):
-        areas = np.array(self.active_rings.solver.area_debug.area)[self.active_rings.ids]
+        areas = self.active_rings.solver.ring_observables("area")["area"]
         coords = self.grid.coords(self.active_rings.cms, simplify_shape=True)
         return self.grid.mean_by_cell(areas, coords, simplify_shape=True, remove_out_of_bound=True) / self.configs.area0
 
@@ -472,15 +472,9 @@ class RingVelPos(CollectionComp):
         self.artist_list.add("vel", self.vel_artist)
     
     def update_data(self):
-        pol_angle = np.array(self.solver.self_prop_angle)
-        pol_vec = np.array([np.cos(pol_angle), np.sin(pol_angle)])
-
-        vel_solver = np.array(self.solver.vel)
-        vel = []
-        for v in vel_solver:
-            n = self.active_rings.num_particles_active
-            vel.append(np.sum(v[:n, :], axis=0) / n)
-        vel = np.array(vel).T
+        observables = self.solver.ring_observables(["vel_cm", "polarity"])
+        pol_vec = observables["polarity"].T
+        vel = observables["vel_cm"].T
         
         if self.norm_vel:
             norm = np.sqrt(vel[0]**2 + vel[1]**2)
@@ -488,8 +482,8 @@ class RingVelPos(CollectionComp):
             vel = vel / norm
 
         self.data = {
-            "pol": pol_vec[:, self.active_rings.ids],
-            "vel": vel[:, self.active_rings.ids],
+            "pol": pol_vec,
+            "vel": vel,
         }
 
     def update_artists(self):
@@ -537,11 +531,10 @@ class InvasionPoints(CollectionComp):
         self.artist_list.add("main", self.artist)
 
     def update_artists(self):
-        inside_points = self.solver.in_pol_checker.inside_points
         num_inside_points = self.solver.in_pol_checker.num_inside_points 
         if num_inside_points > 0:
             self.artist.set_visible(True)
-            self.artist.set_offsets(inside_points[:num_inside_points])
+            self.artist.set_offsets(self.solver.in_pol_checker.inside_points_array())
         else:
             self.artist.set_visible(False)
 
@@ -269,54 +269,10 @@ class VelocityColor(CustomColors):
 
 class AsphericityColor(CustomColors):
     def update(self):
-        _, _, asphericity = self.gyration_tensor()
+        asphericity = self.solver.ring_observables("asphericity")["asphericity"]
         self.colors_value = np.repeat(asphericity, self.solver.num_particles)
         self.colors_rgb = self.cfg.cmap.to_rgba(self.colors_value)
 
-    def gyration_tensor(self):
-        solver = self.solver
-
-        # Cpp Solver
-        # ids = solver.rings_ids[:solver.num_active_rings]
-        # centers_of_mass = solver.center_mass[ids]
-        # positions = np.array(solver.pos)[ids, :, :]
-        
-        # Replay Solver
-        centers_of_mass = solver.center_mass
-        positions = solver.pos
-
-        # Relative positions:
-        # shape: (N, n, 2)
-        relative_positions = positions - centers_of_mass[:, None, :]
-
-        # R_ab = (1/n) sum_i r_{i,a} r_{i,b}
-        # shape: (N, 2, 2)
-        gyration_tensor = np.einsum(
-            "npi,npj->nij",
-            relative_positions,
-            relative_positions,
-        ) / positions.shape[1]
-
-        # R_g² = Tr(R)
-        radius_squared = np.trace(gyration_tensor, axis1=1, axis2=2)
-        gyration_radius = np.sqrt(np.maximum(radius_squared, 0.0))
-
-        # For a 2x2 tensor:
-        #
-        # A = (lambda_1 - lambda_2)² / (lambda_1 + lambda_2)²
-        #   = 1 - 4 det(R) / Tr(R)²
-        determinant = np.linalg.det(gyration_tensor)
-
-        asphericity = np.zeros_like(radius_squared)
-
-        nonzero = radius_squared > np.finfo(float).eps
-        asphericity[nonzero] = 1.0 - 4.0 * determinant[nonzero] / radius_squared[nonzero]**2
-
-        # Remove small floating-point violations of the theoretical range.
-        asphericity = np.clip(asphericity, 0.0, 1.0)
-
-        return gyration_tensor, gyration_radius, asphericity
-
 def get_ring_colors(cfg, solver):
     ring_cfg_to_cls = {
         RandomColorsCfg: RandomColor,
@@ -194,8 +194,8 @@ def same_rings(pos1, ids1, pos2, ids2, return_common_ids=False):
     ids2_sorted = np.sort(ids2)
 
     common_ids = np.intersect1d(ids1_sorted, ids2_sorted)
-    id_mask1 = np.where(np.in1d(ids1_sorted, common_ids))[0]
-    id_mask2 = np.where(np.in1d(ids2_sorted, common_ids))[0]
+    id_mask1 = np.where(np.isin(ids1_sorted, common_ids))[0]
+    id_mask2 = np.where(np.isin(ids2_sorted, common_ids))[0]
     
     if return_common_ids:
         return pos1[argsort1[id_mask1]], pos2[argsort2[id_mask2]], common_ids
@@ -16,6 +16,8 @@ collect_cfg:
 '''
 from enum import Enum, auto
 
+import numpy as np
+
 import phystem.systems.szabo.collectors as collectors
 from phystem.systems.szabo.simulation import Simulation
 from phystem.systems.szabo.solvers import CppSolver
@@ -28,49 +30,57 @@ class CollectPlCfg:
     '''
     Configurações para a pipeline de coleta de dados.
     '''
-    def __init__(self, only_last: bool) -> None:
+    def __init__(self, only_last: bool, streaming=False, dtype=None) -> None:
         '''
         Parameters:
         -----------
             only_last:
                 Se for `True` apenas coleta o último frame da simulação.
+            
+            streaming:
+                Se for `True` utiliza o coletor `StateStream`, que escreve
+                os dados no disco durante a coleta.
+            
+            dtype:
+                Tipo utilizado no armazenamento dos dados quando `streaming=True`.
+                Se for `None`, utiliza `np.float64`.
         '''
         self.only_last = only_last
+        self.streaming = streaming
+        self.dtype = dtype
 
 def state(sim: Simulation, collect_cfg: CollectPlCfg):
     solver: CppSolver = sim.solver
     run_cfg: CollectDataCfg = sim.run_cfg
 
+    if collect_cfg.only_last:
+        StateColT = collectors.State
+        col_kwargs = dict(tf=0, num_points=2)
+    elif collect_cfg.streaming:
+        StateColT = collectors.StateStream
+        col_kwargs = dict(tf=run_cfg.tf, num_points=1000, dtype=collect_cfg.dtype or np.float64)
+    else:
+        StateColT = collectors.State
+        col_kwargs = dict(tf=run_cfg.tf, num_points=1000)
+
+    state_collector = StateColT(solver, run_cfg.folder_path, sim.init_configs, 
+        dt=run_cfg.int_cfg.dt, **col_kwargs)
+
     prog = progress.Continuos(run_cfg.tf)
-    if not collect_cfg.only_last:
-        state_collector = collectors.State(
-            solver, run_cfg.folder_path, sim.init_configs,
-            dt=run_cfg.int_cfg.dt, tf=run_cfg.tf, num_points=1000,
-        )
-        
-        state_collector.collect(0)
-        count = 0
-        while solver.time < run_cfg.tf:
-            solver.update()
+    
+    state_collector.collect(0)
+    count = 0
+    while solver.time < run_cfg.tf:
+        solver.update()
+        if not collect_cfg.only_last:
             state_collector.collect(count)
-            
-            prog.update(solver.time)
-            count += 1
-        
-        state_collector.save()
-    else:
-        state_collector = collectors.State(
-            solver, run_cfg.folder_path, sim.init_configs,
-            tf=0, dt=run_cfg.int_cfg.dt, num_points=2,
-        )
-        
-        state_collector.collect(0)
-        while solver.time < run_cfg.tf:
-            solver.update()
-            prog.update(solver.time)
         
+        prog.update(solver.time)
+        count += 1
+    
+    if collect_cfg.only_last:
         state_collector.collect(0)
-        state_collector.save()
+    state_collector.save()
 
 def nabla_range(sim: Simulation, collect_cfg: CollectDataCfg):
     import numpy as np
@@ -1,7 +1,7 @@
 import numpy as np
 import os, yaml
 
-from phystem.core.collectors import Collector
+from phystem.core.collectors import Collector, ColCfg
 from phystem.systems.szabo.solvers import CppSolver
 
 class State(Collector):
@@ -133,6 +133,134 @@ class State(Collector):
 
         return (4 * array_2d_size + array_1d_size + num_points * 2) / 1e6
 
+class StateStream(Collector):
+    file_names = State.file_names
+
+    def __init__(self, solver: CppSolver, path: str, configs: dict, tf: float, dt: float, to=0.0, 
+        num_points:int=None, dtype=np.float64, chunk_size=64, col_cfg: ColCfg=None) -> None:
+        '''
+        Versão de `State` com uso de memória limitado. Os dados são acumulados em
+        um bloco em memória de `chunk_size` pontos, que é escrito nos arquivos em disco
+        (abertos com `np.lib.format.open_memmap`) sempre que fica cheio. O número de pontos
+        já escritos é atualizado em 'metadata.yaml' a cada escrita, então uma coleta
+        interrompida mantém os dados coletados até a última escrita.
+
+        Os arquivos salvos possuem o mesmo formato dos arquivos de `State`.
+
+        Parameters:
+        -----------
+            solver, path, configs, tf, dt, to, num_points:
+                Mesmo significado dos parâmetros de `State`.
+            
+            dtype:
+                Tipo utilizado no armazenamento dos dados das partículas. 
+                O tempo sempre é salvo com `np.float64`.
+
+            chunk_size:
+                Número de pontos mantidos em memória antes de serem escritos no disco.
+            
+            col_cfg:
+                Configurações do coletor.
+        '''
+        if num_points is None:
+            if tf is None or dt is None:
+                raise ValueError("Como 'num_points = None', 'tf' e 'dt' devem ser passados.")
+            freq = 1
+            num_points = int((tf-to)/dt)
+        else:
+            freq = max(int(((tf-to)/dt)/num_points), 1)
+
+        self.num_points = num_points
+        self.dt = dt
+        self.to = to
+        self.tf = tf
+        self.freq = freq
+        self.dtype = dtype
+        self.chunk_size = min(chunk_size, num_points)
+
+        if col_cfg is None:
+            col_cfg = ColCfg()
+        super().__init__(col_cfg, solver, path, configs, data_dirname=None)
+
+    def setup(self):
+        n = self.solver.n
+        shapes = {
+            "pos" : ((2, n), self.dtype),
+            "vel" : ((2, n), self.dtype),
+            "propelling_vel" : ((2, n), self.dtype),
+            "propelling_angle" : ((n,), self.dtype),
+            "sum_forces_matrix" : ((n, 2), self.dtype),
+            "rng" : ((), np.float64),
+            "time" : ((), np.float64),
+        }
+
+        self.metadata_path = self.root_path / "metadata.yaml"
+        self.files = {}
+        self.chunk = {}
+        for name, (shape, dtype) in shapes.items():
+            self.files[name] = np.lib.format.open_memmap(self.root_path / f"{name}.npy", mode="w+",
+                dtype=dtype, shape=(self.num_points, *shape))
+            self.chunk[name] = np.zeros((self.chunk_size, *shape), dtype=dtype)
+
+        self.data_count = 0
+        self.chunk_count = 0
+        self.write_metadata()
+
+    def collect(self, count: int):
+        time = count * self.dt
+        
+        if time < self.to or time > self.tf:
+            return
+
+        if count % self.freq == 0 and self.data_count + self.chunk_count < self.num_points:
+            i = self.chunk_count
+            self.chunk["pos"][i] = self.solver.py_pos
+            self.chunk["vel"][i] = self.solver.py_vel
+            self.chunk["sum_forces_matrix"][i] = self.solver.sum_forces_matrix_debug
+            self.chunk["propelling_vel"][i] = self.solver.propelling_vel
+            self.chunk["propelling_angle"][i] = self.solver.propelling_angle
+            self.chunk["time"][i] = self.solver.time
+            self.chunk["rng"][i] = self.solver.random_number
+            self.chunk_count += 1
+
+            if self.chunk_count == self.chunk_size:
+                self.flush()
+
+    def flush(self):
+        "Escreve no disco os pontos que estão no bloco em memória."
+        if self.chunk_count == 0:
+            return
+
+        start, end = self.data_count, self.data_count + self.chunk_count
+        for name, data in self.files.items():
+            data[start:end] = self.chunk[name][:self.chunk_count]
+            data.flush()
+        
+        self.data_count = end
+        self.chunk_count = 0
+        self.write_metadata()
+
+    def write_metadata(self):
+        with open(self.metadata_path, "w") as f:
+            yaml.dump({"num_points": self.data_count}, f)        
+
+    def save(self):
+        self.flush()
+
+    @staticmethod
+    def load(path: str, mmap_mode="r") -> dict:
+        '''
+        Carrega os dados salvos em `path`, apenas os pontos efetivamente coletados.
+        '''
+        with open(os.path.join(path, "metadata.yaml"), "r") as f:
+            num_points = yaml.unsafe_load(f)["num_points"]
+        
+        data_list = {}
+        for file_name in StateStream.file_names:
+            data = np.load(os.path.join(path, file_name), mmap_mode=mmap_mode)
+            data_list[file_name.split(".")[0]] = data[:num_points]
+        return data_list
+
 class MeanVel(Collector):
     def __init__(self, solver: CppSolver, configs: list, tf: float, dt: float, num_points: int, path: str) -> None:
         '''
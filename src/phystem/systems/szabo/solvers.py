@@ -1,5 +1,7 @@
 import numpy as np
+import threading, yaml
 from math import atan2
+from pathlib import Path
 
 from phystem.core.run_config import ReplayDataCfg
 from phystem.systems.szabo.run_config import UpdateType
@@ -76,48 +78,135 @@ class CppSolver:
 class SolverRD:
     '''
     Solver utilizado no modo replay. Apenas itera sobre os dados salvos.  
+
+    Os arquivos de dados são abertos com `mmap_mode="r"`, então apenas o frame
+    atual é lido do disco (e copiado para `py_pos` e `py_vel`). A série temporal
+    do parâmetro de ordem é calculada em segundo plano, sob demanda.
     '''
-    def __init__(self, run_cfg: ReplayDataCfg) -> None:
-        import os
+    def __init__(self, run_cfg: ReplayDataCfg, chunk_size=256) -> None:
+        '''
+        Parameters:
+        -----------
+            run_cfg:
+                Configurações do modo replay.
+            
+            chunk_size:
+                Número de frames lidos por vez no cálculo, em segundo plano,
+                da série temporal do parâmetro de ordem.
+        '''
+        data_path = Path(run_cfg.data_path)
         
-        self.pos_all = np.load(os.path.join(run_cfg.directory, "pos.npy"))
-        self.vel_all = np.load(os.path.join(run_cfg.directory, "vel.npy"))
-        self.time_arr = np.load(os.path.join(run_cfg.directory, "time.npy"))
-
-        self.py_pos = self.pos_all[0]
-        self.py_vel = self.vel_all[0]
+        self.pos_all = np.load(data_path / "pos.npy", mmap_mode="r")
+        self.vel_all = np.load(data_path / "vel.npy", mmap_mode="r")
+        self.time_arr = np.load(data_path / "time.npy", mmap_mode="r")
+
+        # Os arrays salvos podem ter sido pré-alocados com mais pontos
+        # do que os efetivamente coletados.
+        self.num_frames = self.pos_all.shape[0]
+        metadata_path = data_path / "metadata.yaml"
+        if metadata_path.exists():
+            with open(metadata_path, "r") as f:
+                num_points = yaml.unsafe_load(f).get("num_points")
+            if num_points is not None:
+                self.num_frames = min(num_points, self.num_frames)
+
+        self.py_pos = np.array(self.pos_all[0])
+        self.py_vel = np.array(self.vel_all[0])
         
         self.pos = self.py_pos.T
         self.vel = self.py_vel.T
         
         self.num_particles = self.pos_all.shape[2]
         self.id = 0
-        self.dt = run_cfg.dt
+        self.dt = run_cfg.int_cfg.dt
         
         self.run_cfg = run_cfg
         self.count = 0
-    
+
+        self.chunk_size = chunk_size
+        self._mean_vel_series = None
+        self._mean_vel_thread: threading.Thread = None
+        self.start_mean_vel_series()
 
     @property
     def time(self):
         return self.time_arr[self.id]    
 
-    def mean_vel(self):
-        id = self.id
-        speeds = np.sqrt(self.vel_all[id][0]**2 + self.vel_all[id][1]**2)
+    @property
+    def frequency(self):
+        return getattr(self.run_cfg, "frequency", 0)
+
+    @staticmethod
+    def calc_mean_vel(vel: np.ndarray):
+        '''
+        Parâmetro de ordem (módulo da média das velocidades normalizadas) 
+        dos frames em `vel`, cujo formato é (num_frames, 2, num_particles).
+        '''
+        speeds = np.sqrt(vel[:, 0]**2 + vel[:, 1]**2)
         speeds[speeds < 1e-6] = 1e-6
-        m_vel = (self.vel_all[id] / speeds).sum(axis=1) / self.num_particles
-        return (m_vel[0]**2 + m_vel[1]**2)**.5
+        m_vel = (vel / speeds[:, None, :]).mean(axis=2)
+        return np.sqrt(m_vel[:, 0]**2 + m_vel[:, 1]**2)
+
+    def _calc_mean_vel_series(self):
+        series = np.empty(self.num_frames, dtype=np.float64)
+        for start in range(0, self.num_frames, self.chunk_size):
+            end = min(start + self.chunk_size, self.num_frames)
+            series[start:end] = self.calc_mean_vel(self.vel_all[start:end])
+        self._mean_vel_series = series
+
+    def start_mean_vel_series(self):
+        '''
+        Inicia o cálculo, em segundo plano, da série temporal do parâmetro de ordem.
+        '''
+        if self._mean_vel_thread is not None:
+            return
+        self._mean_vel_thread = threading.Thread(target=self._calc_mean_vel_series, daemon=True)
+        self._mean_vel_thread.start()
+
+    def mean_vel_series(self):
+        '''
+        Retorna a série temporal do parâmetro de ordem, esperando 
+        o cálculo em segundo plano terminar, caso necessário.
+        '''
+        self.start_mean_vel_series()
+        self._mean_vel_thread.join()
+        return self._mean_vel_series
+
+    def mean_vel(self):
+        if self._mean_vel_series is not None:
+            return self._mean_vel_series[self.id]
+        return self.calc_mean_vel(self.py_vel[None])[0]
 
     def mean_vel_vec(self):
         return [0, 1]
 
+    def seek(self, frame: int):
+        '''
+        Vai para o frame de índice `frame`. Índices negativos
+        são contados a partir do final.
+        '''
+        if frame < 0:
+            frame += self.num_frames
+        if frame < 0 or frame >= self.num_frames:
+            raise IndexError(f"Frame {frame} fora do intervalo [0, {self.num_frames}).")
+
+        self.id = frame
+        self.count = 0
+        self.py_pos[:] = self.pos_all[frame]
+        self.py_vel[:] = self.vel_all[frame]
+
+    def skip(self, num_frames: int):
+        '''
+        Avança (ou retrocede, se `num_frames` < 0) `num_frames` frames,
+        parando nos extremos dos dados.
+        '''
+        frame = min(max(self.id + num_frames, 0), self.num_frames - 1)
+        self.seek(frame)
+
     def update(self):
         self.count += 1
-        if self.count > self.run_cfg.frequency:
-            self.count = 0
-            self.id += 1
-
-            self.py_pos[:] = self.pos_all[self.id]
-            self.py_vel[:] = self.vel_all[self.id]
-            
+        if self.count > self.frequency:
+            if self.id + 1 < self.num_frames:
+                self.skip(1)
+            else:
+                self.count = 0
@@ -1,11 +1,16 @@
-import unittest, os, shutil
+import unittest, os, shutil, pickle, yaml
 from pathlib import Path
 
 from phystem.systems.ring import Simulation, utils
 from phystem.systems.ring.configs import RingCfg
 from phystem.core.run_config import load_configs, CollectDataCfg, CheckpointCfg
 from phystem.systems.ring.collectors import *
+from phystem.systems.ring.collectors.config_to_col import Configs2Collector
 from phystem.systems.ring.quantities.datas import *
+from phystem.systems.ring.state_saver import StateSaver
+from phystem.data_utils.frame_store import FrameStore
+from phystem.data_utils.data_types import MultFileList, RaggedArray
+from phystem.core import settings
 
 CURRENT_FOLDER = Path(os.path.dirname(__file__))
 CONFIGS_PATH = CURRENT_FOLDER / "data_test/ring/configs/collectors_configs"
@@ -14,18 +19,29 @@ class AsteroidError(Exception):
     def __init__(self, *args: object) -> None:
         super().__init__(*args)
 
+class DeltaInfectedCfg(DeltaColCfg):
+    num_autosaves: int = None
+
+class DeltaInfected(DeltaCol):
+    '''
+    Coletor do delta que falha durante o `num_autosaves`-ésimo auto-salvamento
+    do gerenciador, antes do commit do auto-salvamento.
+    '''
+    count = 0
+    def dump_state(self):
+        DeltaInfected.count += 1
+        if DeltaInfected.count == DeltaInfectedCfg.num_autosaves:
+            raise AsteroidError()
+        return super().dump_state()
+
+Configs2Collector.add(DeltaInfectedCfg, DeltaInfected)
+
 class TestRingCols(unittest.TestCase):
     def test_autosave(self):
         stop_time = 50
-        ColsT = {
-            "delta": DeltaCol,
-            "cr": CreationRateCol,
-            "den_vel": DenVelCol,
-            "checkpoint": CheckpointCol,
-            "snaps": SnapshotsCol,
-        }
+        cols_names = ["delta", "cr", "den_vel", "checkpoint", "snaps"]
 
-        run_cfg, configs = self.exec_collect(stop_time, ColsT)
+        run_cfg, configs = self.exec_collect(stop_time, cols_names)
 
         run_cfg.checkpoint = CheckpointCfg(run_cfg.folder_path / "autosave")
         sim = Simulation(**configs)
@@ -37,31 +53,22 @@ class TestRingCols(unittest.TestCase):
         shutil.rmtree(run_cfg.folder_path)
        
     def test_autosave_backup(self):
+        '''
+        Falha durante o auto-salvamento do gerenciador (no `dump_state` de um dos coletores),
+        então o auto-salvamento anterior (backup) deve ser carregado.
+        '''
         num_autosaves = 5
-        class DeltaInfected(DeltaCol):
-            count = 0
-            def autosave(self):
-                super().autosave()        
-                DeltaInfected.count += 1
-
-                if DeltaInfected.count == num_autosaves:
-                    raise AsteroidError()
+        DeltaInfected.count = 0
+        DeltaInfectedCfg.num_autosaves = num_autosaves
 
         stop_time = 50000000
-        ColsT = {
-            "cr": CreationRateCol,
-            "den_vel": DenVelCol,
-            "delta": DeltaInfected,
-            "checkpoint": CheckpointCol,
-            "snaps": SnapshotsCol,
-        }
+        cols_names = ["cr", "den_vel", "delta", "checkpoint", "snaps"]
 
-        run_cfg, configs = self.exec_collect(stop_time, ColsT)
+        run_cfg, configs = self.exec_collect(stop_time, cols_names, DeltaT=DeltaInfectedCfg)
 
         run_cfg.checkpoint = CheckpointCfg(run_cfg.folder_path / "autosave")
         sim = Simulation(**configs)
 
-
         autosave_dt = 5
         expected_time = autosave_dt * (num_autosaves - 1) 
         if sim.solver.time < expected_time - 1 or sim.solver.time > expected_time + 1:
@@ -71,69 +78,126 @@ class TestRingCols(unittest.TestCase):
         sim.run()
         shutil.rmtree(run_cfg.folder_path)
 
-    @staticmethod
-    def exec_collect(stop_time: float, ColsT: dict[str, RingCol]):
+    def test_tracer(self):
+        '''
+        Os dados do `TracerCol` devem estar no disco após cada auto-salvamento do gerenciador
+        e continuar sem buracos após o carregamento do auto-salvamento.
+        '''
+        stop_time = 50
+        freq_steps = 50
+        cols_cfgs = {"tracer": TracerColCfg(num_tracers=5, freq_steps=freq_steps, wait_time=20, seed=1)}
+
+        run_cfg, configs = self.exec_collect(stop_time, ["checkpoint"], cols_cfgs=cols_cfgs)
+        tracer_path = run_cfg.folder_path / "tracer"
+
+        self.assertTrue((tracer_path / "data" / "metadata.yaml").exists(), "metadata.yaml não foi escrito no auto-salvamento")
+        data = TracerCol.load(tracer_path)
+        self.assertGreater(data["times"].size, 0)
+        self.assertTrue((data["times"] >= 20).all())
+
+        run_cfg.checkpoint = CheckpointCfg(run_cfg.folder_path / "autosave")
+        Simulation(**configs).run()
+
+        data = TracerCol.load(tracer_path)
+        times = data["times"]
+        dt = run_cfg.int_cfg.dt
+        self.assertTrue(np.allclose(np.diff(times), freq_steps * dt), "Tempos das coletas com buracos")
+        self.assertGreater(times[-1], run_cfg.tf - freq_steps * dt - 1e-6)
+        self.assertEqual(data["cms"].shape, (times.size, 5, 2))
+
+        shutil.rmtree(run_cfg.folder_path)
+
+    def test_delta_online(self):
+        '''
+        Os deltas calculados durante a coleta (`online=True`) devem ser iguais aos deltas
+        calculados pelo `DeltaCalc` sobre os dados brutos salvos na mesma coleta.
+        '''
+        from phystem.systems.ring.quantities.calculators import DeltaCalc
+
+        edge_k = 1.5
         configs = load_configs(CONFIGS_PATH)
-        run_cfg: CollectDataCfg = configs["run_cfg"]
-        dynamic_cfg = configs["dynamic_cfg"]
-        radius = utils.ring_radius(
-            p_diameter = dynamic_cfg.diameter,
-            num_particles = configs["creator_cfg"].num_p,
-        )
+        col_cfg: DeltaColCfg = self.get_cols_cfgs(configs["run_cfg"], configs["dynamic_cfg"])["delta"]
+        col_cfg.start_dt, col_cfg.check_dt = 5, 0.25
+        col_cfg.wait_dist = configs["dynamic_cfg"].get_ring_radius()
+        col_cfg.online, col_cfg.save_raw, col_cfg.edge_k = True, True, edge_k
 
-        # Configurações dos coletores
-        func_cfg = {}
+        run_cfg, _ = self.exec_collect(np.inf, [], cols_cfgs={"delta": col_cfg}, tf=60)
+        delta_path = run_cfg.folder_path / "delta"
+        
+        calc = DeltaCalc(delta_path, edge_k, run_cfg.folder_path / "delta_calc")
+        calc.crunch_numbers()
+        self.assertGreater(calc.deltas.size, 0)
 
-        center_region = -4 * 2*radius
-        wait_dist = 4 * 2*radius
-        xlims = [center_region - radius, center_region + radius]
-        func_cfg["delta"] = {
-            "min_num_rings": 1,
-            "wait_dist": wait_dist,  
-            "xlims": [center_region - radius, center_region + radius],
-            "start_dt": (xlims[1] - xlims[0]) * dynamic_cfg.vo,
-            "check_dt": 1/4 * (xlims[1] - xlims[0]) * dynamic_cfg.vo,
-        }
+        # Os deltas online estão na ordem em que os pontos terminaram e o `DeltaCalc`
+        # ignora o último ponto iniciado, então os pontos são comparados pelo tempo inicial.
+        online = np.load(delta_path / "data" / "deltas.npy")
+        online_deltas = dict(zip(online[:, 0].tolist(), online[:, 2].tolist()))
+        for time, delta in zip(calc.times.tolist(), calc.deltas.tolist()):
+            self.assertIn(time, online_deltas)
+            self.assertAlmostEqual(online_deltas[time], delta, places=10)
+        self.assertLessEqual(online.shape[0] - calc.deltas.size, 1)
 
-        func_cfg["den_vel"] = {
-            "xlims": [center_region - radius, center_region + radius],
-            "vel_dt": 2,
-            "density_dt": 2,
-            "vel_frame_dt": 0.5,
-        }
+        shutil.rmtree(run_cfg.folder_path)
 
-        func_cfg["cr"] = {
-            "wait_time": 0,
-            "collect_time": run_cfg.tf, 
-            "collect_dt": 1,
-        }
+    @staticmethod
+    def get_cols_cfgs(run_cfg: CollectDataCfg, dynamic_cfg: RingCfg, DeltaT=DeltaColCfg) -> dict[str, ColCfg]:
+        radius = dynamic_cfg.get_ring_radius()
+        center_region = -4 * 2*radius
+        xlims = [center_region - radius, center_region + radius]
 
-        func_cfg["snaps"] = {
-            "col_cfg": SnapshotsColCfg(
+        return {
+            "delta": DeltaT(
+                min_num_rings=1,
+                wait_dist=4 * 2*radius,
+                xlims=xlims,
+                start_dt=(xlims[1] - xlims[0]) * dynamic_cfg.vo,
+                check_dt=1/4 * (xlims[1] - xlims[0]) * dynamic_cfg.vo,
+            ),
+            "den_vel": DenVelColCfg(
+                xlims=xlims,
+                vel_dt=2,
+                density_dt=2,
+                vel_frame_dt=0.5,
+            ),
+            "cr": CreationRateColCfg(
+                wait_time=0,
+                collect_time=run_cfg.tf, 
+                collect_dt=1,
+            ),
+            "checkpoint": CheckpointColCfg(),
+            "snaps": SnapshotsColCfg(
                 snaps_dt=2,
                 wait_time=1,
             ),
         }
 
-        func_cfg["autosave_cfg"] = ColAutoSaveCfg(freq_dt=5)
-
-        class DeltaInfected(DeltaCol):
-            count = 0
-            def autosave(self):
-                super().autosave()        
-                DeltaInfected.count += 1
+    @staticmethod
+    def exec_collect(stop_time: float, cols_names: list[str], DeltaT=DeltaColCfg, cols_cfgs: dict[str, ColCfg]=None,
+        tf: float=None, pipeline=None, autosave_cfg: ColAutoSaveCfg=None):
+        '''
+        Executa a coleta com os coletores em `cols_names` (ver `get_cols_cfgs`) e os
+        coletores em `cols_cfgs`, parando a execução após `stop_time`. Se `pipeline` for
+        `None`, é utilizada a pipeline de `get_pipeline`. Se `autosave_cfg` for `None`, o
+        gerenciador é auto-salvo a cada 5 unidades de tempo.
+        '''
+        configs = load_configs(CONFIGS_PATH)
+        run_cfg: CollectDataCfg = configs["run_cfg"]
+        if tf is not None:
+            run_cfg.tf = tf
+        dynamic_cfg: RingCfg = configs["dynamic_cfg"]
 
-                if DeltaInfected.count > 2:
-                    raise AsteroidError()
+        # Configurações dos coletores
+        all_cols_cfgs = TestRingCols.get_cols_cfgs(run_cfg, dynamic_cfg, DeltaT)
+        all_cols_cfgs = {name: all_cols_cfgs[name] for name in cols_names}
+        all_cols_cfgs.update(cols_cfgs or {})
 
         # Rodando a simulação
-        run_cfg: CollectDataCfg = configs["run_cfg"]
         run_cfg.folder_path = CURRENT_FOLDER / "tmp"
-        run_cfg.func_cfg = func_cfg
-        run_cfg.func = TestRingCols.get_pipeline(
-            stop_time=stop_time,
-            ColsT=ColsT,
+        run_cfg.func_cfg = ColManagerCfg(
+            cols_cfgs=all_cols_cfgs,
+            autosave_cfg=autosave_cfg or ColAutoSaveCfg(freq_dt=5),
         )
+        run_cfg.func = pipeline or TestRingCols.get_pipeline(stop_time=stop_time)
 
         try:
             Simulation(**configs).run()
@@ -144,26 +208,20 @@ class TestRingCols(unittest.TestCase):
         return run_cfg, configs
     
     @staticmethod
-    def get_pipeline(stop_time, ColsT: dict[str, RingCol]):
-        def pipeline(sim: Simulation, cfg: dict=None):
-            from phystem.core.run_config import CollectDataCfg
-            from phystem.systems.ring.collectors import ColManager
+    def get_pipeline(stop_time):
+        def pipeline(sim: Simulation, cfg: ColManagerCfg):
             from phystem.utils import progress
             
             collect_cfg: CollectDataCfg = sim.run_cfg
             solver = sim.solver
 
+            is_autosave = collect_cfg.is_autosave
+            cfg.to_load_autosave = is_autosave
+
             col = ColManager(
-                root_path=collect_cfg.folder_path, solver=sim.solver, configs=sim.configs, 
-                to_load_autosave=collect_cfg.is_autosave,
-                autosave_cfg=cfg["autosave_cfg"],
+                col_cfg=cfg, solver=solver, root_path=collect_cfg.folder_path, configs=sim.configs, 
             )
 
-            for name, ColT in ColsT.items():
-                col.add_collector(ColT, cfg.get(name, {}), name)
-
-            is_autosave = collect_cfg.is_autosave
-
             prog = progress.Continuos(collect_cfg.tf)
             while solver.time < collect_cfg.tf:
                 if solver.time > stop_time and not is_autosave:
@@ -180,6 +238,634 @@ class TestRingCols(unittest.TestCase):
         
         return pipeline
 
+class TestPersistence(unittest.TestCase):
+    '''
+    Escrita, auto-salvamento, carregamento e leitura dos dados pelos leitores
+    (`FrameStore`, `MultFileList`, `StateSaver.load`, etc.).
+    '''
+    def setUp(self):
+        self.folder_path = CURRENT_FOLDER / "tmp"
+
+    def tearDown(self):
+        if self.folder_path.exists():
+            shutil.rmtree(self.folder_path)
+
+    def resume(self, run_cfg: CollectDataCfg, configs: dict):
+        run_cfg.checkpoint = CheckpointCfg(run_cfg.folder_path / "autosave")
+        sim = Simulation(**configs)
+        sim.run()
+        return sim
+
+    def assert_snaps(self, snaps_path: Path, snaps_dt: float, dt: float):
+        "Verifica se as snapshots em `snaps_path` estão consistentes e sem buracos."
+        data_path = snaps_path / "data"
+        with open(data_path / "metadata.yaml", "r") as f:
+            metadata = yaml.unsafe_load(f)
+
+        store = FrameStore(data_path / "snaps")
+        times = np.load(data_path / "times.npy")
+        
+        self.assertTrue(metadata["consolidated"])
+        self.assertEqual(store.num_frames, metadata["num_frames"])
+        self.assertEqual(store.num_frames, times.size)
+        self.assertTrue(np.allclose(store.times, times))
+        self.assertTrue(np.allclose(np.diff(times), snaps_dt, atol=1.5*dt), "Snapshots com buracos ou repetidas")
+
+        snaps = SnapshotsCol.load_snaps(snaps_path)
+        self.assertEqual(len(snaps), store.num_frames)
+        for frame in (0, store.num_frames - 1):
+            self.assertEqual(snaps[frame].pos.shape[0], snaps[frame].uids.size)
+            self.assertTrue(np.array_equal(snaps[frame].uids, store.get("uids", frame)))
+
+    def test_snapshots_store(self):
+        '''
+        Armazenamento consolidado das snapshots e journals: as snapshots escritas após o
+        último auto-salvamento são descartadas ao carregá-lo.
+        '''
+        run_cfg, configs = TestRingCols.exec_collect(30, ["snaps"], tf=60)
+        snaps_path = run_cfg.folder_path / "snaps"
+
+        # Journal dos tempos das snapshots escrito pelo gerenciador.
+        journal_path = snaps_path / settings.autosave_container_name / settings.autosave_journal_dirname / "times.pickle"
+        self.assertTrue(journal_path.exists())
+
+        # Snapshots escritas após o último auto-salvamento ainda estão no armazenamento.
+        num_frames_crash = FrameStore(snaps_path / "data" / "snaps").num_frames
+
+        self.resume(run_cfg, configs)
+        
+        snaps_cfg: SnapshotsColCfg = run_cfg.func_cfg.cols_cfgs["snaps"]
+        self.assert_snaps(snaps_path, snaps_cfg.snaps_dt, run_cfg.int_cfg.dt)
+        self.assertGreater(FrameStore(snaps_path / "data" / "snaps").num_frames, num_frames_crash)
+
+    def test_quantized_periodic(self):
+        '''
+        Quantização de anéis que cruzam a borda periódica: a escala continua sendo
+        da ordem do tamanho do anel e as posições decodificadas estão dentro do espaço.
+        '''
+        from phystem.data_utils.frame_store import FrameStoreWriter
+        from phystem.data_utils.quantize import encode_rows
+
+        box = np.array([20.0, 10.0])
+        angles = np.linspace(0, 2*np.pi, 30, endpoint=False)
+        ring = np.stack([np.cos(angles), np.sin(angles)], axis=-1)
+
+        # Anéis no centro, na borda em x, na borda em y e no canto.
+        centers = np.array([[0, 0], [9.8, 2], [-3, -4.9], [-9.9, 4.95]])
+        pos = centers[:, None, :] + ring[None, :, :]
+        pos -= box * np.rint(pos / box)
+
+        center, offsets, scale = encode_rows(pos, box)
+        centers_wrapped = centers - box * np.rint(centers / box)
+        self.assertTrue(np.allclose(center, centers_wrapped, atol=1e-5))
+        self.assertTrue((scale < 1.1 / np.iinfo(np.int16).max).all())
+
+        store_path = self.folder_path / "store"
+        writer = FrameStoreWriter(store_path, fields={"pos": (pos.dtype, pos.shape[1:])},
+            quantized=("pos",), box=box)
+        writer.append(0, pos=pos)
+        writer.close()
+
+        store = FrameStore(store_path)
+        pos_decoded = store.get("pos", 0)
+        self.assertTrue((np.abs(pos_decoded) <= box/2).all())
+
+        error = pos_decoded - pos
+        error -= box * np.rint(error / box)
+        self.assertTrue((np.abs(error) <= scale[:, None, None]/2 + 1e-6).all())
+
+    def test_manifest_shards(self):
+        '''
+        Shards dos coletores de `QuantityPosCol`: o manifesto continua consistente
+        com os tempos após o carregamento do auto-salvamento.
+        '''
+        dt = 0.01
+        cols_cfgs = {"q": QuantityPosCfg(
+            collect_dt=utils.time_to_num_dt(0.5, dt),
+            quantities_cfg=[quantity_pos.PolarityCfg(), quantity_pos.AreaCfg()],
+            memory_per_file=2e3,
+        )}
+        run_cfg, configs = TestRingCols.exec_collect(30, [], cols_cfgs=cols_cfgs, tf=60)
+        self.resume(run_cfg, configs)
+
+        data_path = run_cfg.folder_path / "q" / "data"
+        area_data = AreaData(run_cfg.folder_path / "q")
+        
+        for name in ("cms", "area", "pol"):
+            data = MultFileList[RaggedArray, np.ndarray](data_path, name)
+            self.assertTrue(data.is_sharded)
+            self.assertGreater(data.num_files, 1)
+            self.assertEqual(len(data), area_data.times.size, name)
+
+            with open(data_path / f"{name}_manifest.yaml", "r") as f:
+                shards = yaml.unsafe_load(f)["shards"]
+            self.assertEqual(sum(shards), len(data))
+            
+            # Acesso aleatório entre shards.
+            for i in (0, len(data) // 2, len(data) - 1):
+                self.assertEqual(data[i].shape[0], area_data.cms[i].shape[0])
+
+        self.assertTrue(np.all(np.diff(area_data.times) > 0))
+
+    def test_checkpoint_file(self):
+        '''
+        Checkpoint em um único arquivo: carregamento com `StateSaver.load`, início de uma
+        simulação a partir dele e verificação do checksum.
+        '''
+        from phystem.core import checkpoint_file
+
+        cols_cfgs = {"checkpoint": CheckpointColCfg(single_file=True)}
+        run_cfg, configs = TestRingCols.exec_collect(30, [], cols_cfgs=cols_cfgs, tf=40)
+        sim = self.resume(run_cfg, configs)
+
+        path = run_cfg.folder_path / "checkpoint" / ("checkpoint" + checkpoint_file.FILE_EXT)
+        state_data, metadata = StateSaver.load(path)
+        self.assertIn("rng_state", metadata)
+        self.assertEqual(state_data.pos.shape[0], sim.solver.num_active_rings)
+        active_uids = np.array(sim.solver.unique_rings_ids)[sim.solver.rings_ids[:sim.solver.num_active_rings]]
+        self.assertTrue(np.array_equal(np.sort(state_data.uids), np.sort(active_uids)))
+
+        # Simulação a partir do checkpoint.
+        configs2 = load_configs(CONFIGS_PATH)
+        configs2["run_cfg"].folder_path = run_cfg.folder_path / "from_checkpoint"
+        configs2["run_cfg"].func = lambda sim, cfg: None
+        configs2["run_cfg"].checkpoint = CheckpointCfg(path, set_time=True)
+        sim2 = Simulation(**configs2)
+        self.assertAlmostEqual(sim2.solver.time, sim.solver.time, delta=run_cfg.int_cfg.dt)
+        self.assertEqual(sim2.solver.num_active_rings, sim.solver.num_active_rings)
+
+        # Arquivo corrompido.
+        with open(path, "r+b") as f:
+            f.seek(-100, os.SEEK_END)
+            byte = f.read(1)
+            f.seek(-100, os.SEEK_END)
+            f.write(bytes([byte[0] ^ 0xFF]))
+        
+        with self.assertRaises(checkpoint_file.CorruptedCheckpointError):
+            StateSaver.load(path)
+
+    def test_save_file_neutral(self):
+        '''
+        Salvar checkpoints em arquivo (`StateSaver.save_file`) não altera a simulação, e a
+        simulação carregada de um deles continua exatamente como a simulação que o salvou.
+        '''
+        from phystem.core import checkpoint_file
+        
+        tf = 20
+        path = self.folder_path / ("checkpoint" + checkpoint_file.FILE_EXT)
+        self.folder_path.mkdir(parents=True, exist_ok=True)
+        
+        def get_sim(checkpoint: CheckpointCfg=None):
+            configs = load_configs(CONFIGS_PATH)
+            configs["run_cfg"].folder_path = self.folder_path / "sim"
+            configs["run_cfg"].func = lambda sim, cfg: None
+            configs["run_cfg"].checkpoint = checkpoint
+            return Simulation(**configs)
+        
+        def run(sim: Simulation, save_steps=()):
+            solver = sim.solver
+            while solver.time < tf:
+                solver.update()
+                if solver.num_time_steps in save_steps:
+                    StateSaver.save_file(solver, path, sim.configs)
+
+            # Posições dos anéis ativos, ordenadas pelos uids.
+            ids = solver.rings_ids[:solver.num_active_rings]
+            uids = np.array(solver.unique_rings_ids)[ids]
+            return np.array(solver.pos)[ids][np.argsort(uids)]
+
+        pos = run(get_sim())
+        pos_saves = run(get_sim(), save_steps=(500, 1000))
+        pos_loaded = run(get_sim(CheckpointCfg(path, set_time=True)))
+        
+        self.assertGreater(pos.shape[0], 0)
+        self.assertTrue(np.array_equal(pos, pos_saves))
+        self.assertTrue(np.array_equal(pos, pos_loaded))
+
+    def test_scheduler(self):
+        '''
+        A pipeline do `ColManager` (coleta apenas nos passos em que os coletores precisam
+        coletar) deve gerar os mesmos dados da coleta a cada passo, inclusive com o carregamento
+        do auto-salvamento.
+        '''
+        cols_names = ["snaps", "cr"]
+        tf = 30
+        polling_path = CURRENT_FOLDER / "tmp_polling"
+
+        run_cfg, _ = TestRingCols.exec_collect(np.inf, cols_names, tf=tf)
+        shutil.move(run_cfg.folder_path, polling_path)
+
+        try:
+            DeltaInfected.count = 0
+            DeltaInfectedCfg.num_autosaves = 3
+            run_cfg, configs = TestRingCols.exec_collect(np.inf, cols_names + ["delta"], DeltaT=DeltaInfectedCfg, 
+                tf=tf, pipeline=ColManager.get_pipeline())
+            self.assertEqual(DeltaInfected.count, DeltaInfectedCfg.num_autosaves, "A falha não ocorreu")
+            self.resume(run_cfg, configs)
+
+            snaps_cfg: SnapshotsColCfg = run_cfg.func_cfg.cols_cfgs["snaps"]
+            self.assert_snaps(run_cfg.folder_path / "snaps", snaps_cfg.snaps_dt, run_cfg.int_cfg.dt)
+
+            store = FrameStore(run_cfg.folder_path / "snaps" / "data" / "snaps")
+            polling_store = FrameStore(polling_path / "snaps" / "data" / "snaps")
+            self.assertTrue(np.array_equal(store.times, polling_store.times))
+            
+            cr = CreationRateData(run_cfg.folder_path / "cr")
+            polling_cr = CreationRateData(polling_path / "cr")
+            self.assertTrue(np.array_equal(cr.times, polling_cr.times))
+        finally:
+            shutil.rmtree(polling_path)
+
+    def test_recollect(self):
+        '''
+        Coleta offline sobre as snapshots, dividida em partes, com a retomada de
+        uma coleta interrompida.
+        '''
+        cols_cfgs = {"snaps": SnapshotsColCfg(snaps_dt=0.5, wait_time=1)}
+        run_cfg, _ = TestRingCols.exec_collect(np.inf, [], cols_cfgs=cols_cfgs, tf=20)
+        snaps_path = run_cfg.folder_path / "snaps"
+
+        def load_area(path):
+            with open(Path(path) / "data" / "data.pickle", "rb") as f:
+                return pickle.load(f)
+
+        area_cfg = AreaColCfg(freq_dt=0)
+        recollect(snaps_path, area_cfg, run_cfg.folder_path / "single", num_chunks=1, num_workers=1)
+        recollect(snaps_path, area_cfg, run_cfg.folder_path / "chunks", num_chunks=3, num_workers=1, keep_chunks=True)
+        single = load_area(run_cfg.folder_path / "single")
+        chunks = load_area(run_cfg.folder_path / "chunks")
+
+        store = FrameStore(snaps_path / "data" / "snaps")
+        self.assertGreater(len(single["times"]), 0)
+        self.assertTrue(np.allclose(single["times"], store.times[1:len(single["times"])+1]))
+        self.assertTrue(np.allclose(single["times"], chunks["times"]))
+        for a, b in zip(single["areas"], chunks["areas"]):
+            self.assertTrue(np.allclose(a, b))
+
+        # Retomada: apenas a parte não terminada é coletada novamente.
+        chunks_root = run_cfg.folder_path / "chunks" / "chunks"
+        os.remove(chunks_root / "chunk_1" / "done.yaml")
+        recollect(snaps_path, area_cfg, run_cfg.folder_path / "chunks", num_chunks=3, num_workers=1)
+        self.assertTrue(np.allclose(single["times"], load_area(run_cfg.folder_path / "chunks")["times"]))
+        self.assertFalse(chunks_root.exists())
+
+        with self.assertRaises(ValueError):
+            recollect(snaps_path, InvasionColCfg(1), run_cfg.folder_path / "invasion", num_workers=1)
+
+class TestCounters(unittest.TestCase):
+    '''
+    Contadores acumulados do solver (`CppSolver.counters`) e o `CreationRateCol`,
+    comparados com uma contagem feita em python a cada passo.
+    '''
+    def get_pipeline(self, tallies: dict, out: dict):
+        def pipeline(sim: Simulation, cfg: ColManagerCfg):
+            solver = sim.solver
+            col = ColManager(col_cfg=cfg, solver=solver, root_path=sim.run_cfg.folder_path, configs=sim.configs)
+
+            tally = dict.fromkeys(solver.counters_names, 0)
+            uids = set()
+            while solver.time < sim.run_cfg.tf:
+                solver.update()
+
+                active_uids = set(np.array(solver.unique_rings_ids)[solver.rings_ids[:solver.num_active_rings]].tolist())
+                tally["num_created"] += len(active_uids - uids)
+                tally["num_removed"] += len(uids - active_uids)
+                uids = active_uids
+
+                tally["num_steps"] += 1
+                tally["active_integral"] += solver.num_active_rings * solver.dt
+                tally["num_invasions"] += solver.in_pol_checker.num_inside_points
+                tallies[solver.num_time_steps] = dict(tally)
+
+                col.collect()
+            col.save()
+
+            out["counters"] = solver.counters
+            StateSaver(solver, sim.run_cfg.folder_path / "checkpoint", sim.configs).save()
+        return pipeline
+
+    def test_counters(self):
+        tallies, out = {}, {}
+        cols_cfgs = {"cr": CreationRateColCfg(wait_time=0, collect_time=140, collect_dt=2)}
+        run_cfg, configs = TestRingCols.exec_collect(np.inf, [], cols_cfgs=cols_cfgs, tf=140, 
+            pipeline=self.get_pipeline(tallies, out))
+
+        last_step = max(tallies)
+        cr = CreationRateData(run_cfg.folder_path / "cr")
+        self.assertGreater(cr.times.size, 10)
+        self.assertGreater(cr.num_created.sum(), 0)
+        self.assertGreater(cr.num_removed.sum(), 0)
+
+        # O primeiro intervalo começa na primeira coleta, no primeiro passo.
+        steps = np.concatenate([[1], np.round(cr.times.astype(np.float64) / run_cfg.int_cfg.dt).astype(int)])
+        for i in range(cr.times.size):
+            start, end = tallies[steps[i]], tallies[steps[i+1]]
+            interval = (steps[i+1] - steps[i]) * run_cfg.int_cfg.dt
+            self.assertEqual(cr.num_created[i], end["num_created"] - start["num_created"])
+            self.assertEqual(cr.num_removed[i], end["num_removed"] - start["num_removed"])
+            self.assertEqual(cr.num_invasions[i], end["num_invasions"] - start["num_invasions"])
+            self.assertAlmostEqual(cr.mean_active[i], (end["active_integral"] - start["active_integral"]) / interval, places=3)
+
+        for name, value in tallies[last_step].items():
+            self.assertAlmostEqual(out["counters"][name], value, places=6)
+        
+        # Checkpoint com os contadores.
+        checkpoint_path = run_cfg.folder_path / "checkpoint"
+        configs2 = load_configs(CONFIGS_PATH)
+        configs2["run_cfg"].folder_path = run_cfg.folder_path / "from_checkpoint"
+        configs2["run_cfg"].func = lambda sim, cfg: None
+        configs2["run_cfg"].checkpoint = CheckpointCfg(checkpoint_path, set_time=True)
+        sim2 = Simulation(**configs2)
+        self.assertEqual(sim2.solver.counters, out["counters"])
+
+        shutil.rmtree(run_cfg.folder_path)
+
+class TestAdaptiveAutosave(unittest.TestCase):
+    "Modo adaptativo do intervalo entre auto-salvamentos (ver `ColAutoSaveCfg`)."
+    def test_adaptive_freq_dt(self):
+        cost, wall_per_time = 2, 0.5
+        overhead_dt = cost * (1 - 0.1) / 0.1 / wall_per_time
+        young_daly_dt = np.sqrt(2 * cost * 3600 / 4) / wall_per_time
+
+        self.assertFalse(ColAutoSaveCfg(freq_dt=5).is_adaptive)
+        
+        cfg = ColAutoSaveCfg(freq_dt=5, max_overhead=0.1)
+        self.assertTrue(cfg.is_adaptive)
+        self.assertAlmostEqual(cfg.adaptive_freq_dt(cost, wall_per_time), 36)
+        self.assertAlmostEqual(cfg.adaptive_freq_dt(cost, wall_per_time), overhead_dt)
+
+        cfg = ColAutoSaveCfg(freq_dt=5, interruption_rate=4)
+        self.assertTrue(cfg.is_adaptive)
+        self.assertAlmostEqual(cfg.adaptive_freq_dt(cost, wall_per_time), young_daly_dt)
+
+        # Com os dois critérios, o maior intervalo é utilizado.
+        cfg = ColAutoSaveCfg(freq_dt=5, max_overhead=0.1, interruption_rate=4)
+        self.assertAlmostEqual(cfg.adaptive_freq_dt(cost, wall_per_time), max(overhead_dt, young_daly_dt))
+        cfg = ColAutoSaveCfg(freq_dt=5, max_overhead=0.001, interruption_rate=4)
+        self.assertAlmostEqual(cfg.adaptive_freq_dt(cost, wall_per_time), cost * 999 / wall_per_time)
+
+        # Limites do intervalo.
+        cfg = ColAutoSaveCfg(freq_dt=5, max_overhead=0.1, min_freq_dt=50, max_freq_dt=100)
+        self.assertAlmostEqual(cfg.adaptive_freq_dt(cost, wall_per_time), 50)
+        cfg = ColAutoSaveCfg(freq_dt=5, max_overhead=0.1, min_freq_dt=1, max_freq_dt=10)
+        self.assertAlmostEqual(cfg.adaptive_freq_dt(cost, wall_per_time), 10)
+        cfg = ColAutoSaveCfg(freq_dt=5, max_overhead=0.1, min_freq_dt=1, max_freq_dt=100)
+        self.assertAlmostEqual(cfg.adaptive_freq_dt(cost, wall_per_time), overhead_dt)
+
+    def test_adaptive_run(self):
+        '''
+        O intervalo muda durante a coleta e o valor salvo no último auto-salvamento
+        é carregado junto com o auto-salvamento.
+        '''
+        stop_time = 20
+        runs = []
+        def pipeline(sim: Simulation, cfg: ColManagerCfg):
+            collect_cfg: CollectDataCfg = sim.run_cfg
+            solver = sim.solver
+
+            is_autosave = collect_cfg.is_autosave
+            cfg.to_load_autosave = is_autosave
+            col = ColManager(col_cfg=cfg, solver=solver, root_path=collect_cfg.folder_path, configs=sim.configs)
+            
+            # Intervalo no início da execução, em cada passo e salvo no último auto-salvamento.
+            run = {"start": col.autosave_freq_dt, "freqs": [], "saved": None}
+            runs.append(run)
+            while solver.time < collect_cfg.tf:
+                if solver.time > stop_time and not is_autosave:
+                    raise AsteroidError()
+
+                solver.update()
+                freq_dt, last_time = col.autosave_freq_dt, col.autosave_last_time
+                col.collect()
+                if col.autosave_last_time != last_time:
+                    run["saved"] = freq_dt
+                run["freqs"].append(col.autosave_freq_dt)
+            col.save()
+
+        # Com um overhead máximo muito pequeno, o intervalo fica no limite máximo.
+        autosave_cfg = ColAutoSaveCfg(freq_dt=5, max_overhead=1e-4, min_freq_dt=1, max_freq_dt=3)
+        run_cfg, configs = TestRingCols.exec_collect(stop_time, ["cr"], tf=30, pipeline=pipeline, 
+            autosave_cfg=autosave_cfg)
+
+        crashed = runs[0]
+        self.assertEqual(crashed["start"], 5)
+        self.assertEqual(crashed["freqs"][-1], 3)
+        self.assertEqual(crashed["saved"], 3)
+
+        run_cfg.checkpoint = CheckpointCfg(run_cfg.folder_path / "autosave")
+        Simulation(**configs).run()
+        
+        resumed = runs[1]
+        self.assertEqual(resumed["start"], crashed["saved"])
+        self.assertTrue(all(freq_dt == 3 for freq_dt in resumed["freqs"]))
+
+        shutil.rmtree(run_cfg.folder_path)
+
+class TestReplay(unittest.TestCase):
+    '''
+    Coletores executados sobre snapshots salvas (`SolverReplay`).
+    '''
+    @classmethod
+    def setUpClass(cls):
+        cols_cfgs = {"snaps": SnapshotsColCfg(snaps_dt=0.5, wait_time=1)}
+        cls.run_cfg, _ = TestRingCols.exec_collect(np.inf, [], cols_cfgs=cols_cfgs, tf=40)
+        cls.snaps_path = cls.run_cfg.folder_path / "snaps"
+        cls.num_frames = FrameStore(cls.snaps_path / "data" / "snaps").num_frames
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.run_cfg.folder_path)
+
+    def test_quantity_pos_region(self):
+        from phystem.systems.ring.collectors.offline import collect_chunk
+
+        xlims = [-10, 10]
+        col_cfg = QuantityPosCfg(collect_dt=1, xlims=xlims, quantities_cfg=[quantity_pos.AreaCfg()])
+        col_path = self.run_cfg.folder_path / "replay_q"
+        collect_chunk(self.snaps_path, col_cfg, col_path, (0, self.num_frames - 1))
+
+        data = AreaData(col_path)
+        self.assertGreater(data.times.size, 0)
+        self.assertEqual(len(data.area), data.times.size)
+        
+        num_rings = 0
+        for cms in data.cms:
+            num_rings += cms.shape[0]
+            self.assertTrue(((cms[:, 0] > xlims[0]) & (cms[:, 0] < xlims[1])).all())
+        self.assertGreater(num_rings, 0)
+
+    def test_autosave(self):
+        from phystem.systems.ring.collectors.offline import collect_chunk
+
+        col_cfg = AreaColCfg(freq_dt=1, autosave_cfg=ColAutoSaveCfg(freq_dt=2))
+        col_path = self.run_cfg.folder_path / "replay_autosave"
+        collect_chunk(self.snaps_path, col_cfg, col_path, (0, self.num_frames - 1))
+
+        autosave_path = col_path / "autosave" / "autosave"
+        with open(autosave_path / "metadata.yaml") as f:
+            metadata = yaml.unsafe_load(f)
+        self.assertTrue(metadata[settings.autosave_flag_name])
+        self.assertGreater(metadata["time"], 0)
+        self.assertNotIn("counters", metadata)
+        self.assertTrue((autosave_path / "pos.npy").exists())
+
+    def test_delta(self):
+        from phystem.systems.ring.collectors.offline import collect_chunk
+        
+        configs = load_configs(CONFIGS_PATH)
+        col_cfg = TestRingCols.get_cols_cfgs(configs["run_cfg"], configs["dynamic_cfg"])["delta"]
+        col_cfg.start_dt, col_cfg.check_dt = 5, 0.25
+        col_cfg.wait_dist = configs["dynamic_cfg"].get_ring_radius()
+        col_path = self.run_cfg.folder_path / "replay_delta"
+        collect_chunk(self.snaps_path, col_cfg, col_path, (0, self.num_frames - 1))
+
+        # Pontos iniciados (`rings_in_rect`) e finalizados (`slots_of`).
+        data = DeltaData(col_path)
+        self.assertGreater(len(data.init_times), 0)
+        self.assertGreater(len(data.final_times), 0)
+
+    def test_tracer(self):
+        '''
+        Traçadores escolhidos (`rings_in_rect`) e encontrados (`slots_of`) nas snapshots: os
+        centros de massa coletados devem ser os centros de massa dos anéis nas snapshots.
+        '''
+        from phystem.systems.ring.collectors.offline import collect_chunk, get_replay_sim
+
+        col_path = self.run_cfg.folder_path / "replay_tracer"
+
+        # Sem `num_points` e com tempo final infinito.
+        sim = get_replay_sim(self.snaps_path, TracerColCfg(num_tracers=3), col_path)
+        with self.assertRaises(ValueError):
+            TracerCol(TracerColCfg(num_tracers=3), sim.solver, col_path / "inf", sim.configs)
+
+        collect_chunk(self.snaps_path, TracerColCfg(num_tracers=3, seed=1), col_path, (0, self.num_frames - 1))
+        data = TracerCol.load(col_path)
+        self.assertEqual(data["uids"].size, 3)
+        self.assertGreater(data["times"].size, 0)
+
+        snaps = SnapshotsCol.load_snaps(self.snaps_path)
+        store = FrameStore(self.snaps_path / "data" / "snaps")
+        for time, cms in zip(data["times"], data["cms"]):
+            snap = snaps[int(np.flatnonzero(np.isclose(store.times, time))[0])]
+            rows = [int(np.flatnonzero(snap.uids == uid)[0]) for uid in data["uids"]]
+            self.assertTrue(np.allclose(cms, snap.pos[rows].mean(axis=1), atol=1e-5))
+
+    def test_merge_quantity_pos(self):
+        '''
+        Coleta offline do `QuantityPosCol` dividida em partes, com mais de um shard
+        por parte, comparada com a coleta em uma única parte.
+        '''
+        def get_cfg():
+            return QuantityPosCfg(collect_dt=1, quantities_cfg=[quantity_pos.AreaCfg()], memory_per_file=2e4)
+        
+        frames = (0, self.num_frames - 1)
+        single_path = self.run_cfg.folder_path / "merge_single"
+        chunks_path = self.run_cfg.folder_path / "merge_chunks"
+        recollect(self.snaps_path, get_cfg(), single_path, frames, num_chunks=1, num_workers=1)
+        recollect(self.snaps_path, get_cfg(), chunks_path, frames, num_chunks=3, num_workers=1)
+
+        single, chunks = AreaData(single_path), AreaData(chunks_path)
+        self.assertGreater(single.area.num_files, 1)
+        self.assertEqual(single.times.size, self.num_frames - 2)
+        self.assertTrue(np.allclose(single.times, chunks.times))
+        self.assertEqual(len(chunks.area), chunks.times.size)
+        for name in ["area", "cms"]:
+            for a, b in zip(getattr(single, name), getattr(chunks, name)):
+                self.assertTrue(np.allclose(a, b))
+
+        from phystem.data_utils.grids import RegularGrid
+        grid_cfg = QuantityPosCfg(collect_dt=1, quantities_cfg=[quantity_pos.AreaGridCfg(RegularGrid(
+            length=10, height=10, num_cols=2, num_rows=2, center=(0, 0)))])
+        with self.assertRaisesRegex(ValueError, "area_grid"):
+            recollect(self.snaps_path, grid_cfg, self.run_cfg.folder_path / "merge_grid", frames, num_chunks=2, num_workers=1)
+
+    def test_merge_delta(self):
+        '''
+        Coleta offline do `DeltaCol` (modo online com os dados brutos) dividida em partes: os 
+        dados juntados são a concatenação dos dados das partes, com os ids dos pontos deslocados.
+        '''
+        configs = load_configs(CONFIGS_PATH)
+        col_cfg = TestRingCols.get_cols_cfgs(configs["run_cfg"], configs["dynamic_cfg"])["delta"]
+        col_cfg.start_dt, col_cfg.check_dt = 5, 0.25
+        col_cfg.wait_dist = configs["dynamic_cfg"].get_ring_radius()
+        col_cfg.online, col_cfg.save_raw, col_cfg.edge_k = True, True, 1.5
+
+        col_path = self.run_cfg.folder_path / "merge_delta"
+        recollect(self.snaps_path, col_cfg, col_path, (0, self.num_frames - 1), num_chunks=2, num_workers=1, keep_chunks=True)
+
+        chunks_data = [col_path / "chunks" / f"chunk_{i}" / "data" for i in range(2)]
+        for name in ["init_times", "final_times", "deltas"]:
+            merged = np.load(col_path / "data" / f"{name}.npy")
+            self.assertTrue(np.array_equal(merged, np.concatenate([np.load(p / f"{name}.npy") for p in chunks_data])))
+        self.assertGreater(np.load(col_path / "data" / "deltas.npy").shape[0], 0)
+
+        data = DeltaData(col_path)
+        num_points = [np.load(p / "init_times.npy").size for p in chunks_data]
+        self.assertEqual(data.num_init_points, sum(num_points))
+        self.assertGreater(num_points[0], 0)
+        self.assertTrue(np.array_equal(data.init_cms[num_points[0]], np.load(chunks_data[1] / "cms_0_i.npy")))
+        self.assertTrue(np.array_equal(data.init_uids[0], np.load(chunks_data[0] / "uids_0_i.npy")))
+
+# Intervalos de tempo [t, t + 0.2) em que o gatilho de `TestFlightRecorder` é verdadeiro.
+FIRE_TIMES = (10, 10.5, 20, 30)
+
+def timed_trigger(solver):
+    return any(t <= solver.time < t + 0.2 for t in FIRE_TIMES)
+
+class TestFlightRecorder(unittest.TestCase):
+    def test_events(self):
+        '''
+        Eventos do `FlightRecorderCol` com um gatilho definido no nível do módulo: frames
+        salvos, tempo do disparo, reprodução com o `SolverReplay`, disparos durante a gravação
+        de um evento e número máximo de eventos.
+        '''
+        from phystem.core.run_config import ReplayDataCfg
+        from phystem.systems.ring.solvers import SolverReplay
+
+        num_before, num_after, freq_steps = 5, 8, 10
+        col_cfg = FlightRecorderColCfg(timed_trigger, num_before=num_before, num_after=num_after, 
+            freq_steps=freq_steps, max_events=2)
+        run_cfg, configs = TestRingCols.exec_collect(np.inf, [], cols_cfgs={"fr": col_cfg}, tf=35)
+        data_path = run_cfg.folder_path / "fr" / "data"
+        frame_dt = freq_steps * run_cfg.int_cfg.dt
+
+        with open(data_path / "metadata.yaml") as f:
+            metadata = yaml.unsafe_load(f)
+        
+        # O disparo em 10.5 ocorre durante a gravação do primeiro evento, e o disparo 
+        # em 30 excede o número máximo de eventos.
+        self.assertEqual(metadata["num_events"], 2)
+        self.assertFalse((data_path / "event_2").exists())
+        for trigger_time, fire_time in zip(metadata["trigger_times"], [FIRE_TIMES[0], FIRE_TIMES[2]]):
+            self.assertTrue(fire_time <= trigger_time < fire_time + frame_dt)
+        self.assertEqual(metadata["num_frames"], [num_before + 1 + num_after] * 2)
+        
+        event_path = data_path / "event_0"
+        with open(event_path / "data" / "metadata.yaml") as f:
+            event_metadata = yaml.unsafe_load(f)
+        times = np.load(event_path / "data" / "times.npy")
+        self.assertEqual(event_metadata["trigger_time"], metadata["trigger_times"][0])
+        self.assertEqual(times.size, num_before + 1 + num_after)
+        self.assertAlmostEqual(times[num_before], event_metadata["trigger_time"])
+        self.assertTrue(np.allclose(np.diff(times), frame_dt))
+
+        # Reprodução do evento.
+        replay_cfg = ReplayDataCfg(event_path)
+        self.assertAlmostEqual(replay_cfg.frame_dt, frame_dt)
+        solver = SolverReplay(replay_cfg, configs["other_cfgs"]["stokes"].num_max_rings)
+        self.assertEqual(solver.num_frames, times.size)
+        self.assertTrue(np.allclose(solver.times, times))
+        for frame in range(solver.num_frames):
+            solver.seek(frame)
+            self.assertEqual(solver.time, times[frame])
+            self.assertGreater(solver.num_active_rings, 0)
+
+            pos, uids = solver.load(frame)
+            self.assertEqual(pos.shape, (uids.size, configs["dynamic_cfg"].num_particles, 2))
+            self.assertEqual(np.load(event_path / "data" / f"angle_{frame}.npy").shape, uids.shape)
+
+        shutil.rmtree(run_cfg.folder_path)
+
 @dataclass
 class InfectedCfg(quantity_pos.base.QuantityCfg):
     name = "infected"
@@ -319,5 +1005,56 @@ class TestQuantityPos(unittest.TestCase):
 
         shutil.rmtree(run_cfg.folder_path)
 
+    def test_grids(self):
+        '''
+        Os coletores que acumulam os dados em grades devem salvar os mesmos resultados
+        dos calculadores equivalentes executados sobre os dados brutos da mesma coleta.
+        '''
+        from phystem.data_utils.grids import RegularGrid
+        from phystem.systems.ring.quantities import calculators as calcs
+
+        configs = load_configs(CONFIGS_PATH)
+        space_cfg = configs["space_cfg"]
+        frame_dt = utils.time_to_num_dt(0.3, configs["run_cfg"].int_cfg.dt)
+        
+        def get_grid():
+            return RegularGrid(length=space_cfg.length, height=space_cfg.height, num_cols=8, num_rows=4)
+
+        q_cfg = QuantityPosCfg(collect_dt=50, transient_time=5, quantities_cfg=[
+            quantity_pos.CmsCfg(),
+            quantity_pos.VelocityCfg(frame_dt=frame_dt),
+            quantity_pos.PolarityCfg(),
+            quantity_pos.AreaCfg(),
+            quantity_pos.DensityGridCfg(get_grid()),
+            quantity_pos.VelocityGridCfg(get_grid(), frame_dt=frame_dt),
+            quantity_pos.PolarityGridCfg(get_grid()),
+            quantity_pos.AreaGridCfg(get_grid()),
+        ])
+        run_cfg, _ = TestRingCols.exec_collect(np.inf, [], cols_cfgs={"q": q_cfg}, tf=40)
+        q_path = run_cfg.folder_path / "q"
+        calc_path = run_cfg.folder_path / "calc"
+
+        calculators = {
+            "den_grid": (calcs.DensityCalc(q_path, calc_path / "den", get_grid()), "den"),
+            "vel_grid": (calcs.VelocityCalc(q_path, calc_path / "vel", get_grid()), "vels"),
+            "pol_grid": (calcs.PolarityCalc(q_path, calc_path / "pol", get_grid()), "pol"),
+            "area_grid": (calcs.AreaCalc(q_path, calc_path / "area", get_grid()), "areas"),
+        }
+        for name, (calc, result_name) in calculators.items():
+            calc.crunch_numbers()
+            
+            with open(q_path / "data" / name / "metadata.yaml") as f:
+                num_points = yaml.unsafe_load(f)["num_points"]
+            self.assertGreater(num_points, 0)
+            self.assertEqual(num_points, calc.metadata["num_points"], name)
+
+            expected = np.load(calc.root_path / f"{result_name}.npy")
+            result = np.load(q_path / "data" / name / f"{result_name}.npy")
+            self.assertEqual(result.shape, expected.shape, name)
+            self.assertTrue(np.isfinite(result).any(), name)
+            self.assertTrue(np.allclose(result, expected, rtol=1e-4, atol=1e-5, equal_nan=True), name)
+
+        shutil.rmtree(run_cfg.folder_path)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
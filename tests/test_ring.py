@@ -116,6 +116,60 @@ class TestRing(unittest.TestCase):
         
         Simulation(**configs).run()
 
+class TestEquilibriumCache(unittest.TestCase):
+    root_data_path = current_folder / "data_test/ring"
+
+    def test_checkpoint_cfg(self):
+        import numpy as np
+        from phystem.systems.ring.equilibrium_cache import EquilibriumCache, EquilibriumCheckpointCfg
+
+        cache_path = current_folder / "tmp_eq_cache"
+        transient_time = 5
+
+        def get_configs():
+            configs = load_configs(self.root_data_path / "configs" / "collectors_configs")
+            run_cfg: CollectDataCfg = configs["run_cfg"]
+            run_cfg.folder_path = current_folder / "tmp"
+            run_cfg.func = lambda sim, cfg: None
+            run_cfg.checkpoint = EquilibriumCheckpointCfg(cache_path, transient_time)
+            return configs
+
+        # Estado ainda não está no cache: o transiente é integrado.
+        sim = Simulation(**get_configs())
+        entries = EquilibriumCache(cache_path).entries()
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(sim.run_cfg.checkpoint.root_path, entries[0])
+        self.assertEqual(sim.solver.time, 0)
+        self.assertGreater(sim.solver.num_active_rings, 0)
+
+        # Estado já está no cache.
+        sim2 = Simulation(**get_configs())
+        self.assertEqual(len(EquilibriumCache(cache_path).entries()), 1)
+        self.assertEqual(sim2.run_cfg.checkpoint.root_path, entries[0])
+        self.assertTrue(np.allclose(sim.solver.pos, sim2.solver.pos))
+
+        shutil.rmtree(cache_path)
+        if (current_folder / "tmp").exists():
+            shutil.rmtree(current_folder / "tmp")
+
+class TestCreators(unittest.TestCase):
+    def test_empty(self):
+        from phystem.systems.ring.creators import Creator, CreatorCfg
+
+        init_data = Creator(CreatorCfg.empty()).create()
+        self.assertEqual(init_data.pos.size, 0)
+        self.assertEqual(init_data.self_prop_angle.size, 0)
+
+    def test_creator(self):
+        import numpy as np
+        from phystem.systems.ring.creators import Creator, CreatorCfg
+
+        cfg = CreatorCfg(num_rings=2, num_particles=10, r=1, angle=[0, 1], center=[[0, 0], [3, 1]])
+        init_data = Creator(cfg).create()
+
+        self.assertEqual(init_data.pos.shape, (2, 10, 2))
+        self.assertTrue(np.allclose(init_data.pos.mean(axis=1), cfg.center))
+
 class TestWindows(unittest.TestCase):
     def test_neighbor_ids(self):
         import phystem.cpp_lib as cpp_lib
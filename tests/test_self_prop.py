@@ -1,5 +1,8 @@
 import unittest
-import os, yaml
+import os, yaml, shutil
+from pathlib import Path
+
+import numpy as np
 
 from phystem.systems.szabo.simulation import Simulation
 from phystem.systems.szabo import collect_pipelines
@@ -189,5 +192,145 @@ class TestWindows(unittest.TestCase):
 
         return has_error, info
 
+class TestSolverRD(unittest.TestCase):
+    def setUp(self):
+        self.root_path = Path(current_folder) / "tmp_replay"
+
+    def tearDown(self):
+        if self.root_path.exists():
+            shutil.rmtree(self.root_path)
+
+    def create_data(self, num_frames, num_points):
+        '''
+        Cria dados de replay com `num_frames` frames pré-alocados, 
+        dos quais apenas `num_points` foram coletados.
+        '''
+        from phystem.core.run_config import save_configs
+
+        data_path = self.root_path / "data"
+        data_path.mkdir(parents=True)
+
+        run_cfg = CollectDataCfg(int_cfg=IntegrationCfg(dt=0.01, update_type=UpdateType.NORMAL),
+            tf=1, folder_path=self.root_path, func_cfg={})
+        save_configs({"run_cfg": run_cfg}, self.root_path / "config")
+
+        rng = np.random.default_rng(0)
+        vel = rng.normal(size=(num_frames, 2, 50))
+        vel[:, 0] += np.linspace(0, 3, num_frames)[:, None]
+        np.save(data_path / "pos.npy", rng.random((num_frames, 2, 50)))
+        np.save(data_path / "vel.npy", vel)
+        np.save(data_path / "time.npy", np.arange(num_frames) * 0.1)
+        with open(data_path / "metadata.yaml", "w") as f:
+            yaml.dump({"frame_dt": 0.1, "num_points": num_points}, f)
+        
+        return vel[:num_points]
+
+    def test_mean_vel_series(self):
+        from phystem.core.run_config import ReplayDataCfg
+        from phystem.systems.szabo.solvers import SolverRD
+
+        vel = self.create_data(num_frames=40, num_points=30)
+        solver = SolverRD(ReplayDataCfg(self.root_path), chunk_size=7)
+        
+        # O cálculo da série é iniciado na criação do solver.
+        self.assertIsNotNone(solver._mean_vel_thread)
+
+        series = solver.mean_vel_series()
+        self.assertEqual(series.size, 30)
+        for frame in range(30):
+            solver.seek(frame)
+            self.assertAlmostEqual(solver.mean_vel(), SolverRD.calc_mean_vel(vel[frame][None])[0])
+            self.assertAlmostEqual(series[frame], solver.calc_mean_vel(solver.py_vel[None])[0])
+        
+        # Limites de `seek` e `skip`.
+        solver.seek(-1)
+        self.assertEqual(solver.id, 29)
+        self.assertTrue(np.array_equal(solver.py_vel, vel[29]))
+        for frame in (30, -31):
+            with self.assertRaises(IndexError):
+                solver.seek(frame)
+        
+        solver.skip(5)
+        self.assertEqual(solver.id, 29)
+        solver.skip(-100)
+        self.assertEqual(solver.id, 0)
+        solver.skip(3)
+        self.assertEqual(solver.id, 3)
+        self.assertTrue(np.array_equal(solver.py_pos, np.load(self.root_path / "data" / "pos.npy")[3]))
+
+class TestStateStream(unittest.TestCase):
+    def setUp(self):
+        self.folder_path = Path(current_folder) / "tmp_stream"
+
+    def tearDown(self):
+        if self.folder_path.exists():
+            shutil.rmtree(self.folder_path)
+
+    def get_solver(self, dt):
+        from phystem.systems.szabo.solvers import CppSolver
+
+        dynamic_cfg = SelfPropellingCfg(relaxation_time=1, mobility=1, max_repulsive_force=1,
+            max_attractive_force=1, r_eq=5/6, max_r=1, vo=1, nabla=2)
+
+        rng = np.random.default_rng(0)
+        pos = (rng.random((2, 100)) - 0.5) * 15
+        vel = rng.normal(size=(2, 100))
+        return CppSolver(pos, vel, dynamic_cfg, size=30, dt=dt, num_windows=1,
+            update_type=UpdateType.NORMAL, rng_seed=1)
+
+    def collect(self, num_steps, **col_kwargs):
+        '''
+        Coleta `num_steps` passos com o `StateStream` sem chamar `save`. Retorna o
+        coletor e as posições e tempos de todos os pontos coletados.
+        '''
+        from phystem.systems.szabo.collectors import StateStream
+
+        dt = 0.01
+        solver = self.get_solver(dt)
+        run_cfg = CollectDataCfg(int_cfg=IntegrationCfg(dt=dt, update_type=UpdateType.NORMAL),
+            tf=40*dt, folder_path=self.folder_path, func_cfg={})
+        col = StateStream(solver, self.folder_path, {"run_cfg": run_cfg}, tf=run_cfg.tf, dt=dt, 
+            num_points=20, **col_kwargs)
+
+        pos, time = [], []
+        for count in range(num_steps):
+            if count % col.freq == 0 and len(pos) < col.num_points:
+                pos.append(np.array(solver.py_pos))
+                time.append(solver.time)
+            col.collect(count)
+            solver.update()
+
+        return col, np.array(pos), np.array(time)
+
+    def test_interrupted(self):
+        from phystem.systems.szabo.collectors import StateStream
+
+        # 7 pontos coletados, apenas o primeiro bloco (4 pontos) foi escrito.
+        col, pos, time = self.collect(14, chunk_size=4)
+        self.assertEqual(pos.shape[0], 7)
+
+        data = StateStream.load(self.folder_path)
+        self.assertEqual(data["pos"].shape[0], 4)
+        self.assertEqual(data["time"].shape[0], 4)
+        self.assertTrue(np.array_equal(data["pos"], pos[:4]))
+        self.assertTrue(np.array_equal(data["time"], time[:4]))
+
+        col.save()
+        data = StateStream.load(self.folder_path)
+        self.assertTrue(np.array_equal(data["pos"], pos))
+
+    def test_float32(self):
+        from phystem.systems.szabo.collectors import StateStream
+
+        col, pos, time = self.collect(50, chunk_size=8, dtype=np.float32)
+        col.save()
+
+        data = StateStream.load(self.folder_path)
+        self.assertEqual(data["pos"].dtype, np.float32)
+        self.assertEqual(data["time"].dtype, np.float64)
+        self.assertEqual(data["pos"].shape[0], col.num_points)
+        self.assertTrue(np.array_equal(data["pos"], pos.astype(np.float32)))
+        self.assertTrue(np.array_equal(data["time"], time))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file